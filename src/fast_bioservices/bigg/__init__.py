@@ -1,3 +1,7 @@
-__all__ = ["BiGG"]
+__all__ = ["BiGG", "ModelStore", "SearchIndex", "StoichiometricMatrix", "iter_model_section", "read_model_metadata"]
 
 from fast_bioservices.bigg.bigg import BiGG
+from fast_bioservices.bigg.search_index import SearchIndex
+from fast_bioservices.bigg.stoichiometry import StoichiometricMatrix
+from fast_bioservices.bigg.store import ModelStore
+from fast_bioservices.bigg.streaming import iter_model_section, read_model_metadata
@@ -1,20 +1,58 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from collections.abc import Mapping
+import os
+import time
+from collections.abc import AsyncIterator, Mapping
 from pathlib import Path
 from typing import Any, Literal
 
-from fast_bioservices.fast_http import _AsyncHTTPClient
+import aiofiles.os
+import pandas as pd
+from loguru import logger
+
+from fast_bioservices.bigg.search_index import SearchIndex
+from fast_bioservices.bigg.stoichiometry import StoichiometricMatrix
+from fast_bioservices.bigg.store import ModelStore
+from fast_bioservices.bigg.streaming import iter_model_section
+from fast_bioservices.fast_http import _AsyncHTTPClient, file_sha256
+from fast_bioservices.settings import bigg_search_index_filepath, bigg_version_filepath, download_dir
+
+
+def _read_manifest(path: Path) -> dict[str, Any]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.exists():
+        return {"version": None, "models": {}}
+    return json.loads(path.read_text())
+
+
+def _write_atomic(path: Path, contents: str) -> None:
+    # Replace the file in one step, so an interrupted write never leaves a truncated file; the temporary file is named
+    # after this process, so processes that share the file do not write to the same temporary file
+    partial = path.with_name(f"{path.name}.{os.getpid()}.part")
+    partial.write_text(contents)
+    partial.replace(path)
 
 
 class BiGG(_AsyncHTTPClient):
     _download_url: str = "http://bigg.ucsd.edu/static/models"
 
-    def __init__(self, cache: bool = True):
-        """Access the BiGG database."""
+    def __init__(self, cache: bool = True, version_check_interval: float = 24 * 60 * 60):
+        """Access the BiGG database.
+
+        Cached responses are namespaced by the BiGG database version, so they can be served without revalidation
+        until a new BiGG release retires them.
+
+        :param cache: Should cache be used
+        :param version_check_interval: The minimum number of seconds between checks for a new BiGG database version
+        """
         self._url: str = "http://bigg.ucsd.edu/api/v2"
-        _AsyncHTTPClient.__init__(self, cache=cache, max_requests_per_second=10)
+        self._search_index: SearchIndex | None = None
+        self._version_check_interval: float = version_check_interval
+        self._version_checked_at: float = 0.0
+        self._version_lock = asyncio.Lock()
+        _AsyncHTTPClient.__init__(self, cache=cache, max_requests_per_second=10, max_concurrent_requests=10)
 
     @property
     def url(self) -> str:
@@ -26,6 +64,53 @@ class BiGG(_AsyncHTTPClient):
         """Return the download-specific URL."""
         return self._download_url
 
+    async def _refresh_cache_namespace(self) -> None:
+        """Namespace cached responses by BiGG database version, checking the version at most once per interval.
+
+        The last known version is shared between processes through a small file, so most calls cost no request.
+        """
+        async with self._version_lock:
+            now = time.time()
+            if self._cache_namespace and now - self._version_checked_at < self._version_check_interval:
+                return
+
+            state: dict[str, Any] | None = None
+            if bigg_version_filepath.exists():
+                try:
+                    state = json.loads(bigg_version_filepath.read_text())
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring the corrupt BiGG version file at {bigg_version_filepath}")
+
+            if state is not None and now - state["checked_at"] < self._version_check_interval:
+                version, checked_at = state["version"], state["checked_at"]
+            else:
+                response = (
+                    await _AsyncHTTPClient._get(
+                        self, f"{self.url}/database_version", temp_disable_cache=True, log_on_complete=False
+                    )
+                )[0]
+                version, checked_at = json.loads(response)["bigg_models_version"], now
+                state_json = json.dumps({"version": version, "checked_at": checked_at})
+                await asyncio.to_thread(_write_atomic, bigg_version_filepath, state_json)
+
+            namespace = f"bigg-{version}"
+            if state is None or state["version"] != version:
+                logger.info(f"BiGG database version is now {version}, retiring responses cached for other versions")
+                await asyncio.to_thread(self._retire_cache_namespaces, "bigg.ucsd.edu", keep=namespace)
+            self._cache_namespace = namespace
+            self._version_checked_at = checked_at
+
+    async def _get(self, urls: str | list[str], *args, **kwargs) -> list[bytes]:
+        if self._use_cache:
+            await self._refresh_cache_namespace()
+        return await super()._get(urls, *args, **kwargs)
+
+    async def _iter_get(self, urls: list[str], *args, **kwargs) -> AsyncIterator[tuple[int, bytes]]:
+        if self._use_cache:
+            await self._refresh_cache_namespace()
+        async for item in super()._iter_get(urls, *args, **kwargs):
+            yield item
+
     async def version(self, temp_disable_cache: bool = False) -> Mapping[Any, Any]:
         """Get the BiGG database version."""
         response = (await self._get(f"{self.url}/database_version", temp_disable_cache=temp_disable_cache))[0]
@@ -50,26 +135,244 @@ class BiGG(_AsyncHTTPClient):
         response = (await self._get(f"{self.url}/models/{model_id}/download", temp_disable_cache=temp_disable_cache))[0]
         return json.loads(response)
 
+    async def _iter_model_section(
+        self,
+        model_id: str,
+        section: Literal["reactions", "metabolites", "genes"],
+        path: Path | None,
+        temp_disable_cache: bool,
+    ) -> AsyncIterator[dict[str, Any]]:
+        if path is None:
+            url = f"{self.url}/models/{model_id}/download"
+            source: bytes | Path = (await self._get(url, temp_disable_cache=temp_disable_cache))[0]
+        else:
+            source = path
+        for item in iter_model_section(source, section):
+            yield item
+
+    def iter_reactions(
+        self,
+        model_id: str,
+        path: Path | None = None,
+        temp_disable_cache: bool = False,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Parse the reactions of a JSON model one at a time, without building the full model in memory.
+
+        :param model_id: The model to read
+        :param path: A model file from `download` to read instead of the (cached) API response
+        :param temp_disable_cache: Temporarily disable the cache for this request
+        """
+        return self._iter_model_section(model_id, "reactions", path, temp_disable_cache)
+
+    def iter_metabolites(
+        self,
+        model_id: str,
+        path: Path | None = None,
+        temp_disable_cache: bool = False,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Parse the metabolites of a JSON model one at a time; see `iter_reactions`."""
+        return self._iter_model_section(model_id, "metabolites", path, temp_disable_cache)
+
+    def iter_genes(
+        self,
+        model_id: str,
+        path: Path | None = None,
+        temp_disable_cache: bool = False,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Parse the genes of a JSON model one at a time; see `iter_reactions`."""
+        return self._iter_model_section(model_id, "genes", path, temp_disable_cache)
+
+    async def stoichiometric_matrix(
+        self,
+        model_id: str,
+        path: Path | None = None,
+        temp_disable_cache: bool = False,
+    ) -> StoichiometricMatrix:
+        """Get the sparse stoichiometric matrix of a model.
+
+        When the cache is enabled, the matrix is saved as a `.npz` file for the current BiGG version and reused.
+
+        :param model_id: The model to read
+        :param path: A JSON model file from `download` to read instead of the (cached) API response
+        :param temp_disable_cache: Temporarily disable the cache for this request
+        :return: The matrix in coordinate format, with its metabolite and reaction IDs and reaction bounds
+        """
+        use_matrix_cache = self._use_cache and not temp_disable_cache and path is None
+        if use_matrix_cache:
+            await self._refresh_cache_namespace()
+            matrix_path = download_dir / "bigg" / f"{model_id}.{self._cache_namespace or 'bigg'}.npz"
+            if await aiofiles.os.path.exists(matrix_path):
+                return await asyncio.to_thread(StoichiometricMatrix.load, matrix_path)
+
+        if path is None:
+            url = f"{self.url}/models/{model_id}/download"
+            source: bytes | Path = (await self._get(url, temp_disable_cache=temp_disable_cache))[0]
+        else:
+            source = path
+        matrix = await asyncio.to_thread(StoichiometricMatrix.from_model, source)
+
+        if use_matrix_cache:
+            await asyncio.to_thread(matrix.save, matrix_path)
+        return matrix
+
     async def download(
         self,
         model_id: str,
         ext: Literal["json", "xml", "mat", "json.gz", "xml.gz", "mat.gz"],
         download_path: Path | None = None,
         temp_disable_cache: bool = False,
-    ) -> None:
-        """Download a model in a given format."""
+        expected_sha256: str | None = None,
+        store: ModelStore | None = None,
+    ) -> Path:
+        """Download a model in a given format.
+
+        The model is streamed to disk in chunks, so compressed and binary formats are written unchanged.
+        An existing file at the destination is reused only if it was downloaded for the current BiGG version.
+
+        :param model_id: The BiGG model to download
+        :param ext: The file format
+        :param download_path: The destination file or directory; defaults to the current directory
+        :param temp_disable_cache: Download the model again even if the destination file is current
+        :param expected_sha256: If provided, the SHA-256 digest the downloaded file must have
+        :param store: If provided, ingest a JSON model into this local store after downloading it
+        :return: The path of the downloaded file
+        """
+        path, _ = await self._download_model(
+            model_id,
+            ext,
+            download_path=download_path,
+            temp_disable_cache=temp_disable_cache,
+            expected_sha256=expected_sha256,
+            store=store,
+        )
+        return path
+
+    async def _download_model(
+        self,
+        model_id: str,
+        ext: Literal["json", "xml", "mat", "json.gz", "xml.gz", "mat.gz"],
+        download_path: Path | None,
+        temp_disable_cache: bool,
+        expected_sha256: str | None,
+        store: ModelStore | None,
+    ) -> tuple[Path, str]:
+        """Download a model like `download`, also returning the SHA-256 digest it already calculated."""
+        filename = f"{model_id}.{ext}"
         if download_path is None:
-            download_path = f"{model_id}.{ext}"
-        elif not download_path.as_posix().endswith(f"{model_id}.{ext}"):
-            download_path = download_path / f"{model_id}.{ext}"
+            download_path = Path(filename)
+        elif not download_path.as_posix().endswith(filename):
+            download_path = download_path / filename
 
-        response = (await self._get(f"{self.download_url}/{model_id}.{ext}", temp_disable_cache=temp_disable_cache))[0]
+        # A sidecar file records the BiGG version a model was downloaded for, so a release replaces the stale file
+        await self._refresh_cache_namespace()
+        version_path = download_path.with_name(f"{download_path.name}.version")
+        overwrite = temp_disable_cache
+        if not overwrite and await aiofiles.os.path.exists(download_path):
+            overwrite = not version_path.exists() or version_path.read_text() != self._cache_namespace
+            if overwrite:
+                logger.debug(f"Downloading '{filename}' again, it is not from BiGG version {self._cache_namespace}")
+        await self._download(f"{self.download_url}/{filename}", download_path, overwrite=overwrite)
 
-        if ext == "json":
-            json.dump(response, download_path.open("w"), indent=2)  # type: ignore
-        else:
-            with download_path.open("w") as o_stream:
-                o_stream.write(response.decode())
+        sha256 = await file_sha256(download_path)
+        if expected_sha256 is not None and sha256 != expected_sha256.lower():
+            download_path.unlink()
+            raise ValueError(f"Checksum mismatch for '{filename}': expected {expected_sha256}, got {sha256}")
+        await asyncio.to_thread(_write_atomic, version_path, self._cache_namespace)
+
+        if store is not None:
+            if ext != "json":
+                raise ValueError(f"Only JSON models can be added to a model store, got '{ext}'")
+            await asyncio.to_thread(store.ingest, download_path, sha256)
+        return download_path, sha256
+
+    async def mirror(
+        self,
+        path: Path,
+        formats: list[Literal["json", "xml", "mat", "json.gz", "xml.gz", "mat.gz"]] | None = None,
+        max_concurrent_downloads: int = 4,
+        store: ModelStore | None = None,
+        prune: bool = False,
+    ) -> dict[str, list[str]]:
+        """Keep a local copy of every BiGG model, only downloading models that are new or have changed.
+
+        A `manifest.json` in `path` records the BiGG version, metadata counts, and checksums of each mirrored model.
+        A model is downloaded again if it is new, its counts or the BiGG version changed, or a file is missing.
+
+        :param path: The directory to mirror models into
+        :param formats: The formats to download for each model; defaults to JSON
+        :param max_concurrent_downloads: The maximum number of models downloaded at once
+        :param store: If provided, ingest the JSON models that are downloaded into this local store
+        :param prune: Delete local models that are no longer listed by BiGG
+        :return: The IDs of the models that were "updated", "unchanged", and "removed"
+        """
+        formats = list(dict.fromkeys(formats or ["json"]))
+        manifest_path = path / "manifest.json"
+        manifest = await asyncio.to_thread(_read_manifest, manifest_path)
+
+        version, listing = await asyncio.gather(
+            self.version(temp_disable_cache=True),
+            self.models(temp_disable_cache=True),
+        )
+        version = version["bigg_models_version"]
+
+        def fingerprint(model: Mapping[str, Any]) -> dict[str, Any]:
+            counts = {key: model.get(key) for key in ("metabolite_count", "reaction_count", "gene_count")}
+            return {"version": version, **counts}
+
+        def is_current(model: Mapping[str, Any]) -> bool:
+            entry = manifest["models"].get(model["bigg_id"])
+            return (
+                entry is not None
+                and entry["fingerprint"] == fingerprint(model)
+                and all(ext in entry["files"] and (path / f"{model['bigg_id']}.{ext}").exists() for ext in formats)
+            )
+
+        stale = [model for model in listing["results"] if not is_current(model)]
+        logger.info(f"Mirroring {len(stale)} of {len(listing['results'])} BiGG models to {path}")
+
+        download_semaphore = asyncio.Semaphore(max_concurrent_downloads)
+        manifest_lock = asyncio.Lock()
+
+        async def save_manifest() -> None:
+            # Serialize on the event loop, so other models cannot change the manifest while it is written
+            async with manifest_lock:
+                await asyncio.to_thread(_write_atomic, manifest_path, json.dumps(manifest, indent=2))
+
+        async def update(model: Mapping[str, Any]) -> None:
+            model_id = model["bigg_id"]
+            async with download_semaphore:
+                files: dict[str, str] = {}
+                for ext in formats:
+                    _, files[ext] = await self._download_model(
+                        model_id,
+                        ext,
+                        download_path=path,
+                        temp_disable_cache=True,
+                        expected_sha256=None,
+                        store=store if ext == "json" else None,
+                    )
+            manifest["models"][model_id] = {"fingerprint": fingerprint(model), "files": files}
+            # Record progress after each model so an interrupted mirror does not download it again
+            await save_manifest()
+
+        await asyncio.gather(*[update(model) for model in stale])
+
+        listed = {model["bigg_id"] for model in listing["results"]}
+        removed = sorted(set(manifest["models"]) - listed)
+        if prune:
+            for model_id in removed:
+                for ext in manifest["models"].pop(model_id)["files"]:
+                    (path / f"{model_id}.{ext}").unlink(missing_ok=True)
+                    (path / f"{model_id}.{ext}.version").unlink(missing_ok=True)
+        manifest["version"] = version
+        await save_manifest()
+
+        updated = [model["bigg_id"] for model in stale]
+        return {
+            "updated": updated,
+            "unchanged": sorted(listed - set(updated)),
+            "removed": removed if prune else [],
+        }
 
     async def model_reactions(
         self,
@@ -188,6 +491,75 @@ class BiGG(_AsyncHTTPClient):
         )[0]
         return json.loads(response)
 
+    async def _iter_details(
+        self,
+        base_url: str,
+        ids: list[str],
+        temp_disable_cache: bool,
+    ) -> AsyncIterator[tuple[str, Mapping[Any, Any]]]:
+        ids = list(dict.fromkeys(ids))
+        urls = [f"{base_url}/{item_id}" for item_id in ids]
+        async for index, response in self._iter_get(urls, temp_disable_cache=temp_disable_cache):
+            yield ids[index], json.loads(response)
+
+    async def iter_bulk_model_details(
+        self,
+        model_id: str,
+        kind: Literal["reactions", "metabolites", "genes"],
+        ids: list[str],
+        temp_disable_cache: bool = False,
+    ) -> AsyncIterator[tuple[str, Mapping[Any, Any]]]:
+        """Yield `(id, details)` for model reactions, metabolites, or genes as each response arrives.
+
+        All requests are scheduled at once and run concurrently under the BiGG rate limit.
+        """
+        async for item in self._iter_details(f"{self.url}/models/{model_id}/{kind}", ids, temp_disable_cache):
+            yield item
+
+    async def bulk_model_details(
+        self,
+        model_id: str,
+        kind: Literal["reactions", "metabolites", "genes"],
+        ids: list[str],
+        as_dataframe: bool = False,
+        temp_disable_cache: bool = False,
+    ) -> dict[str, Mapping[Any, Any]] | pd.DataFrame:
+        """Get details of many model reactions, metabolites, or genes concurrently.
+
+        :return: A mapping of ID to details, in the order of `ids`, or a dataframe indexed by ID
+        """
+        details = dict([item async for item in self.iter_bulk_model_details(model_id, kind, ids, temp_disable_cache)])
+        details = {item_id: details[item_id] for item_id in dict.fromkeys(ids)}
+        return pd.DataFrame.from_dict(details, orient="index") if as_dataframe else details
+
+    async def iter_bulk_universal_details(
+        self,
+        kind: Literal["reactions", "metabolites"],
+        ids: list[str],
+        temp_disable_cache: bool = False,
+    ) -> AsyncIterator[tuple[str, Mapping[Any, Any]]]:
+        """Yield `(id, details)` for universal reactions or metabolites as each response arrives.
+
+        All requests are scheduled at once and run concurrently under the BiGG rate limit.
+        """
+        async for item in self._iter_details(f"{self.url}/universal/{kind}", ids, temp_disable_cache):
+            yield item
+
+    async def bulk_universal_details(
+        self,
+        kind: Literal["reactions", "metabolites"],
+        ids: list[str],
+        as_dataframe: bool = False,
+        temp_disable_cache: bool = False,
+    ) -> dict[str, Mapping[Any, Any]] | pd.DataFrame:
+        """Get details of many universal reactions or metabolites concurrently.
+
+        :return: A mapping of ID to details, in the order of `ids`, or a dataframe indexed by ID
+        """
+        details = dict([item async for item in self.iter_bulk_universal_details(kind, ids, temp_disable_cache)])
+        details = {item_id: details[item_id] for item_id in dict.fromkeys(ids)}
+        return pd.DataFrame.from_dict(details, orient="index") if as_dataframe else details
+
     async def search(
         self,
         query: str,
@@ -202,3 +574,54 @@ class BiGG(_AsyncHTTPClient):
             )
         )[0]
         return json.loads(response)
+
+    async def search_index(self, refresh: bool = False, with_links: bool = False) -> SearchIndex:
+        """Get the local search index over universal reactions and metabolites.
+
+        The index is built from the universal endpoints once, saved to disk, and reused until the BiGG database
+        version changes or `refresh` is set. An index saved without links is rebuilt when `with_links` is set.
+
+        :param refresh: Rebuild the index even if a saved copy is current
+        :param with_links: Also index cross-reference IDs; this fetches the details of every universal reaction and
+            metabolite, so it is slow the first time
+        :return: The search index
+        """
+        if self._search_index is not None and not refresh and (self._search_index.with_links or not with_links):
+            return self._search_index
+
+        version = (await self.version())["bigg_models_version"]
+        if bigg_search_index_filepath.exists() and not refresh:
+            index, saved_version = SearchIndex.load(bigg_search_index_filepath)
+            if saved_version == version and (index.with_links or not with_links):
+                self._search_index = index
+                return index
+
+        reactions, metabolites = await asyncio.gather(self.universal_reactions(), self.universal_metabolites())
+        index = SearchIndex.from_universal(reactions["results"], metabolites["results"])
+        if with_links:
+            for search_type, listing in (("reactions", reactions), ("metabolites", metabolites)):
+                ids = [item["bigg_id"] for item in listing["results"]]
+                async for bigg_id, details in self.iter_bulk_universal_details(search_type, ids):
+                    index.add_database_links(search_type, bigg_id, details.get("database_links", {}))
+            index.with_links = True
+        await asyncio.to_thread(index.save, bigg_search_index_filepath, version)
+        self._search_index = index
+        return index
+
+    async def local_search(
+        self,
+        queries: str | list[str],
+        search_type: Literal["metabolites", "reactions"] | None = None,
+        limit: int = 10,
+    ) -> list[dict[str, Any]] | dict[str, list[dict[str, Any]]]:
+        """Search universal reactions and metabolites with the local index instead of one request per query.
+
+        :param queries: One query, or many queries to search as a batch
+        :param search_type: Only return this type of result
+        :param limit: The maximum number of results per query
+        :return: The results of a single query, or a mapping of each query to its results
+        """
+        index = await self.search_index()
+        if isinstance(queries, str):
+            return index.search(queries, search_type=search_type, limit=limit)
+        return {query: index.search(query, search_type=search_type, limit=limit) for query in dict.fromkeys(queries)}
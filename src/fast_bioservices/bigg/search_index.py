@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import Any, Literal
+
+_SearchType = Literal["reactions", "metabolites"]
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, entries: Iterable[Mapping[str, Any]] = (), with_links: bool = False):
+        """Search BiGG identifiers, names, and cross-reference links without network requests.
+
+        Exact and prefix matches are found with a binary search over the sorted index terms, which behaves like a
+        compact prefix trie. When there are not enough of those, trigram similarity provides fuzzy matches.
+
+        :param entries: Mappings with "bigg_id", "name", "type" ("reactions" or "metabolites"), and optionally "links"
+        :param with_links: Whether the cross-reference links of every entry have been added
+        """
+        self.with_links: bool = with_links
+        self._entries: list[dict[str, Any]] = [
+            {"bigg_id": e["bigg_id"], "name": e.get("name") or "", "type": e["type"], "links": list(e.get("links", []))}
+            for e in entries
+        ]
+        self._positions: dict[tuple[str, str], int] = {
+            (e["type"], e["bigg_id"]): i for i, e in enumerate(self._entries)
+        }
+        self._built: bool = False
+        self._terms: list[str] = []
+        self._term_entries: list[int] = []
+        self._postings: dict[str, list[int]] = {}
+        self._document_entries: list[int] = []
+        self._document_sizes: list[int] = []
+
+    def __len__(self) -> int:
+        """Return the number of indexed reactions and metabolites."""
+        return len(self._entries)
+
+    @classmethod
+    def from_universal(
+        cls,
+        reactions: Iterable[Mapping[str, Any]],
+        metabolites: Iterable[Mapping[str, Any]],
+    ) -> SearchIndex:
+        """Create an index from the `results` of the universal reactions and metabolites endpoints."""
+        return cls(
+            [*({**r, "type": "reactions"} for r in reactions), *({**m, "type": "metabolites"} for m in metabolites)]
+        )
+
+    def add_database_links(self, search_type: _SearchType, bigg_id: str, database_links: Mapping[str, Any]) -> None:
+        """Index the cross-reference IDs from a universal details response's "database_links" field."""
+        entry = self._entries[self._positions[(search_type, bigg_id)]]
+        links = [link["id"] for database in database_links.values() for link in database if "id" in link]
+        entry["links"] = list(dict.fromkeys([*entry["links"], *links]))
+        self._built = False
+
+    def _build(self) -> None:
+        pairs: list[tuple[str, int]] = []
+        postings: dict[str, list[int]] = defaultdict(list)
+        self._document_entries = []
+        self._document_sizes = []
+
+        for index, entry in enumerate(self._entries):
+            bigg_id = _normalize(entry["bigg_id"])
+            name = _normalize(entry["name"])
+            words = set(_WORDS.findall(name))
+            terms = {bigg_id, name, *words, *(_normalize(link) for link in entry["links"])}
+            pairs.extend((term, index) for term in terms if term)
+
+            # Individual words are fuzzy-matched too, so a misspelled word still matches a long name
+            for text in {bigg_id, name, *(word for word in words if len(word) > 3)} - {""}:
+                grams = _trigrams(text)
+                for gram in grams:
+                    postings[gram].append(len(self._document_entries))
+                self._document_entries.append(index)
+                self._document_sizes.append(len(grams))
+
+        pairs.sort()
+        self._terms = [term for term, _ in pairs]
+        self._term_entries = [index for _, index in pairs]
+        self._postings = dict(postings)
+        self._built = True
+
+    def search(
+        self,
+        query: str,
+        search_type: _SearchType | None = None,
+        limit: int = 10,
+        min_similarity: float = 0.3,
+    ) -> list[dict[str, Any]]:
+        """Find the reactions or metabolites that best match a query.
+
+        :param query: An ID, name, name prefix, or cross-reference ID
+        :param search_type: Only return this type of result
+        :param limit: The maximum number of results
+        :param min_similarity: The minimum trigram similarity, between 0 and 1, for fuzzy matches
+        :return: Matching entries with a "score" between 0 and 1, best match first
+        """
+        if not self._built:
+            self._build()
+
+        normalized = _normalize(query)
+        scores: dict[int, float] = {}
+        for i in range(bisect_left(self._terms, normalized), len(self._terms)):
+            term = self._terms[i]
+            if not term.startswith(normalized):
+                break
+            score = 1.0 if term == normalized else 0.5 + 0.5 * len(normalized) / len(term)
+            scores[self._term_entries[i]] = max(scores.get(self._term_entries[i], 0.0), score)
+
+        if len(scores) < limit:
+            grams = _trigrams(normalized)
+            shared_counts = Counter(document for gram in grams for document in self._postings.get(gram, ()))
+            for document, shared in shared_counts.items():
+                similarity = shared / (len(grams) + self._document_sizes[document] - shared)
+                if similarity >= min_similarity:
+                    index = self._document_entries[document]
+                    scores[index] = max(scores.get(index, 0.0), 0.5 * similarity)
+
+        ranked = sorted(
+            (
+                (score, index)
+                for index, score in scores.items()
+                if search_type is None or self._entries[index]["type"] == search_type
+            ),
+            key=lambda item: (-item[0], self._entries[item[1]]["bigg_id"]),
+        )
+        return [{**self._entries[index], "score": round(score, 4)} for score, index in ranked[:limit]]
+
+    def save(self, path: Path, version: str | None = None) -> None:
+        """Persist the index entries to a JSON file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as o_stream:
+            json.dump({"version": version, "with_links": self.with_links, "entries": self._entries}, o_stream)
+
+    @classmethod
+    def load(cls, path: Path) -> tuple[SearchIndex, str | None]:
+        """Load an index saved with `save`, returning it with the BiGG database version it was built from."""
+        with path.open() as i_stream:
+            data = json.load(i_stream)
+        return cls(data["entries"], with_links=data.get("with_links", False)), data.get("version")
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from itertools import chain
+from pathlib import Path
+from typing import Any, Literal, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from fast_bioservices.bigg.streaming import iter_model_section
+
+
+class StoichiometricMatrix(NamedTuple):
+    """A model's stoichiometric matrix in coordinate (COO) format, with metabolites as rows and reactions as columns.
+
+    :param rows: The metabolite index of each nonzero coefficient
+    :param cols: The reaction index of each nonzero coefficient
+    :param data: The nonzero stoichiometric coefficients
+    :param metabolites: The metabolite ID of each row
+    :param reactions: The reaction ID of each column
+    :param lower_bounds: The lower flux bound of each reaction
+    :param upper_bounds: The upper flux bound of each reaction
+    """
+
+    rows: np.ndarray
+    cols: np.ndarray
+    data: np.ndarray
+    metabolites: np.ndarray
+    reactions: np.ndarray
+    lower_bounds: np.ndarray
+    upper_bounds: np.ndarray
+
+    @classmethod
+    def from_model(cls, model: Mapping[str, Any] | bytes | Path) -> StoichiometricMatrix:
+        """Build the matrix from a parsed JSON model, its bytes, or a downloaded model file.
+
+        Bytes and files are read with `iter_model_section`, so the full model is never held in memory.
+        Metabolites keep the model's order; metabolites used by reactions but not listed in the model are appended.
+        """
+        if isinstance(model, Mapping):
+            reactions: Iterable[Mapping[str, Any]] = model.get("reactions", [])
+            listed = [m["id"] for m in model.get("metabolites", [])]
+        else:
+            reactions = iter_model_section(model, "reactions")
+            listed = [m["id"] for m in iter_model_section(model, "metabolites")]
+
+        reaction_ids: list[str] = []
+        lower_bounds: list[float] = []
+        upper_bounds: list[float] = []
+        stoichiometries: list[dict[str, float]] = []
+        for reaction in reactions:
+            reaction_ids.append(reaction["id"])
+            lower_bounds.append(reaction.get("lower_bound", np.nan))
+            upper_bounds.append(reaction.get("upper_bound", np.nan))
+            stoichiometries.append(reaction.get("metabolites", {}))
+
+        counts = np.fromiter((len(s) for s in stoichiometries), dtype=np.int64, count=len(stoichiometries))
+        metabolite_ids = np.fromiter(chain.from_iterable(stoichiometries), dtype=object, count=int(counts.sum()))
+        coefficients = np.fromiter(
+            chain.from_iterable(s.values() for s in stoichiometries), dtype=np.float64, count=len(metabolite_ids)
+        )
+        index = pd.Index(listed).append(pd.Index(metabolite_ids)).unique()
+
+        return cls(
+            rows=index.get_indexer(metabolite_ids).astype(np.int32),
+            cols=np.repeat(np.arange(len(reaction_ids), dtype=np.int32), counts),
+            data=coefficients,
+            metabolites=index.to_numpy(dtype=str),
+            reactions=np.asarray(reaction_ids, dtype=str),
+            lower_bounds=np.asarray(lower_bounds, dtype=np.float64),
+            upper_bounds=np.asarray(upper_bounds, dtype=np.float64),
+        )
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """The number of metabolites and reactions."""
+        return len(self.metabolites), len(self.reactions)
+
+    def to_csr(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Convert to compressed sparse row format.
+
+        :return: The row pointers, column indices, and values, as used by `scipy.sparse.csr_matrix`
+        """
+        order = np.lexsort((self.cols, self.rows))
+        indptr = np.zeros(self.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.rows, minlength=self.shape[0]), out=indptr[1:])
+        return indptr, self.cols[order], self.data[order]
+
+    def to_dense(self) -> np.ndarray:
+        """Convert to a dense array; only practical for small models."""
+        dense = np.zeros(self.shape, dtype=np.float64)
+        np.add.at(dense, (self.rows, self.cols), self.data)
+        return dense
+
+    def to_scipy(self, fmt: Literal["coo", "csr", "csc"] = "csr") -> Any:
+        """Convert to a SciPy sparse matrix; requires SciPy to be installed."""
+        try:
+            from scipy import sparse
+        except ImportError as e:
+            raise ImportError("SciPy is required for `to_scipy`; install it with `pip install scipy`") from e
+        return sparse.coo_matrix((self.data, (self.rows, self.cols)), shape=self.shape).asformat(fmt)
+
+    def save(self, path: Path) -> None:
+        """Save the matrix as a compressed `.npz` file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as o_stream:
+            np.savez_compressed(o_stream, **self._asdict())
+
+    @classmethod
+    def load(cls, path: Path) -> StoichiometricMatrix:
+        """Load a matrix written by `save`."""
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(**{field: arrays[field] for field in cls._fields})
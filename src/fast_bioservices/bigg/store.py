@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+from collections.abc import Iterable, Iterator, Mapping
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from fast_bioservices.bigg.streaming import iter_model_section, read_model_metadata
+from fast_bioservices.settings import db_filepath
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    model_id TEXT PRIMARY KEY,
+    version TEXT,
+    sha256 TEXT,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reactions (
+    model_id TEXT NOT NULL,
+    reaction_id TEXT NOT NULL,
+    name TEXT,
+    lower_bound REAL,
+    upper_bound REAL,
+    gene_reaction_rule TEXT,
+    subsystem TEXT,
+    PRIMARY KEY (model_id, reaction_id)
+);
+CREATE TABLE IF NOT EXISTS metabolites (
+    model_id TEXT NOT NULL,
+    metabolite_id TEXT NOT NULL,
+    name TEXT,
+    compartment TEXT,
+    formula TEXT,
+    charge INTEGER,
+    PRIMARY KEY (model_id, metabolite_id)
+);
+CREATE TABLE IF NOT EXISTS genes (
+    model_id TEXT NOT NULL,
+    gene_id TEXT NOT NULL,
+    name TEXT,
+    PRIMARY KEY (model_id, gene_id)
+);
+CREATE TABLE IF NOT EXISTS reaction_metabolites (
+    model_id TEXT NOT NULL,
+    reaction_id TEXT NOT NULL,
+    metabolite_id TEXT NOT NULL,
+    coefficient REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reaction_genes (
+    model_id TEXT NOT NULL,
+    reaction_id TEXT NOT NULL,
+    gene_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reaction_metabolites_by_metabolite ON reaction_metabolites (model_id, metabolite_id);
+CREATE INDEX IF NOT EXISTS reaction_metabolites_by_reaction ON reaction_metabolites (model_id, reaction_id);
+CREATE INDEX IF NOT EXISTS reaction_genes_by_gene ON reaction_genes (model_id, gene_id);
+"""
+_MODEL_TABLES = ("reactions", "metabolites", "genes", "reaction_metabolites", "reaction_genes")
+_GENE_RULE_TOKENS = re.compile(r"[^\s()]+")
+
+
+def _genes_in_rule(rule: str | None) -> list[str]:
+    """Extract the gene IDs from a gene-reaction rule such as "(1234_AT1 and 5678_AT1) or 91011_AT1"."""
+    if not rule:
+        return []
+    return list(dict.fromkeys(t for t in _GENE_RULE_TOKENS.findall(rule) if t.lower() not in {"and", "or"}))
+
+
+def _insert_reactions(
+    connection: sqlite3.Connection,
+    model_id: str,
+    reactions: Iterable[Mapping[str, Any]],
+    batch_size: int = 10_000,
+) -> None:
+    """Fill the reactions, reaction_metabolites, and reaction_genes tables in a single pass over the reactions.
+
+    Rows are inserted in batches, so only `batch_size` reactions (and their rows) are held in memory at a time.
+    """
+    rows: list[tuple] = []
+    stoichiometry: list[tuple] = []
+    gene_links: list[tuple] = []
+
+    def flush() -> None:
+        connection.executemany("INSERT INTO reactions VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        connection.executemany("INSERT INTO reaction_metabolites VALUES (?, ?, ?, ?)", stoichiometry)
+        connection.executemany("INSERT INTO reaction_genes VALUES (?, ?, ?)", gene_links)
+        rows.clear()
+        stoichiometry.clear()
+        gene_links.clear()
+
+    for r in reactions:
+        rule = r.get("gene_reaction_rule")
+        rows.append(
+            (model_id, r["id"], r.get("name"), r.get("lower_bound"), r.get("upper_bound"), rule, r.get("subsystem"))
+        )
+        stoichiometry.extend(
+            (model_id, r["id"], m_id, coefficient) for m_id, coefficient in r.get("metabolites", {}).items()
+        )
+        gene_links.extend((model_id, r["id"], gene_id) for gene_id in _genes_in_rule(rule))
+        if len(rows) >= batch_size:
+            flush()
+    flush()
+
+
+class ModelStore:
+    def __init__(self, path: Path = db_filepath):
+        """Store BiGG models locally, indexed for queries that would otherwise need the `model_*` endpoints.
+
+        :param path: The SQLite database file to use
+        """
+        self._path: Path = path
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @property
+    def path(self) -> Path:
+        """Return the path of the database file."""
+        return self._path
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self._path)) as connection, connection:
+            yield connection
+
+    def ingest(self, model: Path | Mapping[str, Any], sha256: str | None = None) -> str:
+        """Add a JSON model to the store, replacing any previous copy of the same model.
+
+        Model files are parsed one section at a time, so the complete model is never held in memory. The reactions are
+        parsed once and fill the reaction, stoichiometry, and gene tables together.
+
+        :param model: A downloaded JSON model file or the already-parsed model
+        :param sha256: The checksum of the downloaded file, recorded for later verification
+        :return: The ID of the ingested model
+        """
+        if isinstance(model, Path):
+            metadata = read_model_metadata(model)
+            reactions: Iterable[Mapping[str, Any]] = iter_model_section(model, "reactions")
+            metabolites: Iterable[Mapping[str, Any]] = iter_model_section(model, "metabolites")
+            genes: Iterable[Mapping[str, Any]] = iter_model_section(model, "genes")
+        else:
+            metadata = model
+            reactions = model.get("reactions", [])
+            metabolites = model.get("metabolites", [])
+            genes = model.get("genes", [])
+
+        model_id: str = metadata["id"]
+        with self._connect() as connection:
+            for table in _MODEL_TABLES:
+                # Table names are constants
+                connection.execute(f"DELETE FROM {table} WHERE model_id = ?", (model_id,))  # noqa: S608
+            connection.execute(
+                "INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?)",
+                (model_id, metadata.get("version"), sha256, datetime.now(timezone.utc).isoformat()),
+            )
+            _insert_reactions(connection, model_id, reactions)
+            connection.executemany(
+                "INSERT INTO metabolites VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (model_id, m["id"], m.get("name"), m.get("compartment"), m.get("formula"), m.get("charge"))
+                    for m in metabolites
+                ),
+            )
+            connection.executemany(
+                "INSERT INTO genes VALUES (?, ?, ?)",
+                ((model_id, g["id"], g.get("name")) for g in genes),
+            )
+        return model_id
+
+    def _query(self, sql: str, params: tuple) -> pd.DataFrame:
+        with self._connect() as connection:
+            return pd.read_sql_query(sql, connection, params=params)
+
+    def models(self) -> pd.DataFrame:
+        """List the models in the store."""
+        return self._query("SELECT * FROM models ORDER BY model_id", ())
+
+    def reactions_with_metabolite(self, model_id: str, metabolite_id: str) -> pd.DataFrame:
+        """Get the reactions of a model that consume or produce a metabolite."""
+        return self._query(
+            "SELECT r.*, rm.coefficient FROM reaction_metabolites rm "
+            "JOIN reactions r ON r.model_id = rm.model_id AND r.reaction_id = rm.reaction_id "
+            "WHERE rm.model_id = ? AND rm.metabolite_id = ? ORDER BY r.reaction_id",
+            (model_id, metabolite_id),
+        )
+
+    def reactions_with_gene(self, model_id: str, gene_id: str) -> pd.DataFrame:
+        """Get the reactions of a model whose gene-reaction rule includes a gene."""
+        return self._query(
+            "SELECT r.* FROM reaction_genes rg "
+            "JOIN reactions r ON r.model_id = rg.model_id AND r.reaction_id = rg.reaction_id "
+            "WHERE rg.model_id = ? AND rg.gene_id = ? ORDER BY r.reaction_id",
+            (model_id, gene_id),
+        )
+
+    def reaction_metabolites(self, model_id: str, reaction_id: str) -> pd.DataFrame:
+        """Get the metabolites and stoichiometric coefficients of a reaction."""
+        return self._query(
+            "SELECT m.*, rm.coefficient FROM reaction_metabolites rm "
+            "JOIN metabolites m ON m.model_id = rm.model_id AND m.metabolite_id = rm.metabolite_id "
+            "WHERE rm.model_id = ? AND rm.reaction_id = ? ORDER BY m.metabolite_id",
+            (model_id, reaction_id),
+        )
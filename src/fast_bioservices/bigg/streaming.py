@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import re
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, Literal, TextIO
+
+_Section = Literal["reactions", "metabolites", "genes"]
+_SECTIONS: tuple[str, ...] = ("reactions", "metabolites", "genes")
+_WHITESPACE = re.compile(r"\s*")
+_STRUCTURE = re.compile(r'[\[\]{}"]')
+_STRING_END = re.compile(r'["\\]')
+_NUMBER_TAIL = re.compile(r"[0-9+\-.eE]*")
+
+
+def _open(source: bytes | Path) -> TextIO:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.TextIOWrapper(io.BytesIO(source), encoding="utf-8")
+    if source.suffix == ".gz":
+        return gzip.open(source, "rt", encoding="utf-8")
+    return source.open(encoding="utf-8")
+
+
+class _Scanner:
+    def __init__(self, stream: TextIO, chunk_size: int):
+        """Read JSON values from a text stream while only holding the unconsumed part of the current chunk."""
+        self._stream: TextIO = stream
+        self._chunk_size: int = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer: str = ""
+        self._pos: int = 0
+        self._eof: bool = False
+
+    def _fill(self) -> None:
+        if self._eof:
+            raise ValueError("Unexpected end of JSON model")
+        chunk = self._stream.read(self._chunk_size)
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        self._eof = not chunk
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or an empty string at the end of the stream."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or self._eof:
+                return self._buffer[self._pos : self._pos + 1]
+            self._fill()
+
+    def expect(self, char: str) -> None:
+        """Consume the next character, which must be `char`."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in JSON model, found '{found}'")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                self._fill()
+                continue
+            # A number that runs to the end of the buffer may continue in the next chunk, and the decoder stops early
+            # at a split fraction or exponent (e.g., "12." decodes as 12), so read on until the number is complete
+            is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+            if self._eof or not (is_number and _NUMBER_TAIL.match(self._buffer, end).end() == len(self._buffer)):
+                self._pos = end
+                return value
+            self._fill()
+
+    def skip(self) -> None:
+        """Move past the next value without creating Python objects for it."""
+        if self.peek() not in ("[", "{"):
+            self.value()
+            return
+
+        depth = 0
+        in_string = False
+        while True:
+            match = (_STRING_END if in_string else _STRUCTURE).search(self._buffer, self._pos)
+            if match is None:
+                self._pos = len(self._buffer)
+                self._fill()
+                continue
+
+            char = match.group()
+            if char == "\\":
+                if match.end() == len(self._buffer):  # the escaped character is in the next chunk
+                    self._pos = match.start()
+                    self._fill()
+                    continue
+                self._pos = match.end() + 1
+                continue
+
+            self._pos = match.end()
+            if char == '"':
+                in_string = not in_string
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def fields(self) -> Iterator[str]:
+        """Yield the keys of the top-level object; the caller must consume each key's value before continuing."""
+        self.expect("{")
+        if self.peek() == "}":
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() != ",":
+                self.expect("}")
+                return
+            self._pos += 1
+
+    def elements(self) -> Iterator[Any]:
+        """Yield the elements of the array that starts at the current position, one at a time."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() != ",":
+                self.expect("]")
+                return
+            self._pos += 1
+
+
+def iter_model_section(source: bytes | Path, section: _Section, chunk_size: int = 1 << 16) -> Iterator[dict[str, Any]]:
+    """Parse the reactions, metabolites, or genes of a JSON model one at a time.
+
+    Only a single item and the current chunk of text are held in memory; other sections are skipped without being
+    decoded. Files ending in ".gz" are decompressed while they are read.
+
+    :param source: The model's JSON bytes or the path to a downloaded model
+    :param section: The list of the model to yield
+    :param chunk_size: The number of characters to read at once
+    :return: An iterator of the section's items; it is empty if the model does not have the section
+    """
+    with _open(source) as stream:
+        scanner = _Scanner(stream, chunk_size)
+        for key in scanner.fields():
+            if key == section:
+                yield from scanner.elements()
+                return
+            scanner.skip()
+
+
+def read_model_metadata(source: bytes | Path, chunk_size: int = 1 << 16) -> dict[str, Any]:
+    """Read the top-level fields of a JSON model (such as "id", "version", and "compartments") without its lists.
+
+    :param source: The model's JSON bytes or the path to a downloaded model
+    :param chunk_size: The number of characters to read at once
+    :return: The model's fields, other than "reactions", "metabolites", and "genes"
+    """
+    metadata: dict[str, Any] = {}
+    with _open(source) as stream:
+        scanner = _Scanner(stream, chunk_size)
+        for key in scanner.fields():
+            if key in _SECTIONS:
+                scanner.skip()
+            else:
+                metadata[key] = scanner.value()
+    return metadata
@@ -1,4 +1,5 @@
-__all__ = ["BioDBNet", "Input", "Output"]
+__all__ = ["BioDBNet", "Input", "Output", "classify_identifiers", "group_identifiers"]
 
 from fast_bioservices.biodbnet.biodbnet import BioDBNet
+from fast_bioservices.biodbnet.identifiers import classify_identifiers, group_identifiers
 from fast_bioservices.biodbnet.nodes import Input, Output
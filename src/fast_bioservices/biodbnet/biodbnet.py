@@ -1,16 +1,51 @@
 from __future__ import annotations
 
 import asyncio
-import io
 import json
 from typing import Literal
 
 import pandas as pd
 from loguru import logger
 
+from fast_bioservices.biodbnet.identifiers import classify_identifiers
 from fast_bioservices.biodbnet.nodes import Input, Output
 from fast_bioservices.common import Taxon, validate_taxon_id
+from fast_bioservices.common.frames import compact_frame, read_tsv
+from fast_bioservices.common.planning import RequestPlan
 from fast_bioservices.fast_http import _AsyncHTTPClient
+from fast_bioservices.settings import download_dir
+
+_MULTI_VALUE_SEPARATOR = "//"
+_MultiMapping = Literal["join", "list", "explode"]
+
+
+def _format_result(df: pd.DataFrame, *, compact: bool, multi_mapping: _MultiMapping) -> pd.DataFrame:
+    """Optionally convert "-" to NA and store identifier columns in compact dtypes."""
+    if not compact:
+        return df
+    return compact_frame(df, multi_mapping=multi_mapping, separator=_MULTI_VALUE_SEPARATOR)
+
+
+def _explode_annotations(
+    df: pd.DataFrame,
+    input_column: str = "InputValue",
+    separator: str = _MULTI_VALUE_SEPARATOR,
+) -> dict[str, pd.DataFrame]:
+    """Split each multi-valued annotation column into a long (input, term) table.
+
+    :param df: The wide dataframe returned by BioDBNet, one row per input value
+    :param input_column: The column containing the input values
+    :param separator: The delimiter BioDBNet uses between multiple values in a single cell
+    :return: A mapping of annotation name to a two-column dataframe with categorical dtypes
+    """
+    tables: dict[str, pd.DataFrame] = {}
+    for column in df.columns.drop(input_column):
+        terms = df[column].astype("string").str.split(separator)
+        long = pd.DataFrame({input_column: df[input_column], column: terms}).explode(column, ignore_index=True)
+        long[column] = long[column].str.strip()
+        long = long[long[column].notna() & ~long[column].isin(["", "-"])]
+        tables[str(column)] = long.astype("category").reset_index(drop=True)
+    return tables
 
 
 class BioDBNet(_AsyncHTTPClient):
@@ -69,14 +104,18 @@ class BioDBNet(_AsyncHTTPClient):
         self,
         taxon: Taxon | int,
         as_dataframe: bool = False,
+        compact: bool = False,
     ) -> pd.DataFrame | list[dict[str, str]]:
-        """Get all pathways."""
+        """Get all pathways.
+
+        :param compact: Convert "-" to NA and use compact dtypes; only applies when `as_dataframe` is True
+        """
         taxon_id = await validate_taxon_id(taxon)
 
         url = f"{self.url}?method=getpathways&pathways=1&taxonId={taxon_id}"
         response = (await self._get(url))[0].decode()
         as_json = json.loads(response)
-        return pd.DataFrame(as_json) if as_dataframe else as_json
+        return _format_result(pd.DataFrame(as_json), compact=compact, multi_mapping="join") if as_dataframe else as_json
 
     async def get_pathway_from_database(
         self,
@@ -84,8 +123,12 @@ class BioDBNet(_AsyncHTTPClient):
         | list[Literal["reactome", "biocarta", "ncipid", "kegg"]],
         taxon: Taxon | int = Taxon.HOMO_SAPIENS,
         as_dataframe: bool = True,
+        compact: bool = False,
     ) -> pd.DataFrame | list[dict[str, str]]:
-        """Get pathways from a specific database."""
+        """Get pathways from a specific database.
+
+        :param compact: Convert "-" to NA and use compact dtypes; only applies when `as_dataframe` is True
+        """
         taxon_id = await validate_taxon_id(taxon)
 
         if isinstance(pathways, str):
@@ -94,7 +137,7 @@ class BioDBNet(_AsyncHTTPClient):
         url = f"{self.url}?method=getpathways&pathways={','.join(sorted(pathways))}&taxonId={taxon_id}"
         response = (await self._get(url))[0].decode()
         as_json = json.loads(response)
-        return pd.DataFrame(as_json) if as_dataframe else as_json
+        return _format_result(pd.DataFrame(as_json), compact=compact, multi_mapping="join") if as_dataframe else as_json
 
     async def async_db2db(
         self,
@@ -102,9 +145,22 @@ class BioDBNet(_AsyncHTTPClient):
         input_db: Input,
         output_db: Output | list[Output],
         taxon: Taxon | int = Taxon.HOMO_SAPIENS,
+        compact: bool = False,
+        multi_mapping: _MultiMapping = "join",
     ):
-        """Async conversion from one database to another."""
-        return await self._db2db(values=values, input_db=input_db, output_db=output_db, taxon=taxon)
+        """Async conversion from one database to another.
+
+        :param compact: Convert "-" to NA and store identifier columns as categorical or string dtypes
+        :param multi_mapping: With `compact`, keep "//"-joined mappings ("join"), split them ("list"), or "explode" them
+        """
+        return await self._db2db(
+            values=values,
+            input_db=input_db,
+            output_db=output_db,
+            taxon=taxon,
+            compact=compact,
+            multi_mapping=multi_mapping,
+        )
 
     def db2db(
         self,
@@ -112,9 +168,24 @@ class BioDBNet(_AsyncHTTPClient):
         input_db: Input,
         output_db: Output | list[Output],
         taxon: Taxon | int = Taxon.HOMO_SAPIENS,
+        compact: bool = False,
+        multi_mapping: _MultiMapping = "join",
     ):
-        """Sync conversion from one database to another."""
-        return asyncio.run(self._db2db(values=values, input_db=input_db, output_db=output_db, taxon=taxon))
+        """Sync conversion from one database to another.
+
+        :param compact: Convert "-" to NA and store identifier columns as categorical or string dtypes
+        :param multi_mapping: With `compact`, keep "//"-joined mappings ("join"), split them ("list"), or "explode" them
+        """
+        return asyncio.run(
+            self._db2db(
+                values=values,
+                input_db=input_db,
+                output_db=output_db,
+                taxon=taxon,
+                compact=compact,
+                multi_mapping=multi_mapping,
+            )
+        )
 
     async def _db2db(
         self,
@@ -122,6 +193,8 @@ class BioDBNet(_AsyncHTTPClient):
         input_db: Input,
         output_db: Output | list[Output],
         taxon: Taxon | int = Taxon.HOMO_SAPIENS,
+        compact: bool = False,
+        multi_mapping: _MultiMapping = "join",
     ) -> pd.DataFrame:
         taxon_id = await validate_taxon_id(taxon)
 
@@ -142,7 +215,8 @@ class BioDBNet(_AsyncHTTPClient):
         logger.debug(f"Got an input database with a value of '{input_db.value.lower().replace(' ', '')}'")
         logger.debug(f"Got {len(output_db_value.split(','))} output databases with values of: '{output_db_value}'")
 
-        values.sort()
+        plan = RequestPlan(values, self._chunk_size)
+        logger.debug(f"Requesting {len(plan.unique)} unique values ({plan.duplicates} duplicates skipped)")
         urls: list[str] = [
             (
                 f"{self.url}?"
@@ -150,27 +224,33 @@ class BioDBNet(_AsyncHTTPClient):
                 f"format=row&"
                 f"input={input_db.value.lower().replace(' ', '')}&"
                 f"outputs={output_db_value}&"
-                f"inputValues={','.join(values[i:i + self._chunk_size])}&"
+                f"inputValues={','.join(chunk)}&"
                 f"taxonId={taxon_id}"
             )
-            for i in range(0, len(values), self._chunk_size)
+            for chunk in plan.chunks
         ]
         responses: list[str] = [
             item
             for response in await self._get(urls=urls, extensions={"force_cache": True})
             for item in json.loads(response.decode())
         ]
-        df = pd.DataFrame(responses).rename(columns={"InputValue": input_db.value})
+        df = plan.align(pd.DataFrame(responses), on="InputValue").rename(columns={"InputValue": input_db.value})
         logger.debug(f"Returning dataframe with {len(df)} rows")
-        return df
+        return _format_result(df, compact=compact, multi_mapping=multi_mapping)
 
     async def db_walk(
         self,
         values: list[str],
         db_path: list[Input | Output],
         taxon: Taxon | int = Taxon.HOMO_SAPIENS,
+        compact: bool = False,
+        multi_mapping: _MultiMapping = "join",
     ) -> pd.DataFrame:
-        """Determine the edges to go from one database to another."""
+        """Determine the edges to go from one database to another.
+
+        :param compact: Convert "-" to NA and store identifier columns as categorical or string dtypes
+        :param multi_mapping: With `compact`, keep "//"-joined mappings ("join"), split them ("list"), or "explode" them
+        """
         taxon_id = await validate_taxon_id(taxon)
 
         for i in range(len(db_path) - 1):
@@ -185,33 +265,33 @@ class BioDBNet(_AsyncHTTPClient):
         logger.debug("Databases are valid")
         databases: list[str] = [d.value.replace(" ", "").lower() for d in db_path]
 
-        values.sort()
+        plan = RequestPlan(values, self._chunk_size)
         databases.sort()
         urls: list[str] = []
-        for i in range(0, len(values), self._chunk_size):
+        for chunk in plan.chunks:
             urls.append(  # noqa: PERF401, do not require list comprehensions
                 f"{self.url}?method=dbwalk&"
                 f"format=row&"
-                f"inputValues={','.join(values[i:i + self._chunk_size])}&"
+                f"inputValues={','.join(chunk)}&"
                 f"dbPath={'->'.join(databases)}&"
                 f"taxonId={taxon_id}"
             )
 
         responses: list[bytes] = [item for response in await self._get(urls) for item in json.loads(response)]
-        df = pd.DataFrame(responses).rename(columns={"InputValue": str(db_path[0].value)})
+        df = plan.align(pd.DataFrame(responses), on="InputValue").rename(columns={"InputValue": str(db_path[0].value)})
         logger.debug(f"Returning dataframe with {len(df)} rows")
-        return df
+        return _format_result(df, compact=compact, multi_mapping=multi_mapping)
 
     async def db_report(self, values: list[str], input_db: Input | Output, taxon: Taxon | int = Taxon.HOMO_SAPIENS):
         """Report all database identifiers and annotations related to the input."""
         taxon_id = await validate_taxon_id(taxon)
         urls: list[str] = []
-        for i in range(0, len(values), self._chunk_size):
+        for chunk in RequestPlan(values, self._chunk_size).chunks:
             urls.append(  # noqa: PERF401, do not require list comprehensions
                 f"{self.url}?method=dbreport&"
                 f"format=row&"
                 f"input={input_db.value.replace(' ', '').lower()}&"
-                f"inputValues={','.join(values[i:i + self._chunk_size])}&"
+                f"inputValues={','.join(chunk)}&"
                 f"taxonId={taxon_id}"
             )
         return NotImplementedError
@@ -221,25 +301,53 @@ class BioDBNet(_AsyncHTTPClient):
         values: list[str],
         output_db: Output | list[Output],
         taxon: Taxon | int = Taxon.HOMO_SAPIENS,
+        compact: bool = False,
+        multi_mapping: _MultiMapping = "join",
     ) -> pd.DataFrame:
-        """Determine the database of input values."""
+        """Determine the database of input values.
+
+        :param compact: Convert "-" to NA and store identifier columns as categorical or string dtypes
+        :param multi_mapping: With `compact`, keep "//"-joined mappings ("join"), split them ("list"), or "explode" them
+        """
         taxon_id = await validate_taxon_id(taxon)
-        values = sorted(values)
+        plan = RequestPlan(values, self._chunk_size)
         urls: list[str] = []
         output_db: list[Output] = [output_db] if isinstance(output_db, Output) else output_db
 
         for out_db in output_db:
-            for i in range(0, len(values), self._chunk_size):
+            for chunk in plan.chunks:
                 urls.append(  # noqa: PERF401, do not require list comprehensions
                     f"{self.url}?method=dbfind&"
                     f"format=row&"
-                    f"inputValues={','.join(values[i:i + self._chunk_size])}&"
+                    f"inputValues={','.join(chunk)}&"
                     f"output={out_db.value.lower().replace(' ', '')}&taxonId={taxon_id}"
                 )
         all_responses = []
         for response in await self._get(urls=urls):
             all_responses.extend(json.loads(response.decode()))
-        df = pd.DataFrame(all_responses).groupby("InputValue", as_index=False).first()
+        df = plan.align(pd.DataFrame(all_responses).groupby("InputValue", as_index=False).first(), on="InputValue")
+        return _format_result(df, compact=compact, multi_mapping=multi_mapping)
+
+    async def db_identify(
+        self,
+        values: list[str],
+        taxon: Taxon | int = Taxon.HOMO_SAPIENS,
+    ) -> pd.DataFrame:
+        """Determine the input database of each value, using `db_find` only for values not classifiable locally.
+
+        :param values: The identifiers to classify
+        :param taxon: The taxon used for values that require a network lookup
+        :return: A dataframe with "InputValue" and "Input Type" columns, aligned with `values`
+        """
+        df = pd.DataFrame({"InputValue": values, "Input Type": classify_identifiers(values).astype(object)})
+        unknown: list[str] = df.loc[df["Input Type"].isna(), "InputValue"].unique().tolist()
+        logger.debug(f"Classified {len(df) - len(unknown)} of {len(df)} values locally")
+
+        if unknown:
+            found = await self.db_find(values=unknown, output_db=Output.GENE_ID, taxon=taxon)
+            if "Input Type" in found.columns:
+                network_types = found.set_index("InputValue")["Input Type"].replace("-", pd.NA)
+                df["Input Type"] = df["Input Type"].fillna(df["InputValue"].map(network_types))
         return df
 
     async def db_ortho(
@@ -249,24 +357,27 @@ class BioDBNet(_AsyncHTTPClient):
         output_db: Output | list[Output],
         input_taxon: Taxon | int = Taxon.HOMO_SAPIENS,
         output_taxon: Taxon | int = Taxon.MUS_MUSCULUS,
+        compact: bool = False,
+        multi_mapping: _MultiMapping = "join",
     ):
-        """Run ortholog conversions for the given input."""
+        """Run ortholog conversions for the given input.
+
+        :param compact: Convert "-" to NA and store identifier columns as categorical or string dtypes
+        :param multi_mapping: With `compact`, keep "//"-joined mappings ("join"), split them ("list"), or "explode" them
+        """
         input_taxon_value, output_taxon_value = await asyncio.gather(
             *[validate_taxon_id(input_taxon), validate_taxon_id(output_taxon)]
         )
 
-        if isinstance(output_db, Output):
-            output_db = [output_db]
-
-        output_db.sort()
-        values.sort()
+        output_db = sorted([output_db] if isinstance(output_db, Output) else output_db, key=lambda o: o.value)
+        plan = RequestPlan(values, self._chunk_size)
         urls: list[str] = []
         for out_db in output_db:
-            for i in range(0, len(values), self._chunk_size):
+            for chunk in plan.chunks:
                 urls.append(  # noqa: PERF401, do not require list comprehensions
                     f"{self.url}?method=dbortho&"
                     f"input={input_db.value.replace(' ', '').lower()}&"
-                    f"inputValues={','.join(values[i:i + self._chunk_size])}&"
+                    f"inputValues={','.join(chunk)}&"
                     f"inputTaxon={input_taxon_value}&"
                     f"outputTaxon={output_taxon_value}&"
                     f"output={out_db.value.replace(' ', '').lower()}&"
@@ -274,16 +385,13 @@ class BioDBNet(_AsyncHTTPClient):
                 )
 
         responses: list[bytes] = [item for response in await self._get(urls) for item in json.loads(response)]
-        df = pd.DataFrame(responses).rename(columns={"InputValue": input_db.value})
-
-        # Remove potential duplicate columns
-        for column in df.columns:
-            if str(column).endswith("_x"):
-                df = df.drop(column, axis=1)
-            elif str(column).endswith("_y"):
-                df.rename(columns={column: column[:-2]}, inplace=True)
+        df = pd.DataFrame(responses)
+        if not df.empty:
+            # Each output database is requested separately; combine them into a single row per input value
+            df = df.groupby("InputValue", as_index=False, sort=False).first()
+        df = plan.align(df, on="InputValue").rename(columns={"InputValue": input_db.value})
 
-        return df
+        return _format_result(df, compact=compact, multi_mapping=multi_mapping)
 
     async def db_annot(
         self,
@@ -299,32 +407,56 @@ class BioDBNet(_AsyncHTTPClient):
             ]
         ],
         taxon: Taxon | int = Taxon.HOMO_SAPIENS,
-    ) -> pd.DataFrame:
-        """Annotate biological identifiers."""
+    ) -> dict[str, pd.DataFrame]:
+        """Annotate biological identifiers.
+
+        Multi-valued annotations are split into one long table per annotation type, keyed by the annotation name.
+        Each table has an ``InputValue`` column and a column of the same name as the annotation, both categorical.
+        """
         taxon_id = await validate_taxon_id(taxon)
         annotation = [a.replace(" ", "").lower() for a in sorted(annotation)]
 
-        values.sort()
+        plan = RequestPlan(values, self._chunk_size)
         urls: list[str] = []
-        for i in range(0, len(values), self._chunk_size):
+        for chunk in plan.chunks:
             urls.append(  # noqa: PERF401, do not require list comprehensions
                 f"{self.url}?method=dbannot&"
-                f"inputValues={','.join(values[i:i + self._chunk_size])}&"
+                f"inputValues={','.join(chunk)}&"
                 f"taxonId={taxon_id}&"
                 f"annotations={','.join(annotation)}&"
                 f"format=row"
             )
 
-        responses: list[bytes] = await self._get(urls=urls)
-        return pd.DataFrame(responses)
+        rows: list[dict[str, str]] = [item for response in await self._get(urls=urls) for item in json.loads(response)]
+        if not rows:
+            return {}
+        tables = _explode_annotations(plan.align(pd.DataFrame(rows), on="InputValue"))
+        logger.debug(f"Returning {len(tables)} annotation tables")
+        return tables
 
-    async def db_org(self, input_db: Input, output_db: Output, taxon: Taxon | int = Taxon.HOMO_SAPIENS) -> pd.DataFrame:
-        """Organism-wide conversions."""
+    async def db_org(
+        self,
+        input_db: Input,
+        output_db: Output,
+        taxon: Taxon | int = Taxon.HOMO_SAPIENS,
+        compact: bool = False,
+        multi_mapping: _MultiMapping = "join",
+        memory_map: bool = False,
+    ) -> pd.DataFrame:
+        """Organism-wide conversions.
+
+        The organism table is streamed to disk (resuming interrupted transfers) and parsed directly from the file.
+        When the cache is enabled, a previously downloaded table is reused.
+
+        :param compact: Convert "-" to NA and store identifier columns as categorical or string dtypes
+        :param multi_mapping: With `compact`, keep "//"-joined mappings ("join"), split them ("list"), or "explode" them
+        """
         taxon_id = await validate_taxon_id(taxon)
         input_db_val = input_db.value.replace(" ", "_")
         output_db_val = output_db.value.replace(" ", "_")
 
-        url = f"https://biodbnet-abcc.ncifcrf.gov/db/dbOrgDwnld.php?file={input_db_val}__to__{output_db_val}_{taxon_id}"
-        response = await self._get(url)
-        buffer = io.StringIO(response[0].decode())
-        return pd.read_csv(buffer, sep="\t", header=None, names=[input_db.value, output_db.value])
+        filename = f"{input_db_val}__to__{output_db_val}_{taxon_id}"
+        url = f"https://biodbnet-abcc.ncifcrf.gov/db/dbOrgDwnld.php?file={filename}"
+        filepath = await self._download(url, download_dir / "biodbnet" / f"{filename}.tsv", overwrite=not self._cache)
+        df = read_tsv(filepath, names=[input_db.value, output_db.value], memory_map=memory_map)
+        return _format_result(df, compact=compact, multi_mapping=multi_mapping)
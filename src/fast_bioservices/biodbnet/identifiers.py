@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable
+
+import numpy as np
+import pandas as pd
+
+from fast_bioservices.biodbnet.nodes import Input
+
+# Patterns are tried in order; the first full match wins. More specific namespaces must come before broader ones
+# (e.g., RefSeq before UniProt entry names, and UniProt/GenBank accessions before the Entrez and gene symbol fallbacks)
+_PATTERNS: list[tuple[Input, re.Pattern]] = [
+    (node, re.compile(pattern))
+    for node, pattern in [
+        (Input.ENSEMBL_GENE_ID, r"ENS[A-Z]*G\d{11}(?:\.\d+)?"),
+        (Input.ENSEMBL_TRANSCRIPT_ID, r"ENS[A-Z]*T\d{11}(?:\.\d+)?"),
+        (Input.ENSEMBL_PROTEIN_ID, r"ENS[A-Z]*P\d{11}(?:\.\d+)?"),
+        (Input.REFSEQ_MRNA_ACCESSION, r"[NX][MR]_\d+(?:\.\d+)?"),
+        (Input.REFSEQ_PROTEIN_ACCESSION, r"[NXYAW]P_\d+(?:\.\d+)?"),
+        (Input.REFSEQ_GENOMIC_ACCESSION, r"(?:AC|NC|NG|NT|NW|NZ)_[A-Z0-9]+(?:\.\d+)?"),
+        (Input.HGNC_ID, r"HGNC:\d+"),
+        (Input.MGI_ID, r"MGI:\d+"),
+        (Input.GO_ID, r"GO:\d{7}"),
+        (Input.MIRBASE_MATURE_MIRNA_ACC, r"MIMAT\d{7}"),
+        (Input.MIRBASE_ID, r"[a-z]{3,4}-(?:mir|miR|let|lin|bantam)-?[\w\-*]+"),
+        (Input.HMDB_METABOLITE, r"HMDB\d{5,7}"),
+        (Input.DRUGBANK_DRUG_ID, r"DB\d{5}"),
+        (Input.KEGG_COMPOUND_ID, r"C\d{5}"),
+        (Input.KEGG_DRUG_ID, r"D\d{5}"),
+        (Input.KEGG_DISEASE_ID, r"H\d{5}"),
+        (Input.KEGG_PATHWAY_ID, r"[a-z]{2,4}\d{5}"),
+        (Input.KEGG_GENE_ID, r"[a-z]{3,4}:[\w.\-]+"),
+        (Input.INTERPRO_ID, r"IPR\d{6}"),
+        (Input.PFAM_ID, r"PF\d{5}"),
+        (Input.IPI_ID, r"IPI\d{8}(?:\.\d+)?"),
+        (Input.H_INV_LOCUS_ID, r"HIX\d{7}"),
+        (Input.H_INV_TRANSCRIPT_ID, r"HIT\d{9}(?:\.\d+)?"),
+        (Input.H_INV_PROTEIN_ID, r"HIP\d{9}(?:\.\d+)?"),
+        (Input.FLYBASE_GENE_ID, r"FBgn\d{7}"),
+        (Input.SGD_ID, r"S\d{9}"),
+        (Input.TAIR_ID, r"AT[1-5CM]G\d{5}(?:\.\d+)?"),
+        (Input.DBSNP_ID, r"rs\d+"),
+        (Input.UNIGENE_ID, r"[A-Z][a-z]{1,3}\.\d+"),
+        (Input.EC_NUMBER, r"\d+\.(?:\d+|-)\.(?:\d+|-)\.(?:n?\d+|-)"),
+        (Input.ILLUMINA_ID, r"ILMN_\d+"),
+        (Input.AGILENT_ID, r"A_\d{2}_P\d+"),
+        (Input.AFFY_ID, r"AFFX-[\w\-.]+|[\w\-.]+_at"),
+        (Input.UNIPROT_ACCESSION, r"(?:[OPQ]\d[A-Z0-9]{3}\d|[A-NR-Z]\d(?:[A-Z][A-Z0-9]{2}\d){1,2})(?:-\d+)?"),
+        (Input.UNIPROT_ENTRY_NAME, r"[A-Z0-9]{1,10}_[A-Z0-9]{1,5}"),
+        (Input.GENBANK_PROTEIN_ACCESSION, r"[A-Z]{3}\d{5}(?:\.\d+)?"),
+        (Input.GENBANK_NUCLEOTIDE_ACCESSION, r"[A-Z]{1,2}\d{5,6}(?:\.\d+)?"),
+        (Input.PDB_ID, r"\d(?=[A-Z0-9]*[A-Z])[A-Z0-9]{3}"),
+        (Input.GENE_ID, r"\d+"),
+        (Input.GENE_SYMBOL, r"[A-Za-z][A-Za-z0-9\-.@/]*"),
+    ]
+]
+_SYMBOL_SHAPE: re.Pattern = _PATTERNS[-1][1]
+# Accessions without a distinctive prefix or separator; gene symbols such as H2BC12, P2RY12, or B3GAT1 also match them
+_LOOSE: frozenset[Input] = frozenset(
+    {
+        Input.KEGG_COMPOUND_ID,
+        Input.KEGG_DRUG_ID,
+        Input.KEGG_DISEASE_ID,
+        Input.SGD_ID,
+        Input.UNIPROT_ACCESSION,
+        Input.GENBANK_PROTEIN_ACCESSION,
+        Input.GENBANK_NUCLEOTIDE_ACCESSION,
+    }
+)
+
+
+def classify_identifiers(values: str | Iterable[str]) -> pd.Series:
+    """Determine the BioDBNet input database of each identifier using only local pattern matching.
+
+    Each compiled pattern is applied as a single vectorized pass over the values that are still unclassified.
+
+    :param values: The identifiers to classify
+    :return: A categorical series of `Input` values aligned with `values`; unrecognized identifiers, and identifiers
+        that match both a loose accession pattern and the shape of a gene symbol, are NA
+    """
+    series = pd.Series([values] if isinstance(values, str) else list(values), dtype=object)
+    stripped = series.str.strip()
+    result = np.full(len(series), None, dtype=object)
+    remaining = stripped.notna().to_numpy(dtype=bool)
+
+    for node, pattern in _PATTERNS:
+        if not remaining.any():
+            break
+        candidates = np.flatnonzero(remaining)
+        matched = candidates[stripped.iloc[candidates].str.fullmatch(pattern).to_numpy(dtype=bool, na_value=False)]
+        remaining[matched] = False
+        if node in _LOOSE:
+            # Leave ambiguous values unclassified, so callers such as `BioDBNet.db_identify` look them up instead
+            symbol_shaped = stripped.iloc[matched].str.fullmatch(_SYMBOL_SHAPE).to_numpy(dtype=bool, na_value=False)
+            matched = matched[~symbol_shaped]
+        result[matched] = node.value
+
+    categories = list(dict.fromkeys(node.value for node, _ in _PATTERNS))
+    return pd.Series(pd.Categorical(result, categories=categories), index=series.index, name="Input Type")
+
+
+def group_identifiers(values: str | Iterable[str]) -> dict[Input | None, list[str]]:
+    """Group identifiers by their locally-classified input database.
+
+    :param values: The identifiers to group
+    :return: A mapping of `Input` to the identifiers of that type; unclassified identifiers are found under `None`
+    """
+    series = pd.Series([values] if isinstance(values, str) else list(values), dtype=object)
+    types = classify_identifiers(series)
+    groups: dict[Input | None, list[str]] = {
+        Input(str(node)): group.tolist() for node, group in series.groupby(types, observed=True, sort=False)
+    }
+    if types.isna().any():
+        groups[None] = series[types.isna().to_numpy()].tolist()
+    return groups
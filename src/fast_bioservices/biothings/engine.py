@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import json
+from collections.abc import AsyncIterator, Iterable, Mapping
+from typing import Any
+
+from fast_bioservices.common.planning import RequestPlan
+from fast_bioservices.fast_http import _AsyncHTTPClient
+
+_EMAIL_PARAM: str = "&email=joshloecker@icloud.com"
+
+
+def _fields_param(fields: str | list[str]) -> str:
+    return fields if isinstance(fields, str) else ",".join(fields)
+
+
+class BioThings(_AsyncHTTPClient):
+    def __init__(self, cache: bool, base_url: str, chunk_size: int = 1000, max_requests_per_second: int = 5):
+        """Batch, query, and scroll requests shared by the BioThings APIs (MyGene, MyChem, MyVariant, and MyDisease).
+
+        :param cache: Should cache be used
+        :param base_url: The versioned root URL of the API, such as "https://mygene.info/v3"
+        :param chunk_size: The maximum number of IDs or query terms in a single POST request
+        :param max_requests_per_second: The maximum number of requests to send per second
+        """
+        self._base_url: str = base_url
+        self._chunk_size: int = chunk_size
+        super().__init__(cache=cache, max_requests_per_second=max_requests_per_second)
+
+    def _default_params(self) -> dict[str, Any]:
+        """Query parameters added to every request, such as MyVariant's genome assembly."""
+        return {}
+
+    def _url(self, path: str, params: Mapping[str, Any]) -> str:
+        return f"{self._base_url}/{path}?" + "&".join(f"{key}={value}" for key, value in params.items())
+
+    async def _post(self, url, **kwargs) -> list[bytes]:
+        url += _EMAIL_PARAM
+        return await super()._post(url, **kwargs)
+
+    async def _post_batches(self, url: str, plan: RequestPlan, body_key: str, temp_disable_cache: bool) -> list[dict]:
+        data = [json.dumps({body_key: chunk}) for chunk in plan.chunks]
+        responses = await self._post(
+            url,
+            data=data,
+            headers={"Content-type": "application/json"},
+            temp_disable_cache=temp_disable_cache,
+        )
+        results = []
+        for response in responses:
+            results.extend(json.loads(response))
+        return plan.align_records(results, key="query")
+
+    async def _evict_batches(self, url: str, plan: RequestPlan, body_key: str, stale: Iterable[str]) -> int:
+        """Remove the cached responses of the batches in `plan` that requested any of the `stale` values.
+
+        :return: The number of batches whose responses were removed
+        """
+        stale = set(stale)
+        chunks = [chunk for chunk in plan.chunks if stale.intersection(chunk)]
+        for chunk in chunks:
+            await self._evict("POST", url + _EMAIL_PARAM, data=json.dumps({body_key: chunk}))
+        return len(chunks)
+
+    def _annotations_url(self, endpoint: str, params: Mapping[str, Any] | None, fields: str | list[str] | None) -> str:
+        params = {**self._default_params(), **(params or {})}
+        if fields is not None:
+            params["fields"] = _fields_param(fields)
+        return self._url(endpoint, params)
+
+    def _query_url(
+        self,
+        params: Mapping[str, Any] | None,
+        scopes: str | list[str] | None,
+        fields: str | list[str],
+    ) -> str:
+        params = {
+            **self._default_params(),
+            **(params or {}),
+            "size": self._chunk_size,
+            "dotfield": "true",
+            "fields": _fields_param(fields),
+        }
+        if scopes is not None:
+            params["scopes"] = scopes if isinstance(scopes, str) else ",".join(scopes)
+        return self._url("query", params)
+
+    async def _annotations(
+        self,
+        endpoint: str,
+        ids: str | list[str],
+        params: Mapping[str, Any] | None = None,
+        fields: str | list[str] | None = None,
+        temp_disable_cache: bool = False,
+    ) -> list[dict]:
+        """Get the documents of many IDs from an annotation endpoint (e.g., "gene" or "variant") in batches.
+
+        :param endpoint: The annotation endpoint of the API
+        :param ids: The IDs to get; duplicates are only requested once
+        :param params: Additional query parameters, such as "species"
+        :param fields: Only return these fields; all fields are returned by default
+        :param temp_disable_cache: Temporarily disable the cache for these requests
+        :return: One or more documents per ID, in the order of `ids`
+        """
+        url = self._annotations_url(endpoint, params, fields)
+        return await self._post_batches(url, RequestPlan(ids, self._chunk_size), "ids", temp_disable_cache)
+
+    async def _evict_annotations(
+        self,
+        endpoint: str,
+        ids: str | list[str],
+        stale: Iterable[str],
+        params: Mapping[str, Any] | None = None,
+        fields: str | list[str] | None = None,
+    ) -> int:
+        """Remove the cached batches of an `_annotations` request that contain any of the `stale` IDs.
+
+        The other arguments must match the original request, because they determine its batches and cache keys.
+        """
+        url = self._annotations_url(endpoint, params, fields)
+        return await self._evict_batches(url, RequestPlan(ids, self._chunk_size), "ids", stale)
+
+    async def _query(
+        self,
+        items: str | list[str],
+        params: Mapping[str, Any] | None = None,
+        scopes: str | list[str] | None = None,
+        fields: str | list[str] = "all",
+        temp_disable_cache: bool = False,
+    ) -> list[dict]:
+        """Search for many query terms in batches.
+
+        :param items: The query terms; duplicates are only requested once
+        :param params: Additional query parameters, such as "species"
+        :param scopes: The fields to query against
+        :param fields: Only return these fields, using dotted names; defaults to all fields
+        :param temp_disable_cache: Temporarily disable the cache for these requests
+        :return: The hits of each query term, in the order of `items`
+        """
+        url = self._query_url(params, scopes, fields)
+        return await self._post_batches(url, RequestPlan(items, self._chunk_size), "q", temp_disable_cache)
+
+    async def _evict_query(
+        self,
+        items: str | list[str],
+        stale: Iterable[str],
+        params: Mapping[str, Any] | None = None,
+        scopes: str | list[str] | None = None,
+        fields: str | list[str] = "all",
+    ) -> int:
+        """Remove the cached batches of a `_query` request that contain any of the `stale` query terms.
+
+        The other arguments must match the original request, because they determine its batches and cache keys.
+        """
+        url = self._query_url(params, scopes, fields)
+        return await self._evict_batches(url, RequestPlan(items, self._chunk_size), "q", stale)
+
+    async def _fetch_all(
+        self,
+        q: str,
+        params: Mapping[str, Any] | None = None,
+        scopes: str | list[str] | None = None,
+        fields: str | list[str] = "all",
+    ) -> AsyncIterator[dict]:
+        """Stream every hit of a query, following the API's scroll IDs instead of truncating at `size` hits.
+
+        Hits are yielded one page (up to 1,000 hits) at a time. Scroll pages expire on the server, so they are never
+        cached.
+
+        :param q: The query string
+        :param params: Additional query parameters, such as "species"
+        :param scopes: The fields to query against
+        :param fields: Only return these fields, using dotted names; defaults to all fields
+        :return: An async iterator of hits
+        """
+        params = {
+            "q": q,
+            **self._default_params(),
+            **(params or {}),
+            "fetch_all": "true",
+            "dotfield": "true",
+            "fields": _fields_param(fields),
+        }
+        if scopes is not None:
+            params["scopes"] = scopes if isinstance(scopes, str) else ",".join(scopes)
+
+        url = self._url("query", params)
+        while True:
+            page = json.loads((await self._get(url, temp_disable_cache=True, log_on_complete=False))[0])
+            hits = page.get("hits", [])
+            for hit in hits:
+                yield hit
+
+            # The final page is an error response ("No results to return") without hits
+            if not hits or "_scroll_id" not in page:
+                return
+            url = self._url("query", {"scroll_id": page["_scroll_id"]})
+
+
+class _UnscopedBioThings(BioThings):
+    """A BioThings API whose queries take no species, such as MyChem, MyVariant, or MyDisease.
+
+    MyGene queries require a taxon, so `MyGene` defines its own `query` and `fetch_all` instead of inheriting these.
+    """
+
+    async def query(
+        self,
+        items: str | list[str],
+        scopes: str | list[str] | None = None,
+        fields: str | list[str] = "all",
+        temp_disable_cache: bool = False,
+    ) -> list[dict]:
+        """Search for many items.
+
+        :param items: The items to obtain information for
+        :param scopes: The fields to query against
+        :param fields: Only return these fields, using dotted names; defaults to all fields
+        :param temp_disable_cache: Temporarily disable the cache for these requests
+        :return: The hits of each item, in the order of `items`
+        """
+        return await self._query(items, scopes=scopes, fields=fields, temp_disable_cache=temp_disable_cache)
+
+    async def fetch_all(
+        self,
+        q: str,
+        scopes: str | list[str] | None = None,
+        fields: str | list[str] = "all",
+    ) -> AsyncIterator[dict]:
+        """Stream every hit of a query, following the API's scroll IDs instead of truncating at `size` hits.
+
+        :param q: The query string
+        :param scopes: The fields to query against
+        :param fields: Only return these fields, using dotted names; defaults to all fields
+        :return: An async iterator of hits
+        """
+        async for hit in self._fetch_all(q, scopes=scopes, fields=fields):
+            yield hit
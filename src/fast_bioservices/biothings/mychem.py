@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from fast_bioservices.biothings.engine import _UnscopedBioThings
+
+
+class MyChem(_UnscopedBioThings):
+    def __init__(self, cache: bool = True):
+        """Initiate connection to MyChem.info.
+
+        :param cache: Should cache be used
+        """
+        super().__init__(cache=cache, base_url="https://mychem.info/v1")
+
+    async def chem(
+        self,
+        ids: str | list[str],
+        fields: str | list[str] | None = None,
+        temp_disable_cache: bool = False,
+    ) -> list[dict]:
+        """Obtain chemical and drug annotations.
+
+        :param ids: InChIKeys, or IDs such as DrugBank, ChEMBL, ChEBI, or UNII IDs
+        :param fields: Only return these fields (e.g., ["drugbank.name", "chebi.id"]); defaults to all fields
+        :param temp_disable_cache: Temporarily disable the cache for these requests
+        :return: One or more documents per ID, in the order of `ids`
+        """
+        return await self._annotations("chem", ids, fields=fields, temp_disable_cache=temp_disable_cache)
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from fast_bioservices.biothings.engine import _UnscopedBioThings
+
+
+class MyDisease(_UnscopedBioThings):
+    def __init__(self, cache: bool = True):
+        """Initiate connection to MyDisease.info.
+
+        :param cache: Should cache be used
+        """
+        super().__init__(cache=cache, base_url="https://mydisease.info/v1")
+
+    async def disease(
+        self,
+        ids: str | list[str],
+        fields: str | list[str] | None = None,
+        temp_disable_cache: bool = False,
+    ) -> list[dict]:
+        """Obtain disease annotations.
+
+        :param ids: MONDO IDs, such as "MONDO:0016575"
+        :param fields: Only return these fields (e.g., ["mondo.label", "disgenet.genes_related_to_disease"])
+        :param temp_disable_cache: Temporarily disable the cache for these requests
+        :return: One or more documents per ID, in the order of `ids`
+        """
+        return await self._annotations("disease", ids, fields=fields, temp_disable_cache=temp_disable_cache)
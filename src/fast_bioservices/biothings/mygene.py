@@ -1,47 +1,60 @@
 from __future__ import annotations
 
-import json
-from typing import NamedTuple
+from collections.abc import AsyncIterator
 
-from fast_bioservices.biothings import BioThings
+from fast_bioservices.biothings.engine import BioThings
 from fast_bioservices.common import Taxon, validate_taxon_id
 
 
-class _RequestData(NamedTuple):
-    taxon_id: int
-    chunks: list[list[str]]
-
-
 class MyGene(BioThings):
     def __init__(self, cache: bool = True):
         """Initiate connection to MyGene.info.
 
         :param cache: Should cache be used
         """
-        self._base_url: str = "https://mygene.info/v3"
-        super().__init__(cache=cache)
-
-    async def __setup_requests(self, ids: str | list[str], taxon: int | str | Taxon) -> _RequestData:
-        taxon_id = await validate_taxon_id(taxon)
-        ids = [ids] if isinstance(ids, str) else ids
-        chunks = [ids[i : i + self._chunk_size] for i in range(0, len(ids), self._chunk_size)]
-        return _RequestData(taxon_id=taxon_id, chunks=chunks)
+        super().__init__(cache=cache, base_url="https://mygene.info/v3")
 
-    async def gene(self, ids: str | list[str], taxon: int | str | Taxon) -> list[dict]:
+    async def gene(
+        self,
+        ids: str | list[str],
+        taxon: int | str | Taxon,
+        fields: str | list[str] | None = None,
+        temp_disable_cache: bool = False,
+    ) -> list[dict]:
         """Obtain ensembl or entrez gene info.
 
         :param ids: Entrez or Ensembl IDs
         :param taxon: The NCBI Taxonomy ID to use
+        :param fields: Only return these fields (e.g., ["symbol", "ensembl.gene"]); all fields are returned by default
+        :param temp_disable_cache: Temporarily disable the cache for these requests
         :return:
         """
-        setup = await self.__setup_requests(ids, taxon)
-        url = f"{self._base_url}/gene?species={setup.taxon_id}"
-        data = [json.dumps({"ids": chunk}) for chunk in setup.chunks]
-        responses = await self._post(url, data=data, headers={"Content-type": "application/json"})
-        results = []
-        for response in responses:
-            results.extend(json.loads(response))
-        return results
+        taxon_id = await validate_taxon_id(taxon)
+        return await self._annotations(
+            "gene",
+            ids,
+            params={"species": taxon_id},
+            fields=fields,
+            temp_disable_cache=temp_disable_cache,
+        )
+
+    async def evict_gene(
+        self,
+        ids: str | list[str],
+        taxon: int | str | Taxon,
+        stale: list[str],
+        fields: str | list[str] | None = None,
+    ) -> int:
+        """Remove the cached responses of a `gene` request for the batches that contain any of the `stale` IDs.
+
+        :param ids: The IDs of the original request
+        :param taxon: The taxon of the original request
+        :param stale: The IDs whose cached results should be discarded
+        :param fields: The fields of the original request
+        :return: The number of batches whose responses were removed
+        """
+        taxon_id = await validate_taxon_id(taxon)
+        return await self._evict_annotations("gene", ids, stale, params={"species": taxon_id}, fields=fields)
 
     async def query(
         self,
@@ -50,6 +63,8 @@ class MyGene(BioThings):
         scopes: str | list[str] | None = None,
         ensembl_only: bool = False,
         entrez_only: bool = False,
+        fields: str | list[str] = "all",
+        temp_disable_cache: bool = False,
     ) -> list[dict]:
         """Obtain unknown gene data.
 
@@ -58,22 +73,60 @@ class MyGene(BioThings):
         :param scopes: The fields to query against. Descriptions can be found at https://docs.mygene.info/en/latest/doc/data.html#available-fields
         :param ensembl_only: Only return Ensembl IDs
         :param entrez_only: Only return Entrez IDs
+        :param fields: Only return these fields, using dotted names (e.g., "ensembl.gene"); defaults to all fields
+        :param temp_disable_cache: Temporarily disable the cache for these requests
         :return: A list of dictionaries
         """
         if ensembl_only and entrez_only:
             raise ValueError("Cannot specify both `ensembl_only` and `entrez_only` as True")
 
-        setup = await self.__setup_requests(items, taxon)
-        scopes = [scopes] if isinstance(scopes, str) else scopes
-
-        url = f"{self._base_url}/query?species={setup.taxon_id}&size={self._chunk_size}&fields=all&dotfield=true"
-        url += "" if scopes is None else f"&scopes={','.join(scopes)}"
-        data = [json.dumps({"q": chunk}) for chunk in setup.chunks]
-        responses = await self._post(url, data=data, headers={"Content-type": "application/json"})
-        results = []
-        for r in responses:
-            results.extend(json.loads(r))
-        return results
+        taxon_id = await validate_taxon_id(taxon)
+        return await self._query(
+            items,
+            params={"species": taxon_id},
+            scopes=scopes,
+            fields=fields,
+            temp_disable_cache=temp_disable_cache,
+        )
+
+    async def evict_query(
+        self,
+        items: list[str],
+        taxon: int | str | Taxon,
+        stale: list[str],
+        scopes: str | list[str] | None = None,
+        fields: str | list[str] = "all",
+    ) -> int:
+        """Remove the cached responses of a `query` request for the batches that contain any of the `stale` items.
+
+        :param items: The items of the original request
+        :param taxon: The taxon of the original request
+        :param stale: The items whose cached results should be discarded
+        :param scopes: The scopes of the original request
+        :param fields: The fields of the original request
+        :return: The number of batches whose responses were removed
+        """
+        taxon_id = await validate_taxon_id(taxon)
+        return await self._evict_query(items, stale, params={"species": taxon_id}, scopes=scopes, fields=fields)
+
+    async def fetch_all(
+        self,
+        q: str,
+        taxon: int | str | Taxon,
+        scopes: str | list[str] | None = None,
+        fields: str | list[str] = "all",
+    ) -> AsyncIterator[dict]:
+        """Stream every hit of a query, following MyGene's scroll IDs instead of truncating at `size` hits.
+
+        :param q: The query string, such as "symbol:CDK*" or "go:0000307"
+        :param taxon: The taxon to obtain information for
+        :param scopes: The fields to query against
+        :param fields: Only return these fields, using dotted names (e.g., "ensembl.gene"); defaults to all fields
+        :return: An async iterator of hits
+        """
+        taxon_id = await validate_taxon_id(taxon)
+        async for hit in self._fetch_all(q, params={"species": taxon_id}, scopes=scopes, fields=fields):
+            yield hit
 
     async def metadata(self):
         """Obtain metadata information."""
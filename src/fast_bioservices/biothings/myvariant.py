@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from typing import Any, Literal
+
+from fast_bioservices.biothings.engine import _UnscopedBioThings
+
+
+class MyVariant(_UnscopedBioThings):
+    def __init__(self, cache: bool = True, assembly: Literal["hg19", "hg38"] = "hg19"):
+        """Initiate connection to MyVariant.info.
+
+        :param cache: Should cache be used
+        :param assembly: The genome assembly of HGVS IDs and genomic positions
+        """
+        super().__init__(cache=cache, base_url="https://myvariant.info/v1")
+        self._assembly: str = assembly
+
+    def _default_params(self) -> dict[str, Any]:
+        return {"assembly": self._assembly}
+
+    async def variant(
+        self,
+        ids: str | list[str],
+        fields: str | list[str] | None = None,
+        temp_disable_cache: bool = False,
+    ) -> list[dict]:
+        """Obtain variant annotations.
+
+        :param ids: HGVS IDs, such as "chr7:g.140453134T>C"
+        :param fields: Only return these fields (e.g., ["dbsnp.rsid", "cadd.phred"]); all fields are returned by default
+        :param temp_disable_cache: Temporarily disable the cache for these requests
+        :return: One or more documents per ID, in the order of `ids`
+        """
+        return await self._annotations("variant", ids, fields=fields, temp_disable_cache=temp_disable_cache)
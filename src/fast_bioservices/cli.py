@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from enum import Enum
+from pathlib import Path
+from typing import Any, TextIO, TypeVar
+
+import pandas as pd
+from loguru import logger
+
+from fast_bioservices import __description__, __version__
+from fast_bioservices.bigg.bigg import BiGG
+from fast_bioservices.biodbnet.biodbnet import BioDBNet
+from fast_bioservices.biodbnet.nodes import Input, Output
+from fast_bioservices.biothings.mygene import MyGene
+from fast_bioservices.ensembl.lookup import GENE_FIELDS, Lookup
+from fast_bioservices.pipeline import _MYGENE_FIELDS
+
+E = TypeVar("E", bound=Enum)
+_Converter = Callable[[list[str]], Awaitable[pd.DataFrame]]
+_SEPARATORS: dict[str, str] = {"csv": ",", "tsv": "\t"}
+
+
+def _enum_member(enum: type[E], text: str) -> E:
+    """Find an enum member by its value (e.g., "Gene Symbol") or its name (e.g., "GENE_SYMBOL"), ignoring case."""
+    for member in enum:
+        if text.lower() in {str(member.value).lower(), member.name.lower()}:
+            return member
+    raise argparse.ArgumentTypeError(f"Unknown {enum.__name__} '{text}'")
+
+
+def _input_format(source: str, fmt: str | None) -> str:
+    if fmt is not None:
+        return fmt
+    suffixes = [suffix for suffix in Path(source).suffixes if suffix not in {".gz", ".bz2", ".xz", ".zip"}]
+    suffix = suffixes[-1].lower() if suffixes else ""
+    return {".csv": "csv", ".tsv": "tsv", ".tab": "tsv", ".parquet": "parquet", ".pq": "parquet"}.get(suffix, "lines")
+
+
+def read_batches(
+    source: str,
+    batch_size: int,
+    column: str | None = None,
+    fmt: str | None = None,
+    stdin: TextIO | None = None,
+) -> Iterator[list[str]]:
+    """Read the values of one column in batches, so only one batch is held in memory at a time.
+
+    :param source: A CSV, TSV, or Parquet file, a file with one value per line, or "-" to read from stdin
+    :param batch_size: The maximum number of values per batch
+    :param column: The column holding the values; defaults to the first column. Not used for "lines" input
+    :param fmt: One of "csv", "tsv", "parquet", or "lines"; inferred from the file extension by default
+    :param stdin: The stream to read when `source` is "-"; defaults to `sys.stdin`
+    :return: An iterator of batches, skipping empty values
+    """
+    fmt = _input_format(source, fmt) if source != "-" else fmt or "lines"
+    handle = (stdin or sys.stdin) if source == "-" else source
+
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading Parquet files requires `pyarrow`; install it with `pip install pyarrow`") from e
+        parquet = pq.ParquetFile(handle)
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=[column or parquet.schema_arrow.names[0]]):
+            values = [str(value) for value in batch.column(0).to_pylist() if value not in {None, ""}]
+            if values:
+                yield values
+        return
+
+    reader = pd.read_csv(
+        handle,
+        sep=_SEPARATORS.get(fmt, "\t"),
+        header=None if fmt == "lines" else "infer",
+        usecols=[0] if fmt == "lines" or column is None else [column],
+        dtype=str,
+        chunksize=batch_size,
+        skip_blank_lines=True,
+    )
+    with reader:
+        for chunk in reader:
+            values = chunk.iloc[:, 0].dropna().str.strip()
+            values = values[values != ""].tolist()
+            if values:
+                yield values
+
+
+class _Writer:
+    def __init__(self, stream: TextIO, fmt: str, columns: list[str] | None = None):
+        """Write result frames as they arrive, with a single header row for CSV and TSV output.
+
+        :param stream: The stream to write
+        :param fmt: One of "csv", "tsv", or "jsonl"
+        :param columns: The columns to write for CSV and TSV output, ignoring any others; by default, the columns of
+            the first batch are written and a later batch with other columns is an error
+        """
+        self._stream: TextIO = stream
+        self._format: str = fmt
+        self._columns: list[str] | None = columns
+        self._fixed: bool = columns is not None
+        self._header: bool = True
+
+    def write(self, frame: pd.DataFrame) -> None:
+        if self._format == "jsonl":
+            if not frame.empty:
+                self._stream.write(frame.to_json(orient="records", lines=True).rstrip("\n") + "\n")
+        else:
+            if self._columns is None:
+                self._columns = [str(column) for column in frame.columns]
+            elif not self._fixed and (extra := [str(c) for c in frame.columns if str(c) not in self._columns]):
+                raise ValueError(
+                    f"A batch has columns that are not in the header ({', '.join(extra)}); "
+                    f"select a fixed set of columns (e.g., with `--fields`) or write JSON lines"
+                )
+            # Later batches may lack columns that only some values map to; those are left empty
+            frame = frame.reindex(columns=self._columns)
+            for column in frame.select_dtypes(include="object").columns:
+                frame[column] = frame[column].map(_cell)
+            frame.to_csv(self._stream, sep=_SEPARATORS[self._format], header=self._header, index=False)
+            self._header = False
+        self._stream.flush()
+
+
+def _cell(value: Any) -> Any:
+    """Write nested values as JSON instead of their Python representation."""
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+def _field(record: dict, path: str) -> Any:
+    """Find a dotted field (e.g., "ensembl.gene") in a nested record, or None if it is missing.
+
+    Records may hold the field under its dotted name or as nested objects; a list of objects yields a list of values.
+    """
+    if path in record:
+        return record[path]
+    value: Any = record
+    for key in path.split("."):
+        if isinstance(value, list):
+            value = [item.get(key) for item in value if isinstance(item, dict)]
+        elif isinstance(value, dict):
+            value = value.get(key)
+        else:
+            return None
+    return value
+
+
+async def _convert_batches(
+    args: argparse.Namespace,
+    convert: _Converter,
+    columns: list[str] | None,
+    stream: TextIO,
+) -> int:
+    writer = _Writer(stream, args.output_format, columns=columns)
+    batches = read_batches(args.source, args.batch_size, column=args.column, fmt=args.input_format)
+
+    start = time.perf_counter()
+    total = 0
+    # Read the next batch in a thread while the current batch is converted
+    pending = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+    while (batch := await pending) is not None:
+        pending = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+        frame = await convert(batch)
+        writer.write(frame)
+
+        total += len(batch)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Converted {total} values in {elapsed:.1f} seconds ({total / elapsed:.0f} values/second)")
+    return total
+
+
+def _db2db(args: argparse.Namespace) -> tuple[_Converter, list[str] | None]:
+    client = BioDBNet(cache=args.cache, chunk_size=args.chunk_size)
+
+    async def convert(batch: list[str]) -> pd.DataFrame:
+        return await client.async_db2db(batch, args.input_db, args.output_db, taxon=args.taxon)
+
+    return convert, None
+
+
+def _db_ortho(args: argparse.Namespace) -> tuple[_Converter, list[str] | None]:
+    client = BioDBNet(cache=args.cache, chunk_size=args.chunk_size)
+
+    async def convert(batch: list[str]) -> pd.DataFrame:
+        return await client.db_ortho(
+            batch,
+            args.input_db,
+            args.output_db,
+            input_taxon=args.taxon,
+            output_taxon=args.output_taxon,
+        )
+
+    return convert, None
+
+
+def _mygene(args: argparse.Namespace) -> tuple[_Converter, list[str] | None]:
+    client = MyGene(cache=args.cache)
+    # With all fields, the columns depend on the hits of each batch; `main` only allows that for JSON lines output
+    fields = None if args.fields == "all" else [field.strip() for field in args.fields.split(",")]
+    columns = ["query", "_id", *fields] if fields else None
+
+    async def convert(batch: list[str]) -> pd.DataFrame:
+        if args.scopes is None:
+            hits = await client.gene(batch, args.taxon, fields=args.fields)
+        else:
+            hits = await client.query(batch, args.taxon, scopes=args.scopes, fields=args.fields)
+        if columns is None:
+            return pd.json_normalize(hits)
+        return pd.DataFrame([[_field(hit, column) for column in columns] for hit in hits], columns=columns)
+
+    return convert, columns
+
+
+def _lookup(args: argparse.Namespace) -> tuple[_Converter, list[str] | None]:
+    client = Lookup(cache=args.cache)
+
+    async def convert(batch: list[str]) -> pd.DataFrame:
+        if args.by == "ensembl":
+            tables = await client.by_ensembl(batch, as_dataframe=True)
+        else:
+            tables = await client.by_symbol(batch, args.taxon, as_dataframe=True)
+        return tables["genes"]
+
+    return convert, ["input", *GENE_FIELDS]
+
+
+async def _bigg_download(args: argparse.Namespace, stream: TextIO) -> int:
+    client = BiGG(cache=args.cache)
+    downloads = [
+        client.download(model_id, args.format, download_path=args.directory, temp_disable_cache=args.overwrite)
+        for model_id in args.model_ids
+    ]
+    for finished in asyncio.as_completed(downloads):
+        stream.write(f"{await finished}\n")
+        stream.flush()
+    return len(downloads)
+
+
+def _taxon(text: str) -> int | str:
+    return int(text) if text.isdigit() else text
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="fast-bioservices", description=__description__)
+    parser.add_argument("--version", action="version", version=__version__)
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="Do not read or write the HTTP cache")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Log progress (-v) or requests (-vv)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    io = argparse.ArgumentParser(add_help=False)
+    io.add_argument(
+        "source", nargs="?", default="-", help="A CSV, TSV, Parquet, or one-ID-per-line file; or - for stdin"
+    )
+    io.add_argument("-c", "--column", help="The column holding the IDs; defaults to the first column")
+    io.add_argument("--input-format", choices=["csv", "tsv", "parquet", "lines"], help="Defaults to the file extension")
+    io.add_argument("-b", "--batch-size", type=int, default=10_000, help="The number of IDs read and converted at once")
+    io.add_argument("-o", "--output", type=Path, help="The file to write; defaults to stdout")
+    io.add_argument("--output-format", choices=["csv", "tsv", "jsonl"], default="tsv")
+    io.add_argument("-t", "--taxon", type=_taxon, default=9606, help="An NCBI taxonomy ID or species name")
+
+    biodbnet = argparse.ArgumentParser(add_help=False, parents=[io])
+    biodbnet.add_argument("-i", "--input-db", type=lambda text: _enum_member(Input, text), required=True)
+    biodbnet.add_argument(
+        "-O", "--output-db", type=lambda text: _enum_member(Output, text), action="append", required=True
+    )
+    biodbnet.add_argument("--chunk-size", type=int, default=250, help="The number of IDs per request")
+
+    db2db = commands.add_parser("db2db", parents=[biodbnet], help="Convert IDs between databases with BioDBNet")
+    db2db.set_defaults(converter=_db2db)
+
+    db_ortho = commands.add_parser("db_ortho", parents=[biodbnet], help="Convert IDs to orthologs with BioDBNet")
+    db_ortho.add_argument("--output-taxon", type=_taxon, default=10090)
+    db_ortho.set_defaults(converter=_db_ortho)
+
+    mygene = commands.add_parser("mygene", parents=[io], help="Annotate or query genes with MyGene.info")
+    mygene.add_argument("--scopes", help="Query these fields (e.g., 'symbol'); by default, IDs are Entrez or Ensembl")
+    mygene.add_argument(
+        "--fields",
+        default=",".join(_MYGENE_FIELDS),
+        help="Comma-separated fields to return, or 'all' with JSON lines output; defaults to the pipeline's fields",
+    )
+    mygene.set_defaults(converter=_mygene)
+
+    lookup = commands.add_parser("lookup", parents=[io], help="Look up genes with the Ensembl REST API")
+    lookup.add_argument("--by", choices=["ensembl", "symbol"], default="ensembl")
+    lookup.set_defaults(converter=_lookup)
+
+    bigg = commands.add_parser("bigg", help="Access BiGG models").add_subparsers(dest="bigg_command", required=True)
+    download = bigg.add_parser("download", help="Download models, printing each path as it finishes")
+    download.add_argument("model_ids", nargs="+")
+    download.add_argument(
+        "-f", "--format", choices=["json", "xml", "mat", "json.gz", "xml.gz", "mat.gz"], default="json"
+    )
+    download.add_argument("-d", "--directory", type=Path, default=Path.cwd())
+    download.add_argument("--overwrite", action="store_true", help="Download models again even if they exist")
+    download.set_defaults(converter=None)
+    return parser
+
+
+async def _run(args: argparse.Namespace, stream: TextIO) -> int:
+    if args.converter is None:
+        return await _bigg_download(args, stream)
+    convert, columns = args.converter(args)
+    return await _convert_batches(args, convert, columns, stream)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the `fast-bioservices` command-line interface."""
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "fields", None) == "all" and args.output_format != "jsonl":
+        parser.error("--fields all returns different fields for each batch; use --output-format jsonl")
+    logger.remove()
+    logger.add(sys.stderr, level={0: "WARNING", 1: "INFO"}.get(args.verbose, "DEBUG"))
+
+    output = getattr(args, "output", None)
+    if output is None:
+        asyncio.run(_run(args, sys.stdout))
+    else:
+        with output.open("w", newline="") as stream:
+            asyncio.run(_run(args, stream))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
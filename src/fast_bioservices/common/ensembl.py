@@ -1,35 +1,131 @@
 from __future__ import annotations
 
-from functools import cache
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
 
 import httpx
+from loguru import logger
 
 from fast_bioservices.common import Taxon
+from fast_bioservices.settings import ensembl_species_filepath
 
+_SPECIES_URL: str = "https://rest.ensembl.org/info/species"
+# Every field a species can be referred to by, in order of precedence when two species share an alias
+_ALIAS_FIELDS: tuple[str, ...] = ("name", "display_name", "common_name", "taxon_id", "assembly", "accession")
 
-@cache
-async def get_valid_ensembl_species(value: int | str | Taxon):
-    """Determine if the input is a valid Ensembl species."""
-    taxon_value = str(value.value) if isinstance(value, Taxon) else str(value)
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "http://rest.ensembl.org/info/species", headers={"Content-Type": "application/json"}
-        )
-
-        for species in response.json()["species"]:
-            if taxon_value in {
-                species["display_name"],
-                species["name"],
-                species["common_name"],
-                species["taxon_id"],
-                species["assembly"],
-                species["accession"],
-            }:
-                return species["name"]
-        raise ValueError(
-            f"{taxon_value} is not a valid ensembl species. "
-            f"Visit https://www.ensembl.org to get a valid species identifier"
-        )
+
+def _read_registry(path: Path) -> dict[str, Any] | None:
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except json.JSONDecodeError:
+        logger.warning(f"Ignoring the corrupt Ensembl species list at {path}")
+        return None
+
+
+def _write_registry(path: Path, registry: dict[str, Any]) -> None:
+    # Processes share the registry, so write to a file of this process and replace the registry in one step
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.{os.getpid()}.part")
+    partial.write_text(json.dumps(registry))
+    partial.replace(path)
+
+
+class SpeciesRegistry:
+    def __init__(self, path: Path = ensembl_species_filepath, ttl: float = 7 * 24 * 60 * 60):
+        """Resolve any alias of an Ensembl species to its Ensembl name, such as "mouse" or 10090 to "mus_musculus".
+
+        The species list is downloaded once, saved to `path`, and reused by every process until it is older than `ttl`.
+
+        :param path: The file in which the species list is saved
+        :param ttl: The number of seconds before the saved species list is downloaded again
+        """
+        self._path: Path = path
+        self._ttl: float = ttl
+        self._index: dict[str, str] = {}
+        self._fetched_at: float = 0.0
+        # Before Python 3.10, a lock binds to the event loop current when it is created, so create it in `load`
+        self._lock: asyncio.Lock | None = None
+        self._lock_loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def species(self) -> list[str]:
+        """The Ensembl names of the loaded species."""
+        return sorted(set(self._index.values()))
+
+    def _build_index(self, species: list[dict[str, Any]]) -> None:
+        index: dict[str, str] = {}
+        for field in _ALIAS_FIELDS:
+            for record in species:
+                if record.get(field) is not None:
+                    index.setdefault(str(record[field]).lower(), record["name"])
+        self._index = index
+
+    async def _fetch(self) -> list[dict[str, Any]]:
+        async with httpx.AsyncClient(timeout=180) as client:
+            response = await client.get(_SPECIES_URL, headers={"Content-Type": "application/json"})
+        response.raise_for_status()
+        return [{field: record.get(field) for field in _ALIAS_FIELDS} for record in response.json()["species"]]
+
+    async def load(self, refresh: bool = False) -> None:
+        """Load the species list from memory, disk, or Ensembl, in that order.
+
+        :param refresh: Download the species list even if the saved one has not expired
+        """
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        async with self._lock:
+            now = time.time()
+            if not refresh and self._index and now - self._fetched_at < self._ttl:
+                return
+
+            saved = None if refresh else await asyncio.to_thread(_read_registry, self._path)
+            if saved is None or now - saved["fetched_at"] >= self._ttl:
+                logger.debug("Downloading the Ensembl species list")
+                saved = {"fetched_at": now, "species": await self._fetch()}
+                await asyncio.to_thread(_write_registry, self._path, saved)
+
+            self._build_index(saved["species"])
+            self._fetched_at = saved["fetched_at"]
+
+    async def resolve(self, value: int | str | Taxon) -> str:
+        """Return the Ensembl name of a species.
+
+        :param value: A taxon, taxon ID, Ensembl name, display name, common name, assembly, or assembly accession
+        :return: The Ensembl name, such as "homo_sapiens"
+        """
+        alias = (str(value.value) if isinstance(value, Taxon) else str(value)).lower()
+        await self.load()
+        if alias not in self._index and time.time() - self._fetched_at > 60:
+            # The saved list may predate a new Ensembl release, so check for new species once before giving up
+            await self.load(refresh=True)
+        if alias not in self._index:
+            raise ValueError(
+                f"{value} is not a valid ensembl species. "
+                f"Visit https://www.ensembl.org to get a valid species identifier"
+            )
+        return self._index[alias]
+
+
+_registry: SpeciesRegistry | None = None
+
+
+def _get_registry() -> SpeciesRegistry:
+    global _registry
+    if _registry is None:
+        _registry = SpeciesRegistry()
+    return _registry
+
+
+async def get_valid_ensembl_species(value: int | str | Taxon) -> str:
+    """Determine the Ensembl name of a species, raising a `ValueError` if Ensembl does not know it."""
+    return await _get_registry().resolve(value)
 
 
 async def _main():
@@ -37,6 +133,4 @@ async def _main():
 
 
 if __name__ == "__main__":
-    import asyncio
-
     asyncio.run(_main())
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Literal
+
+import pandas as pd
+
+try:
+    import pyarrow
+
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+_STRING_DTYPE = "string[pyarrow]" if _HAS_PYARROW else "string"
+
+
+def read_tsv(path: Path, *, names: list[str], memory_map: bool = False) -> pd.DataFrame:
+    """Read a header-less tab-separated file straight from disk.
+
+    The multi-threaded `pyarrow` parser is used when it is installed; otherwise, pandas' C parser is used.
+
+    :param path: The file to read
+    :param names: The column names
+    :param memory_map: Memory-map the file instead of reading it into a buffer; this uses pandas' C parser
+    :return: The parsed dataframe
+    """
+    if _HAS_PYARROW and not memory_map:
+        return pd.read_csv(path, sep="\t", header=None, names=names, engine="pyarrow")
+    return pd.read_csv(path, sep="\t", header=None, names=names, engine="c", memory_map=memory_map)
+
+
+def compact_frame(
+    df: pd.DataFrame,
+    *,
+    multi_mapping: Literal["join", "list", "explode"] = "join",
+    separator: str = "//",
+    na_value: str = "-",
+    max_category_ratio: float = 0.5,
+) -> pd.DataFrame:
+    """Normalize missing values and store identifier columns in compact dtypes.
+
+    Low-cardinality columns become categorical; the remaining identifier columns use an Arrow-backed string dtype
+    when `pyarrow` is installed, and pandas' native string dtype otherwise.
+
+    :param df: The dataframe to compact; it is not modified
+    :param multi_mapping: How to expose cells that contain several identifiers joined by `separator`.
+        "join" leaves them as-is, "list" splits them into list-typed cells, and "explode" gives each identifier its
+        own row (exploding several columns yields every combination for that row)
+    :param separator: The delimiter between multiple identifiers in a single cell
+    :param na_value: The placeholder the service uses for a missing value
+    :param max_category_ratio: Columns with at most this ratio of unique values to rows are stored as categorical
+    :return: A new, compacted dataframe
+    """
+    df = df.replace({na_value: pd.NA})
+    columns = [c for c in df.columns if df[c].dtype == object or isinstance(df[c].dtype, pd.StringDtype)]
+
+    multi_columns = [c for c in columns if df[c].str.contains(separator, regex=False, na=False).any()]
+    if multi_mapping == "list":
+        for column in multi_columns:
+            df[column] = df[column].str.split(separator)
+        columns = [c for c in columns if c not in multi_columns]
+    elif multi_mapping == "explode":
+        for column in multi_columns:
+            df = df.assign(**{column: df[column].str.split(separator)}).explode(column, ignore_index=True)
+
+    for column in columns:
+        unique_ratio = df[column].nunique(dropna=True) / len(df) if len(df) else 0
+        df[column] = df[column].astype("category" if unique_ratio <= max_category_ratio else _STRING_DTYPE)
+    return df
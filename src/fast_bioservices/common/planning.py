@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Any
+
+import pandas as pd
+
+
+class RequestPlan:
+    def __init__(self, values: str | Iterable[str], chunk_size: int, *, sort: bool = True):
+        """Plan requests for a list of input values without modifying the caller's data.
+
+        Duplicate values are only requested once. Sorting the unique values keeps chunk contents (and therefore cache
+        keys) stable when the same values are requested in a different order.
+
+        :param values: The input values, in the caller's order
+        :param chunk_size: The maximum number of values sent in a single request
+        :param sort: Sort the unique values before chunking
+        """
+        self.values: list[str] = [values] if isinstance(values, str) else list(values)
+        self.unique: list[str] = sorted(set(self.values)) if sort else list(dict.fromkeys(self.values))
+        self.chunk_size: int = chunk_size
+
+    @property
+    def chunks(self) -> list[list[str]]:
+        """The unique values split into request-sized chunks."""
+        return [self.unique[i : i + self.chunk_size] for i in range(0, len(self.unique), self.chunk_size)]
+
+    @property
+    def duplicates(self) -> int:
+        """The number of input values that will not be requested because they are duplicates."""
+        return len(self.values) - len(self.unique)
+
+    def align(self, df: pd.DataFrame, on: str) -> pd.DataFrame:
+        """Scatter a result frame back into the caller's order, repeating rows for duplicated inputs.
+
+        :param df: The results, with one or more rows per unique input value
+        :param on: The column of `df` holding the input value
+        :return: A new frame ordered by the original input values; inputs without a result have NA values
+        """
+        order = pd.DataFrame({on: self.values})
+        if on not in df.columns:
+            return order
+        return order.merge(df, on=on, how="left", sort=False)
+
+    def align_records(self, records: Iterable[dict[str, Any]], key: str) -> list[dict[str, Any]]:
+        """Scatter result records back into the caller's order, repeating records for duplicated inputs.
+
+        :param records: The results, with one or more records per unique input value
+        :param key: The record field holding the input value
+        :return: The records ordered by the original input values
+        """
+        # Compare both sides as strings, so integer inputs (e.g., Entrez IDs) match the values echoed by the service
+        by_value: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        for record in records:
+            by_value[str(record.get(key))].append(record)
+        return [record for value in self.values for record in by_value.get(str(value), [])]
@@ -1,56 +1,82 @@
 from __future__ import annotations
 
 import json
-from typing import Literal
+from collections.abc import AsyncIterator, Iterable, Mapping
+from typing import Any, Literal
+
+import numpy as np
+import pandas as pd
 
 from fast_bioservices.common import Taxon
 from fast_bioservices.common.ensembl import get_valid_ensembl_species
+from fast_bioservices.common.planning import RequestPlan
 from fast_bioservices.ensembl import Ensembl
 
+_XREF_COLUMNS: list[str] = ["primary_id", "dbname", "display_id", "info_type"]
+_XREF_CATEGORICAL_COLUMNS: tuple[str, ...] = ("dbname", "info_type", "db_display_name")
+
+
+def flatten_xrefs(
+    results: Mapping[str, list[dict]] | Iterable[tuple[str, list[dict]]],
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """Combine cross references into one long table with an "input" column.
+
+    :param results: A mapping of input to cross references (e.g., from `CrossReference.by_ensembl`) or the
+        `(input, references)` pairs of `iter_by_ensembl` or `iter_by_external`, which are consumed once
+    :param columns: The reference fields to keep; defaults to "primary_id", "dbname", "display_id", and "info_type"
+    :return: One row per cross reference; the database and type columns are categorical
+    """
+    columns = columns or _XREF_COLUMNS
+    inputs: list[str] = []
+    counts: list[int] = []
+    references: list[dict] = []
+    for value, rows in results.items() if isinstance(results, Mapping) else results:
+        inputs.append(value)
+        counts.append(len(rows))
+        references.extend(rows)
+
+    frame = pd.DataFrame.from_records(references, columns=columns)
+    frame.insert(0, "input", pd.Categorical(np.repeat(np.asarray(inputs, dtype=object), counts)))
+    for column in _XREF_CATEGORICAL_COLUMNS:
+        if column in frame.columns:
+            frame[column] = frame[column].astype("category")
+    return frame.astype({column: "string" for column in ("primary_id", "display_id") if column in frame.columns})
+
 
 class CrossReference(Ensembl):
     def __init__(self, cache: bool = True):
         """Cross reference data from ensembl and external sources."""
         super().__init__(cache=cache)
 
-    async def by_external(
+    async def _external_urls(
         self,
         species: int | str | Taxon,
-        gene_symbols: str | list[str],
-        db_type: Literal["core"] = "core",
-        external_db_filter: str | None = None,
-        feature_filter: str | None = None,
-    ):
-        """Collect ensembl-related items from an external database."""
+        symbols: list[str],
+        db_type: str,
+        external_db_filter: str | None,
+        feature_filter: str | None,
+    ) -> list[str]:
         ensembl_species = await get_valid_ensembl_species(species)
-        gene_symbols = [gene_symbols] if isinstance(gene_symbols, str) else gene_symbols
-
         urls = []
-        for symbol in gene_symbols:
+        for symbol in symbols:
             path = f"/xrefs/symbol/{ensembl_species}/{symbol}?db_type={db_type}"
             if external_db_filter:
                 path += f";external_db={external_db_filter}"
             if feature_filter:
                 path += f";object_type={feature_filter}"
             urls.append(self._url + path)
+        return urls
 
-        references: list[dict] = []
-        for result in await self._get(urls=urls, headers={"Content-Type": "application/json"}):
-            references.extend(json.loads(result))
-        return references
-
-    async def by_ensembl(
+    def _ensembl_urls(
         self,
-        ids: str | list[str],
-        db_type: Literal["core", "otherfeatures"] = "core",
-        all_levels: bool = False,
-        external_db_filter: str | None = None,
-        feature_filter: str | None = None,
-        species: str | None = None,
-    ) -> dict[str, dict]:
-        """Access external items from an ensembl ID."""
-        ids = [ids] if isinstance(ids, str) else ids
-
+        ids: list[str],
+        db_type: str,
+        all_levels: bool,
+        external_db_filter: str | None,
+        feature_filter: str | None,
+        species: str | None,
+    ) -> list[str]:
         urls = []
         for e_id in ids:
             path = f"/xrefs/id/{e_id}?db_type={db_type}"
@@ -63,12 +89,80 @@ class CrossReference(Ensembl):
             if species:
                 path += f"&species={species}"
             urls.append(self._url + path)
+        return urls
+
+    async def iter_by_external(
+        self,
+        species: int | str | Taxon,
+        gene_symbols: str | list[str],
+        db_type: Literal["core"] = "core",
+        external_db_filter: str | None = None,
+        feature_filter: str | None = None,
+    ) -> AsyncIterator[tuple[str, list[dict]]]:
+        """Yield `(symbol, references)` for each unique symbol as its response arrives.
+
+        All requests are scheduled at once and run concurrently under the Ensembl rate limit.
+        """
+        symbols = list(dict.fromkeys([gene_symbols] if isinstance(gene_symbols, str) else gene_symbols))
+        urls = await self._external_urls(species, symbols, db_type, external_db_filter, feature_filter)
+        async for index, response in self._iter_get(urls, headers={"Content-Type": "application/json"}):
+            yield symbols[index], json.loads(response)
 
-        results: dict[str, dict] = {}
-        responses = await self._get(urls=urls, headers={"Content-Type": "application/json"})
-        for i, response in enumerate(responses):
-            results[ids[i]] = json.loads(response)
-        return results
+    async def by_external(
+        self,
+        species: int | str | Taxon,
+        gene_symbols: str | list[str],
+        db_type: Literal["core"] = "core",
+        external_db_filter: str | None = None,
+        feature_filter: str | None = None,
+    ):
+        """Collect ensembl-related items from an external database."""
+        plan = RequestPlan(gene_symbols, chunk_size=1, sort=False)
+        by_symbol: dict[str, list[dict]] = {
+            symbol: references
+            async for symbol, references in self.iter_by_external(
+                species, plan.unique, db_type, external_db_filter, feature_filter
+            )
+        }
+        return [reference for symbol in plan.values for reference in by_symbol[symbol]]
+
+    async def iter_by_ensembl(
+        self,
+        ids: str | list[str],
+        db_type: Literal["core", "otherfeatures"] = "core",
+        all_levels: bool = False,
+        external_db_filter: str | None = None,
+        feature_filter: str | None = None,
+        species: str | None = None,
+    ) -> AsyncIterator[tuple[str, list[dict]]]:
+        """Yield `(ensembl_id, references)` for each unique ID as its response arrives.
+
+        All requests are scheduled at once and run concurrently under the Ensembl rate limit.
+        """
+        ids = list(dict.fromkeys([ids] if isinstance(ids, str) else ids))
+        urls = self._ensembl_urls(ids, db_type, all_levels, external_db_filter, feature_filter, species)
+        async for index, response in self._iter_get(urls, headers={"Content-Type": "application/json"}):
+            yield ids[index], json.loads(response)
+
+    async def by_ensembl(
+        self,
+        ids: str | list[str],
+        db_type: Literal["core", "otherfeatures"] = "core",
+        all_levels: bool = False,
+        external_db_filter: str | None = None,
+        feature_filter: str | None = None,
+        species: str | None = None,
+    ) -> dict[str, list[dict]]:
+        """Access external items from an ensembl ID."""
+        ids = list(dict.fromkeys([ids] if isinstance(ids, str) else ids))
+        # Responses arrive in completion order; return them in input order
+        results: dict[str, list[dict]] = {
+            e_id: references
+            async for e_id, references in self.iter_by_ensembl(
+                ids, db_type, all_levels, external_db_filter, feature_filter, species
+            )
+        }
+        return {e_id: results[e_id] for e_id in ids}
 
     @property
     def url(self) -> str:
@@ -1,42 +1,156 @@
 from __future__ import annotations
 
 import json
-from typing import Literal
+from collections.abc import Mapping
+from typing import Any, Literal
+
+import pandas as pd
 
 from fast_bioservices.common import Taxon
 from fast_bioservices.common.ensembl import get_valid_ensembl_species
+from fast_bioservices.common.planning import RequestPlan
 from fast_bioservices.ensembl import Ensembl
 
+# Ensembl accepts at most 1,000 IDs or symbols in a single lookup POST
+_MAX_CHUNK_SIZE: int = 1000
+_CATEGORICAL_COLUMNS: tuple[str, ...] = (
+    "assembly_name",
+    "biotype",
+    "db_type",
+    "logic_name",
+    "object_type",
+    "seq_region_name",
+    "source",
+    "species",
+)
+# The top-level fields of an Ensembl gene record, in the order the REST API returns them
+GENE_FIELDS: tuple[str, ...] = (
+    "id",
+    "display_name",
+    "species",
+    "object_type",
+    "biotype",
+    "description",
+    "assembly_name",
+    "seq_region_name",
+    "start",
+    "end",
+    "strand",
+    "version",
+    "source",
+    "logic_name",
+    "db_type",
+    "canonical_transcript",
+)
+
+
+def _table(rows: list[dict[str, Any]], key: str) -> pd.DataFrame:
+    frame = pd.json_normalize(rows) if rows else pd.DataFrame(columns=[key])
+    for column in _CATEGORICAL_COLUMNS:
+        if column in frame.columns:
+            frame[column] = frame[column].astype("category")
+    return frame
+
+
+def flatten_lookup(records: Mapping[str, dict | None]) -> dict[str, pd.DataFrame]:
+    """Flatten expanded lookup results into one table each for genes, transcripts, and exons.
+
+    Nested objects such as "Translation" become dotted columns, and low-cardinality columns are categorical.
+
+    :param records: The lookup results keyed by input value, as returned by `Lookup.by_ensembl` or `Lookup.by_symbol`
+    :return: A "genes" table with one row per input (inputs without a result have NA values), a "transcripts" table
+        keyed by "gene_id", and an "exons" table keyed by "transcript_id"
+    """
+    genes: list[dict[str, Any]] = []
+    transcripts: list[dict[str, Any]] = []
+    exons: list[dict[str, Any]] = []
+    for value, record in records.items():
+        record = record or {}
+        genes.append({"input": value, **{k: v for k, v in record.items() if k != "Transcript"}})
+        for transcript in record.get("Transcript", []):
+            transcripts.append({"gene_id": record["id"], **{k: v for k, v in transcript.items() if k != "Exon"}})
+            exons.extend({"transcript_id": transcript["id"], **exon} for exon in transcript.get("Exon", []))
+
+    return {
+        "genes": _table(genes, "input"),
+        "transcripts": _table(transcripts, "gene_id"),
+        "exons": _table(exons, "transcript_id"),
+    }
+
 
 class Lookup(Ensembl):
-    def __init__(self, cache: bool = True):
-        """Access ensembl data using Ensembl IDs or Gene Symbols."""
+    def __init__(self, cache: bool = True, chunk_size: int = _MAX_CHUNK_SIZE):
+        """Access ensembl data using Ensembl IDs or Gene Symbols.
+
+        :param cache: Should cache be used
+        :param chunk_size: The number of IDs or symbols in a single request; Ensembl accepts at most 1,000
+        """
         self._base: str = "https://rest.ensembl.org"
         self._cache: bool = cache
         self._max_requests_per_second: int = 12
+        self._chunk_size: int = min(chunk_size, _MAX_CHUNK_SIZE)
 
         super().__init__(cache=cache)
 
-    async def _process(self, *, url: str, as_type: Literal["ids", "symbols"], items: list[str]) -> list[dict]:
-        response = (
-            await self._post(
-                url,
-                data=json.dumps({as_type: items}),
-                headers={"Content-Type": "application/json", "Accept": "application/json"},
-            )
-        )[0]
-        as_json = json.loads(response)
-        return list(as_json.values())
-
-    async def by_ensembl(self, ensembl_ids: str | list[str]) -> list[dict]:
-        """Access information by ensembl ID."""
+    async def _process(
+        self,
+        *,
+        url: str,
+        as_type: Literal["ids", "symbols"],
+        items: str | list[str],
+        expand: bool,
+        as_dataframe: bool,
+    ) -> dict[str, dict | None] | dict[str, pd.DataFrame]:
+        plan = RequestPlan(items, self._chunk_size)
+        if expand:
+            url += "?expand=1"
+
+        # The chunks are sent concurrently, within the client's rate limit
+        responses = await self._post(
+            url,
+            data=[json.dumps({as_type: chunk}) for chunk in plan.chunks],
+            headers={"Content-Type": "application/json", "Accept": "application/json"},
+        )
+        found: dict[str, dict | None] = {}
+        for response in responses:
+            found.update(json.loads(response))
+
+        records = {value: found.get(value) for value in dict.fromkeys(plan.values)}
+        return flatten_lookup(records) if as_dataframe else records
+
+    async def by_ensembl(
+        self,
+        ensembl_ids: str | list[str],
+        expand: bool = False,
+        *,
+        as_dataframe: bool = False,
+    ) -> dict[str, dict | None] | dict[str, pd.DataFrame]:
+        """Access information by ensembl ID.
+
+        :param ensembl_ids: The Ensembl IDs to look up
+        :param expand: Include the transcripts (and their exons and translations) of each gene
+        :param as_dataframe: Return the tables of `flatten_lookup` instead of the records
+        :return: The record of each unique ID in input order, or `None` for IDs Ensembl does not know
+        """
         url = f"{self._base}/lookup/id"
-        ensembl_ids = [ensembl_ids] if isinstance(ensembl_ids, str) else ensembl_ids
-        return await self._process(url=url, as_type="ids", items=ensembl_ids)
+        return await self._process(url=url, as_type="ids", items=ensembl_ids, expand=expand, as_dataframe=as_dataframe)
+
+    async def by_symbol(
+        self,
+        symbols: str | list[str],
+        species: int | str | Taxon,
+        expand: bool = False,
+        *,
+        as_dataframe: bool = False,
+    ) -> dict[str, dict | None] | dict[str, pd.DataFrame]:
+        """Access data by Gene Symbol.
 
-    async def by_symbol(self, symbols: str | list[str], species: int | str | Taxon) -> list[dict]:
-        """Access data by Gene Symbol."""
+        :param symbols: The gene symbols to look up
+        :param species: The species of the symbols
+        :param expand: Include the transcripts (and their exons and translations) of each gene
+        :param as_dataframe: Return the tables of `flatten_lookup` instead of the records
+        :return: The record of each unique symbol in input order, or `None` for symbols Ensembl does not know
+        """
         ensembl_taxon = await get_valid_ensembl_species(species)
         url = f"{self._base}/lookup/symbol/{ensembl_taxon}"
-        symbols = [symbols] if isinstance(symbols, str) else symbols
-        return await self._process(url=url, as_type="symbols", items=symbols)
+        return await self._process(url=url, as_type="symbols", items=symbols, expand=expand, as_dataframe=as_dataframe)
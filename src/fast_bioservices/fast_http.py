@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import os
 import sys
 import time
 import urllib.parse
+from collections.abc import AsyncIterator
+from pathlib import Path
 from typing import Literal, NamedTuple
 
+import aiofiles
+import aiofiles.os
 import hishel
 import httpcore
 import httpx
+from hishel._files import AsyncFileManager
 from hishel._utils import generate_key
 from httpx import Request, Response
 from loguru import logger
@@ -42,11 +49,80 @@ def _key_generator(request: httpx.Request | httpcore.Request, body: bytes = b"")
     return f"{prefix}/{method}|{host}|{key}"
 
 
+async def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Calculate the SHA-256 hex digest of a file without reading it into memory at once."""
+    digest = hashlib.sha256()
+    async with aiofiles.open(path, "rb") as i_stream:
+        while chunk := await i_stream.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def _make_safe_url(urls: str | list[str]) -> str | list[str]:
     safe_chars = "&$+,/:;=?@#"
     if isinstance(urls, str):
         return urllib.parse.quote(urls, safe=safe_chars)
-    return sorted(urllib.parse.quote(url, safe=safe_chars) for url in urls)
+    return [urllib.parse.quote(url, safe=safe_chars) for url in urls]
+
+
+def _expected_size(response: httpx.Response) -> int | None:
+    """Determine the full size of a (possibly partial) download from the response headers."""
+    if response.status_code == 206 and "/" in response.headers.get("Content-Range", ""):
+        total = response.headers["Content-Range"].rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    if response.status_code == 200 and "Content-Length" in response.headers:
+        return int(response.headers["Content-Length"])
+    return None
+
+
+class _AtomicFileManager(AsyncFileManager):
+    """Write cached responses to a temporary file and move it into place.
+
+    Processes that share the cache directory then never read a partially written response.
+    """
+
+    async def write_to(self, path: str, data: bytes | str, is_binary: bool | None = None) -> None:
+        partial = f"{path}.{os.getpid()}.part"
+        await super().write_to(partial, data, is_binary)
+        await aiofiles.os.replace(partial, path)
+
+
+class SharedRateLimiter:
+    def __init__(self, lock, next_request: dict[str, float]):
+        """Pace requests to each host across processes, so they share one rate budget.
+
+        Create it from a `multiprocessing.Manager` with `SharedRateLimiter(manager.Lock(), manager.dict())`, and call
+        `install` in each process. While it is installed, every client paces requests to a host at the rate it was
+        created with, counted over all processes instead of per client.
+
+        :param lock: A lock shared by the processes
+        :param next_request: A mapping shared by the processes, holding the earliest time of the next request per host
+        """
+        self._lock = lock
+        self._next_request = next_request
+
+    def _reserve(self, host: str, interval: float) -> float:
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_request.get(host, now))
+            self._next_request[host] = slot + interval
+        return slot - now
+
+    async def wait(self, host: str, rate: int | float, period: int = 1) -> None:
+        """Wait for the next free request slot of `host`."""
+        # The manager proxies block on inter-process communication, so keep them off the event loop
+        delay = await asyncio.to_thread(self._reserve, host, period / rate)
+        if delay > 0:
+            logger.trace(f"Sleeping for {delay:.3f} seconds before requesting {host}")
+            await asyncio.sleep(delay)
+
+    def install(self) -> None:
+        """Use this limiter for every request from the current process."""
+        global _shared_rate_limiter
+        _shared_rate_limiter = self
+
+
+_shared_rate_limiter: SharedRateLimiter | None = None
 
 
 class _AsyncRateLimitTransport(httpx.AsyncBaseTransport):
@@ -60,6 +136,10 @@ class _AsyncRateLimitTransport(httpx.AsyncBaseTransport):
         self.requests_in_period = 0
 
     async def handle_async_request(self, request: Request) -> Response:
+        if _shared_rate_limiter is not None:
+            await _shared_rate_limiter.wait(request.url.host, self.rate, self.period)
+            return await self.transport.handle_async_request(request)
+
         now = time.time()
         if now - self.last_reset >= self.period:  # We've waited for `period` seconds since last reset, reset counter
             self.last_reset = now
@@ -79,13 +159,15 @@ class _AsyncRateLimitTransport(httpx.AsyncBaseTransport):
 
 
 class _AsyncHTTPClient:
-    def __init__(self, *, cache: bool, max_requests_per_second) -> None:
+    def __init__(self, *, cache: bool, max_requests_per_second, max_concurrent_requests: int = 5) -> None:
         self._use_cache: bool = cache
+        self._cache_namespace: str = ""
         transport = _AsyncRateLimitTransport(rate=max_requests_per_second)
         if self._use_cache:
             self._storage = hishel.AsyncFileStorage(base_path=cache_dir, ttl=sys.maxsize)
+            self._storage._file_manager = _AtomicFileManager(is_binary=self._storage._serializer.is_binary)
             self._controller = hishel.Controller(
-                key_generator=_key_generator,
+                key_generator=self._namespaced_key,
                 allow_stale=True,
                 force_cache=True,
                 cacheable_methods=["GET", "POST", "HEAD"],
@@ -99,7 +181,11 @@ class _AsyncHTTPClient:
             self._transport = transport
         self._client: httpx.AsyncClient = httpx.AsyncClient(transport=self._transport, timeout=180)
 
-        self._semaphore = asyncio.Semaphore(value=5)
+        # Downloads are streamed to disk, so they bypass the response cache; the downloaded file acts as the cache
+        self._download_client: httpx.AsyncClient = httpx.AsyncClient(transport=transport, timeout=180)
+        self._download_locks: dict[Path, asyncio.Lock] = {}
+
+        self._semaphore = asyncio.Semaphore(value=max_concurrent_requests)
         self.__current_requests: int = 0
         self.__total_requests: int = 0
         self.__log_per_step: int = 1
@@ -107,6 +193,41 @@ class _AsyncHTTPClient:
         self.__chunk_time: float = 0.0
         self.__padding: int = 0
 
+    def _namespaced_key(self, request: httpx.Request | httpcore.Request, body: bytes = b"") -> str:
+        """Prefix cache keys with the current namespace so a group of entries can be retired together."""
+        key = _key_generator(request, body)
+        if not self._cache_namespace:
+            return key
+        prefix, name = key.split("/", 1)
+        return f"{prefix}/{self._cache_namespace}|{name}"
+
+    def _retire_cache_namespaces(self, host: str, *, keep: str) -> int:
+        """Delete the cached responses from a host that are not in the `keep` namespace.
+
+        :return: The number of deleted responses
+        """
+        retired = 0
+        for path in cache_dir.glob(f"*/*|{host}|*"):
+            parts = path.name.split("|")
+            namespace = parts[0] if len(parts) == 4 else ""
+            if namespace != keep:
+                path.unlink(missing_ok=True)
+                retired += 1
+        logger.debug(f"Retired {retired} cached responses from {host}")
+        return retired
+
+    async def _evict(self, method: Literal["GET", "POST"], url: str, data: str | None = None) -> None:
+        """Remove the cached response of a request so the next identical request is sent to the server.
+
+        :param method: The request method
+        :param url: The request URL, as it is passed to `_get` or `_post`
+        :param data: The request body of a POST request
+        """
+        if not self._use_cache:
+            return
+        request = httpx.Request(method, _make_safe_url(url), content=data)
+        await self._storage.remove(self._namespaced_key(request, request.content))
+
     def update_rate_limit(self, value: int):
         self._transport.rate = value
 
@@ -179,6 +300,8 @@ class _AsyncHTTPClient:
         headers = headers or {}
         extensions = extensions or {}
         extensions["cache_disabled"] = temp_disable_cache
+        if temp_disable_cache:
+            extensions["force_cache"] = False  # otherwise the controller would still serve the stored response
         self._setup_action()
 
         responses: list[bytes] = await asyncio.gather(
@@ -189,6 +312,41 @@ class _AsyncHTTPClient:
         )
         return responses
 
+    async def _iter_get(
+        self,
+        urls: list[str],
+        headers: dict | None = None,
+        temp_disable_cache: bool = False,
+        log_on_complete: bool = True,
+        extensions: dict | None = None,
+    ) -> AsyncIterator[tuple[int, bytes]]:
+        """Yield `(index, response)` pairs as each GET request completes, rather than waiting for all of them.
+
+        `index` is the position of the URL in `urls`. Pending requests are cancelled if the iterator is closed early.
+        """
+        urls: list[str] = _make_safe_url(urls)
+        self.__current_requests = 0
+        self.__total_requests = len(urls)
+        headers = headers or {}
+        extensions = extensions or {}
+        extensions["cache_disabled"] = temp_disable_cache
+        if temp_disable_cache:
+            extensions["force_cache"] = False  # otherwise the controller would still serve the stored response
+        self._setup_action()
+
+        async def indexed_get(index: int, url: str) -> tuple[int, bytes]:
+            return index, await self.__perform_action(
+                "get", url, log_on_complete, headers=headers, extensions=extensions
+            )
+
+        tasks = [asyncio.ensure_future(indexed_get(i, url)) for i, url in enumerate(urls)]
+        try:
+            for next_completed in asyncio.as_completed(tasks):
+                yield await next_completed
+        finally:
+            for task in tasks:
+                task.cancel()
+
     async def _post(
         self,
         url: str,
@@ -205,6 +363,8 @@ class _AsyncHTTPClient:
         headers = headers or {}
         extensions = extensions or {}
         extensions["cache_disabled"] = temp_disable_cache
+        if temp_disable_cache:
+            extensions["force_cache"] = False  # otherwise the controller would still serve the stored response
         self._setup_action()
 
         responses: list[bytes]
@@ -225,3 +385,72 @@ class _AsyncHTTPClient:
             ]
 
         return responses
+
+    async def _download(
+        self,
+        url: str,
+        path: Path,
+        *,
+        headers: dict | None = None,
+        overwrite: bool = False,
+        max_attempts: int = 5,
+        chunk_size: int = 1024 * 1024,
+    ) -> Path:
+        """Stream a URL to disk, resuming interrupted transfers with HTTP Range requests.
+
+        Data is written to a `.part` file next to `path` and moved into place once the transfer completes, so a
+        partially downloaded file is never mistaken for a complete one. When the server reports the size of the file,
+        a transfer that ends early is treated as an interruption and resumed.
+
+        :param url: The URL to download
+        :param path: The destination file
+        :param headers: Additional request headers
+        :param overwrite: Download the file again even if `path` already exists
+        :param max_attempts: The number of times to try (and resume) the transfer before raising the last error
+        :param chunk_size: The number of bytes to hold in memory before writing to disk
+        :return: The destination path
+        """
+        url = _make_safe_url(url)
+        lock = self._download_locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            if not overwrite and await aiofiles.os.path.exists(path):
+                logger.debug(f"Using existing download at {path}")
+                return path
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial = path.with_name(f"{path.name}.part")
+            for attempt in range(1, max_attempts + 1):
+                offset = (await aiofiles.os.stat(partial)).st_size if await aiofiles.os.path.exists(partial) else 0
+                # Range, Content-Range, and Content-Length count the bytes on the wire, so ask for them unencoded and
+                # write them as received; the offset of a resumed transfer then matches the bytes already on disk
+                request_headers = {**(headers or {}), "Accept-Encoding": "identity"}
+                if offset:
+                    request_headers["Range"] = f"bytes={offset}-"
+                    logger.debug(f"Resuming download of {url} from byte {offset}")
+
+                try:
+                    async with self._semaphore:  # noqa: SIM117, parenthesized context managers require Python 3.10
+                        async with self._download_client.stream("GET", url, headers=request_headers) as response:
+                            if response.status_code == 416:  # Range not satisfiable, the partial file is complete
+                                break
+                            response.raise_for_status()
+
+                            # The server may ignore the Range header and send the full body with a 200 status
+                            mode = "ab" if response.status_code == 206 else "wb"
+                            expected_size = _expected_size(response)
+                            async with aiofiles.open(partial, mode) as o_stream:
+                                async for chunk in response.aiter_raw(chunk_size):
+                                    await o_stream.write(chunk)
+
+                    received = (await aiofiles.os.stat(partial)).st_size
+                    if expected_size is not None and received < expected_size:
+                        raise httpx.ReadError(f"Received {received} of {expected_size} bytes")
+                    break
+                except httpx.TransportError as e:
+                    if attempt == max_attempts:
+                        logger.critical(f"Failed to download {url} after {max_attempts} attempts")
+                        raise
+                    logger.warning(f"Download of {url} was interrupted ({e!r}); retrying ({attempt}/{max_attempts})")
+
+            partial.replace(path)
+        return path
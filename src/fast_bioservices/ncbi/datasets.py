@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 
+from fast_bioservices.common.planning import RequestPlan
 from fast_bioservices.fast_http import _AsyncHTTPClient
 
 
@@ -24,7 +25,7 @@ class _NCBI(_AsyncHTTPClient):
         super().__init__(cache=cache, max_requests_per_second=self._max_requests_per_second)
 
     def _create_chunks(self, items: list[str]) -> list[str]:
-        return [",".join(items[i : i + self._chunk_size]) for i in range(0, len(items), self._chunk_size)]
+        return [",".join(chunk) for chunk in RequestPlan(items, self._chunk_size).chunks]
 
     @property
     def api_key(self):
@@ -1,12 +1,28 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Literal
 
 import pandas as pd
 from loguru import logger
 
+from fast_bioservices.biodbnet.biodbnet import BioDBNet
+from fast_bioservices.biodbnet.identifiers import classify_identifiers
+from fast_bioservices.biodbnet.nodes import Input, Output
 from fast_bioservices.biothings.mygene import MyGene
-from fast_bioservices.common import Taxon
+from fast_bioservices.common import Taxon, validate_taxon_id
+from fast_bioservices.common.frames import compact_frame
+
+# The only MyGene fields read by the conversion helpers; requesting fewer fields keeps responses and the cache small
+_MYGENE_FIELDS: list[str] = ["symbol", "entrezgene", "ensembl.gene"]
+_GeneColumn = Literal["ensembl_gene_id", "entrez_gene_id", "gene_symbol"]
+_GENE_COLUMNS: tuple[str, ...] = ("ensembl_gene_id", "entrez_gene_id", "gene_symbol")
+_Fallback = Literal["biodbnet"]
+_BIODBNET_NODES: dict[str, tuple[Input, Output]] = {
+    "ensembl_gene_id": (Input.ENSEMBL_GENE_ID, Output.ENSEMBL_GENE_ID),
+    "entrez_gene_id": (Input.GENE_ID, Output.GENE_ID),
+    "gene_symbol": (Input.GENE_SYMBOL, Output.GENE_SYMBOL),
+}
 
 
 def _show_na_error(
@@ -26,15 +42,180 @@ def _show_na_error(
     logger.critical(f"All {data_type} values are NA. Did you use the correct Taxon ID? Rerunning without cache.")
 
 
+def _format_result(df: pd.DataFrame, *, compact: bool) -> pd.DataFrame:
+    """Optionally convert "-" to NA and store identifier columns in compact dtypes."""
+    return compact_frame(df, separator=",") if compact else df
+
+
+def _ensembl_gene_ids(value: str | dict | list | None, *, first_only: bool) -> str | None:
+    """Read the Ensembl gene ID(s) from a hit's "ensembl" object or dotted "ensembl.gene" field."""
+    if value is None:
+        return None
+    values = value if isinstance(value, list) else [value]
+    genes = [v.get("gene") if isinstance(v, dict) else v for v in values]
+    genes = [g for g in genes if g is not None]
+    if not genes:
+        return None
+    return genes[0] if first_only else ",".join(genes)
+
+
+def _hits_to_frame(hits: list[dict], *, first_ensembl_only: bool = False) -> pd.DataFrame:
+    """Normalize MyGene hits into one row per hit, with `None` for missing fields.
+
+    :param hits: The results of `MyGene.gene` or `MyGene.query`
+    :param first_ensembl_only: Keep only the first Ensembl gene of a hit instead of joining them with commas
+    :return: A frame with "query", "ensembl_gene_id", "entrez_gene_id", and "gene_symbol" columns
+    """
+    entrez = [hit.get("entrezgene") for hit in hits]
+    return pd.DataFrame(
+        {
+            "query": [hit.get("query") for hit in hits],
+            "ensembl_gene_id": [
+                _ensembl_gene_ids(hit.get("ensembl", hit.get("ensembl.gene")), first_only=first_ensembl_only)
+                for hit in hits
+            ],
+            "entrez_gene_id": [None if e is None else str(e) for e in entrez],
+            "gene_symbol": [hit.get("symbol") for hit in hits],
+        },
+        dtype=object,
+    )
+
+
+def _first_per_query(hits: pd.DataFrame, queries: list[str]) -> pd.DataFrame:
+    """Reduce the hits of each query to the first non-null value per column, in the order of `queries`."""
+    return hits.groupby("query", sort=False).first().reindex(queries)
+
+
+def _gene_types(items: list[str]) -> pd.Series:
+    """Classify each item as an "ensembl_gene_id", "entrez_gene_id", "gene_symbol", or (otherwise) "unsupported".
+
+    Only items of a namespace with unambiguous syntax, such as RefSeq accessions, Ensembl transcript IDs, or "HGNC:"
+    IDs, are "unsupported". Items the classifier cannot tell apart from a symbol (e.g., H2BC12 or P2RY12) are symbols.
+    """
+    types = classify_identifiers(items).astype(object)
+    gene_types = types.map(
+        {
+            Input.ENSEMBL_GENE_ID.value: "ensembl_gene_id",
+            Input.GENE_ID.value: "entrez_gene_id",
+            Input.GENE_SYMBOL.value: "gene_symbol",
+        }
+    )
+    gene_types[types.isna()] = "gene_symbol"
+    return gene_types.fillna("unsupported")
+
+
+async def _biodbnet_fallback(
+    values: list[str],
+    taxon: int | str | Taxon,
+    input_column: _GeneColumn,
+    targets: list[str],
+    client: BioDBNet | None = None,
+) -> pd.DataFrame:
+    """Convert values with BioDBNet, returning a frame shaped like `_first_per_query` output."""
+    input_db = _BIODBNET_NODES[input_column][0]
+    outputs = [_BIODBNET_NODES[target][1] for target in targets]
+    client = client or BioDBNet()
+    result = await client.async_db2db(values, input_db, outputs, taxon=await validate_taxon_id(taxon))
+    result = result.drop_duplicates(input_db.value).set_index(input_db.value)
+    frame = result.rename(columns={output.value: target for output, target in zip(outputs, targets)})[targets]
+    return frame.where(frame != "-").replace("//", ",", regex=True)
+
+
+async def _refetch_missing(
+    df: pd.DataFrame,
+    ids: list[str],
+    taxon: int | str | Taxon,
+    *,
+    input_column: _GeneColumn,
+    targets: list[str],
+    cache: bool,
+    fallback: _Fallback | None,
+) -> pd.DataFrame:
+    """Request only the inputs without any result again, instead of re-running the whole request without cache.
+
+    The cached batches that returned nothing for those inputs are evicted, the inputs are requested again without the
+    cache, and inputs that are still missing are optionally converted with a fallback service.
+
+    :param df: The results of the original request, indexed by the unique inputs
+    :param ids: The inputs of the original request, which determine its cached batches
+    :param taxon: The taxon of the original request
+    :param input_column: The identifier type of the inputs
+    :param targets: The result columns; an input is missing when all of them are NA
+    :param cache: Whether the original request used the cache
+    :param fallback: The service used for inputs that MyGene still does not resolve
+    :return: A copy of `df` with the re-fetched results filled in
+    """
+    missing = df.index[df[targets].isna().all(axis=1)].tolist()
+    if not missing:
+        return df
+    logger.info(f"Re-fetching {len(missing)} of {len(df)} inputs without results")
+
+    df = df.copy()
+    mygene = MyGene(cache=cache)
+    if input_column == "gene_symbol":
+        await mygene.evict_query(ids, taxon, missing, scopes="symbol", fields=_MYGENE_FIELDS)
+        hits = await mygene.query(missing, taxon, scopes="symbol", fields=_MYGENE_FIELDS, temp_disable_cache=True)
+    else:
+        await mygene.evict_gene(ids, taxon, missing, fields=_MYGENE_FIELDS)
+        hits = await mygene.gene(missing, taxon, fields=_MYGENE_FIELDS, temp_disable_cache=True)
+    first_ensembl_only = input_column == "gene_symbol"
+    df.update(_first_per_query(_hits_to_frame(hits, first_ensembl_only=first_ensembl_only), missing)[targets])
+
+    missing = df.index[df[targets].isna().all(axis=1)].tolist()
+    if fallback == "biodbnet" and missing:
+        logger.info(f"Converting {len(missing)} inputs without results using BioDBNet")
+        df.update(await _biodbnet_fallback(missing, taxon, input_column, targets))
+    return df
+
+
 async def determine_gene_type(items: str | list[str], /) -> dict[str, str]:
-    return {
-        i: "ensembl_gene_id"
-        if i.startswith("ENS") and i[-1].isdigit()
-        else "entrez_gene_id"
-        if i.isdigit()
-        else "gene_symbol"
-        for i in items
-    }
+    items = [items] if isinstance(items, str) else items
+    # Keep the original labels; other identifier types are reported as symbols, as they always were
+    return dict(zip(items, _gene_types(items).replace("unsupported", "gene_symbol")))
+
+
+async def convert(
+    ids: str | list[str],
+    taxon: int | str | Taxon,
+    to: _GeneColumn | list[_GeneColumn] | None = None,
+    cache: bool = True,
+    compact: bool = False,
+) -> pd.DataFrame:
+    """Convert a mixed list of Ensembl gene IDs, Entrez gene IDs, and gene symbols in a single call.
+
+    Each item is classified locally. Ensembl and Entrez IDs are sent to `MyGene.gene` and symbols to `MyGene.query`,
+    and both requests run concurrently. Items of a different, unambiguous type (e.g., RefSeq accessions) are not
+    requested; their "input_type" is "unsupported" and their results are NA.
+
+    :param ids: The items to convert, in any mix of identifier types
+    :param taxon: The taxon to obtain information for
+    :param to: The columns to return; defaults to "ensembl_gene_id", "entrez_gene_id", and "gene_symbol"
+    :param cache: Should cache be used
+    :param compact: Store the identifier columns in compact dtypes
+    :return: A frame indexed by the items, in their original order, with an "input_type" column and the `to` columns
+    """
+    ids = [ids] if isinstance(ids, str) else ids
+    to = list(_GENE_COLUMNS) if to is None else [to] if isinstance(to, str) else to
+    if unknown := set(to) - set(_GENE_COLUMNS):
+        raise ValueError(f"Unknown columns {sorted(unknown)}; expected any of {list(_GENE_COLUMNS)}")
+
+    gene_types = _gene_types(ids)
+    unique = pd.Series(ids, dtype=object).drop_duplicates()
+    unique_types = gene_types.loc[unique.index]
+    gene_ids = unique[unique_types.isin(["ensembl_gene_id", "entrez_gene_id"])].tolist()
+    symbols = unique[unique_types == "gene_symbol"].tolist()
+
+    mygene = MyGene(cache=cache)
+    requests = []
+    if gene_ids:
+        requests.append(mygene.gene(ids=gene_ids, taxon=taxon, fields=_MYGENE_FIELDS))
+    if symbols:
+        requests.append(mygene.query(items=symbols, taxon=taxon, scopes="symbol", fields=_MYGENE_FIELDS))
+    hits = [hit for result in await asyncio.gather(*requests) for hit in result]
+
+    df = _first_per_query(_hits_to_frame(hits), ids).rename_axis("input").fillna(pd.NA)
+    df.insert(0, "input_type", gene_types.to_numpy())
+    return _format_result(df[["input_type", *to]], compact=compact)
 
 
 async def ensembl_to_gene_id_and_symbol(
@@ -42,45 +223,62 @@ async def ensembl_to_gene_id_and_symbol(
     taxon: int | str | Taxon,
     cache: bool = True,
     rerun_if_na: bool = True,
+    compact: bool = False,
+    refetch_na: bool = False,
+    fallback: _Fallback | None = None,
 ) -> pd.DataFrame:
-    data = []
-    for result in await MyGene(cache=cache).gene(ids=ids, taxon=taxon):
-        ensembl_data = result.get("ensembl", {})
-        ensembl_gene_id = (
-            ",".join(i["gene"] for i in ensembl_data)
-            if isinstance(ensembl_data, list)
-            else ensembl_data.get("gene", "-")
-        )
-        entrez_gene_id = result.get("entrezgene", "-")
-        symbol = result.get("symbol", "-")
-        data.append({"ensembl_gene_id": ensembl_gene_id, "entrez_gene_id": entrez_gene_id, "gene_symbol": symbol})
+    """Convert Ensembl gene IDs to Entrez gene IDs and gene symbols.
 
+    :param refetch_na: Evict and re-request only the IDs without results, instead of the `rerun_if_na` full re-run
+    :param fallback: Convert IDs that are still missing after `refetch_na` with this service
+    """
+    ids = [ids] if isinstance(ids, str) else ids
+    hits = await MyGene(cache=cache).gene(ids=ids, taxon=taxon, fields=_MYGENE_FIELDS)
+    df = _first_per_query(_hits_to_frame(hits), list(dict.fromkeys(ids)))
+    targets = ["entrez_gene_id", "gene_symbol"]
+
+    if refetch_na:
+        df = await _refetch_missing(
+            df, ids, taxon, input_column="ensembl_gene_id", targets=targets, cache=cache, fallback=fallback
+        )
     # if all gene id and gene symbol are nan, re-run without cache
-    df = pd.DataFrame(data)
-    if rerun_if_na and df["entrez_gene_id"].isna().all() and df["gene_symbol"].isna().all():
+    elif rerun_if_na and df["entrez_gene_id"].isna().all() and df["gene_symbol"].isna().all():
         _show_na_error("ensembl_to_gene_id_and_symbol")
-        return await ensembl_to_gene_id_and_symbol(ids, taxon, cache=False)
+        return await ensembl_to_gene_id_and_symbol(ids, taxon, cache=False, rerun_if_na=False, compact=compact)
 
-    return df
+    df = df.reindex(ids).reset_index(drop=True)[["ensembl_gene_id", "entrez_gene_id", "gene_symbol"]].fillna("-")
+    return _format_result(df, compact=compact)
 
 
 async def gene_id_to_ensembl_and_gene_symbol(
-    ids: str | list[str], taxon: int | str | Taxon, cache: bool = True, rerun_if_na: bool = True
+    ids: str | list[str],
+    taxon: int | str | Taxon,
+    cache: bool = True,
+    rerun_if_na: bool = True,
+    compact: bool = False,
+    refetch_na: bool = False,
+    fallback: _Fallback | None = None,
 ) -> pd.DataFrame:
-    data = {"entrez_gene_id": [], "ensembl_gene_id": [], "gene_symbol": []}
-    for result in await MyGene(cache=cache).gene(ids=ids, taxon=taxon):
-        data["entrez_gene_id"].append(result["entrezgene"]) if "entrezgene" in result else "-"
-        data["ensembl_gene_id"].append(result["ensembl"]["gene"]) if "ensembl" in result and "gene" in result[
-            "ensembl"
-        ] else "-"
-        data["gene_symbol"].append(result["symbol"]) if "symbol" in result else "-"
-
-    df = pd.DataFrame(data).set_index("entrez_gene_id", drop=True)
-    if rerun_if_na and df["ensembl_gene_id"].isna().all() and df["gene_symbol"].isna().all():
+    """Convert Entrez gene IDs to Ensembl gene IDs and gene symbols.
+
+    :param refetch_na: Evict and re-request only the IDs without results, instead of the `rerun_if_na` full re-run
+    :param fallback: Convert IDs that are still missing after `refetch_na` with this service
+    """
+    ids = [ids] if isinstance(ids, str) else ids
+    hits = await MyGene(cache=cache).gene(ids=ids, taxon=taxon, fields=_MYGENE_FIELDS)
+    df = _first_per_query(_hits_to_frame(hits), list(dict.fromkeys(ids)))
+    targets = ["ensembl_gene_id", "gene_symbol"]
+
+    if refetch_na:
+        df = await _refetch_missing(
+            df, ids, taxon, input_column="entrez_gene_id", targets=targets, cache=cache, fallback=fallback
+        )
+    elif rerun_if_na and df["ensembl_gene_id"].isna().all() and df["gene_symbol"].isna().all():
         _show_na_error("gene_id_to_ensembl_and_gene_symbol")
-        return await gene_id_to_ensembl_and_gene_symbol(ids, taxon, cache=False)
+        return await gene_id_to_ensembl_and_gene_symbol(ids, taxon, cache=False, rerun_if_na=False, compact=compact)
 
-    return pd.DataFrame(data).set_index("entrez_gene_id", drop=True)
+    df = df.reindex(ids).rename_axis("entrez_gene_id")[targets].fillna("-")
+    return _format_result(df, compact=compact)
 
 
 async def gene_symbol_to_ensembl_and_gene_id(
@@ -88,38 +286,30 @@ async def gene_symbol_to_ensembl_and_gene_id(
     taxon: int | str | Taxon,
     cache: bool = True,
     rerun_if_na: bool = True,
+    compact: bool = False,
+    refetch_na: bool = False,
+    fallback: _Fallback | None = None,
 ) -> pd.DataFrame:
-    symbols = [symbols] if isinstance(symbols, str) else symbols
-    data: dict[str, list[str | pd.NA]] = {"gene_symbol": [], "ensembl_gene_id": [], "entrez_gene_id": []}
-    for response in await MyGene(cache=cache).query(items=symbols, taxon=taxon, scopes="symbol"):
-        data["gene_symbol"].append(response["query"])
-
-        if "notfound" in response:
-            data["ensembl_gene_id"].append(pd.NA)
-            data["entrez_gene_id"].append(pd.NA)
-            continue
+    """Convert gene symbols to Ensembl gene IDs and Entrez gene IDs.
 
-        data["ensembl_gene_id"].append(response.get("ensembl.gene", pd.NA))
-        data["entrez_gene_id"].append(response.get("entrezgene", pd.NA))
+    :param refetch_na: Evict and re-request only the symbols without results, instead of the `rerun_if_na` full re-run
+    :param fallback: Convert symbols that are still missing after `refetch_na` with this service
+    """
+    symbols = [symbols] if isinstance(symbols, str) else symbols
+    hits = await MyGene(cache=cache).query(items=symbols, taxon=taxon, scopes="symbol", fields=_MYGENE_FIELDS)
+    df = _first_per_query(_hits_to_frame(hits, first_ensembl_only=True), sorted(set(symbols)))
+    targets = ["ensembl_gene_id", "entrez_gene_id"]
 
-    df = pd.DataFrame(data)
-    if rerun_if_na and df["ensembl_gene_id"].isna().all() and df["entrez_gene_id"].isna().all():
+    if refetch_na:
+        df = await _refetch_missing(
+            df, symbols, taxon, input_column="gene_symbol", targets=targets, cache=cache, fallback=fallback
+        )
+    elif rerun_if_na and df["ensembl_gene_id"].isna().all() and df["entrez_gene_id"].isna().all():
         _show_na_error("gene_symbol_to_ensembl_and_gene_id")
-        return await gene_symbol_to_ensembl_and_gene_id(symbols, taxon, cache=False)
+        return await gene_symbol_to_ensembl_and_gene_id(symbols, taxon, cache=False, rerun_if_na=False, compact=compact)
 
-    # combine duplicates of the gene_symbol column
-    df = df.groupby("gene_symbol").agg(
-        ensembl_gene_id=("ensembl_gene_id", lambda x: x.dropna().tolist()),
-        entrez_gene_id=("entrez_gene_id", lambda x: x.dropna().tolist()),
-    )
-
-    # remove lists in ensembl_gene_id and entrez_gene_id that are created as a result of the aggregate function
-    # additionally, some items are double nested (`[[]]`); the first list is removed on the apply, then the second is removed in the applymap
-    df["ensembl_gene_id"] = df["ensembl_gene_id"].apply(lambda x: pd.NA if len(x) == 0 else x[0])
-    df["entrez_gene_id"] = df["entrez_gene_id"].apply(lambda x: pd.NA if len(x) == 0 else x[0])
-    df = df.map(lambda x: x[0] if isinstance(x, list) else x)
-
-    return df
+    df = df.rename_axis("gene_symbol")[targets].fillna(pd.NA)
+    return _format_result(df, compact=compact)
 
 
 async def _main():
@@ -146,6 +336,4 @@ async def _main():
 
 
 if __name__ == "__main__":
-    import asyncio
-
     asyncio.run(_main())
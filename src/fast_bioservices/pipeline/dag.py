@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+from loguru import logger
+
+from fast_bioservices.settings import pipeline_cache_dir
+
+_StepFunction = Callable[[list[str]], Awaitable[pd.DataFrame]]
+
+
+class Step(NamedTuple):
+    """A step of a `DAG`.
+
+    :param name: The unique name of the step
+    :param func: An async function that converts a chunk of input values into a frame
+    :param after: The step whose output feeds this step, or `None` to use the values given to `DAG.run`
+    :param column: The column (or named index) of the upstream output that holds this step's input values
+    :param chunk_size: The number of input values passed to `func` at once
+    :param cache_key: Part of the cache key; change it when `func` changes (e.g., it uses a different taxon)
+    """
+
+    name: str
+    func: _StepFunction
+    after: str | None
+    column: str | None
+    chunk_size: int
+    cache_key: str
+
+
+def _load_frame(path: Path) -> pd.DataFrame | None:
+    if not path.exists():
+        return None
+    payload = json.loads(path.read_text())
+    frame = pd.DataFrame(payload["data"], columns=payload["columns"])
+    if payload.get("index") is not None:
+        frame = frame.set_index(payload["index"])
+    return frame
+
+
+def _save_frame(frame: pd.DataFrame, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Step functions such as `pipeline.convert` index their output by input value; keep a named index as a column
+    index = frame.index.name
+    if index is not None:
+        frame = frame.reset_index()
+    payload = json.loads(frame.to_json(orient="split", index=False))
+    path.write_text(json.dumps({**payload, "index": index}))
+
+
+def _values(frame: pd.DataFrame, column: str) -> pd.Series:
+    """Find the values of a column, or of the index if it has that name."""
+    if column in frame.columns:
+        return frame[column]
+    if frame.index.name == column:
+        return frame.index.to_series()
+    raise KeyError(column)
+
+
+def _ordered(parts: list[tuple[list[str], pd.DataFrame]], order: list[str], column: str | None) -> pd.DataFrame:
+    if not parts:
+        return pd.DataFrame()
+    rank = {value: i for i, value in enumerate(order)}
+    parts = sorted(parts, key=lambda part: min(rank.get(value, len(rank)) for value in part[0]))
+    # Keep a named index through the concatenation and sorting below, then restore it
+    names = {part.index.name for _, part in parts}
+    index = names.pop() if len(names) == 1 else None
+    frame = pd.concat([part.reset_index() if index is not None else part for _, part in parts], ignore_index=True)
+    # Chunks of a downstream step mix values in the order they arrived; sort rows that still hold their input value
+    if column is not None and column in frame.columns:
+        ranks = frame[column].map(lambda value: rank.get(str(value), len(rank)))
+        frame = frame.iloc[ranks.to_numpy().argsort(kind="stable")].reset_index(drop=True)
+    return frame.set_index(index) if index is not None else frame
+
+
+class DAG:
+    def __init__(self, cache: bool = True, max_concurrent_chunks: int = 4, cache_path: Path = pipeline_cache_dir):
+        """Run chained conversion steps with chunk-level pipelining between them.
+
+        A step starts on the first chunk of its input as soon as the upstream step produces it, instead of waiting for
+        the whole upstream step. Steps that share an upstream step run in parallel.
+
+        :param cache: Save the output of each step chunk and reuse it for identical chunks
+        :param max_concurrent_chunks: The maximum number of chunks each step converts at once
+        :param cache_path: The directory in which step outputs are saved
+        """
+        self._steps: dict[str, Step] = {}
+        self._cache: bool = cache
+        self._max_concurrent_chunks: int = max_concurrent_chunks
+        self._cache_path: Path = cache_path
+
+    @property
+    def steps(self) -> list[Step]:
+        """The steps of the DAG, in the order they were added."""
+        return list(self._steps.values())
+
+    def add(
+        self,
+        name: str,
+        func: _StepFunction,
+        *,
+        after: str | None = None,
+        column: str | None = None,
+        chunk_size: int = 500,
+        cache_key: str = "",
+    ) -> DAG:
+        """Add a step; upstream steps must be added first, which also prevents cycles.
+
+        :param name: The unique name of the step
+        :param func: An async function that converts a chunk of input values into a frame
+        :param after: The step whose output feeds this step, or `None` to use the values given to `run`
+        :param column: The column (or named index) of the upstream output that holds this step's input values
+        :param chunk_size: The number of input values passed to `func` at once
+        :param cache_key: Part of the cache key; change it when `func` changes (e.g., it uses a different taxon)
+        :return: The DAG, so calls can be chained
+        """
+        if name in self._steps:
+            raise ValueError(f"A step named '{name}' already exists")
+        if after is not None and after not in self._steps:
+            raise ValueError(f"Unknown upstream step '{after}'; add it before '{name}'")
+        if after is not None and column is None:
+            raise ValueError(f"Step '{name}' needs the `column` of '{after}' that holds its input values")
+        self._steps[name] = Step(name, func, after, column, chunk_size, cache_key)
+        return self
+
+    def _required(self, outputs: list[str]) -> list[Step]:
+        required: set[str] = set()
+        for name in outputs:
+            if name not in self._steps:
+                raise ValueError(f"Unknown step '{name}'")
+            while name is not None and name not in required:
+                required.add(name)
+                name = self._steps[name].after
+        return [step for step in self._steps.values() if step.name in required]
+
+    async def _convert(self, step: Step, chunk: list[str]) -> pd.DataFrame:
+        if not self._cache:
+            return await step.func(chunk)
+
+        key = hashlib.sha256(json.dumps([step.name, step.cache_key, sorted(chunk)]).encode()).hexdigest()
+        path = self._cache_path / f"{step.name}-{key}.json"
+        frame = await asyncio.to_thread(_load_frame, path)
+        if frame is None:
+            frame = await step.func(chunk)
+            await asyncio.to_thread(_save_frame, frame, path)
+        return frame
+
+    async def _run_step(
+        self,
+        step: Step,
+        inbox: asyncio.Queue,
+        consumers: list[tuple[Step, asyncio.Queue]],
+        frames: list[tuple[list[str], pd.DataFrame]],
+    ) -> None:
+        semaphore = asyncio.Semaphore(self._max_concurrent_chunks)
+        sent: dict[str, set[str]] = {consumer.name: set() for consumer, _ in consumers}
+
+        async def convert(chunk: list[str]) -> None:
+            async with semaphore:
+                frame = await self._convert(step, chunk)
+            frames.append((chunk, frame))
+            for consumer, queue in consumers:
+                try:
+                    values = _values(frame, consumer.column).explode().dropna().astype(str).unique()
+                except KeyError:
+                    raise KeyError(f"Step '{step.name}' did not return the column '{consumer.column}'") from None
+                new = [value for value in values if value not in sent[consumer.name]]
+                sent[consumer.name].update(new)
+                if new:
+                    await queue.put(new)
+
+        tasks: list[asyncio.Task] = []
+        buffer: list[str] = []
+        try:
+            while (values := await inbox.get()) is not None:
+                buffer.extend(values)
+                while len(buffer) >= step.chunk_size:
+                    tasks.append(asyncio.create_task(convert(buffer[: step.chunk_size])))
+                    buffer = buffer[step.chunk_size :]
+            if buffer:
+                tasks.append(asyncio.create_task(convert(buffer)))
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        logger.debug(f"Step '{step.name}' converted {len(tasks)} chunks")
+        for _, queue in consumers:
+            await queue.put(None)
+
+    async def run(self, values: str | list[str], outputs: list[str] | None = None) -> dict[str, pd.DataFrame]:
+        """Run the steps needed for `outputs`, streaming chunks between them.
+
+        :param values: The input values of the steps without an upstream step
+        :param outputs: The steps whose results are needed; their upstream steps also run. Defaults to every step
+        :return: The combined output frame of each step that ran, in the order of its input values: `values` for steps
+            without an upstream step, otherwise the order of `column` in the upstream output. A named index (e.g., the
+            "input" index of `pipeline.convert`) is kept
+        """
+        steps = self._required(outputs if outputs is not None else list(self._steps))
+        inboxes: dict[str, asyncio.Queue] = {step.name: asyncio.Queue() for step in steps}
+        frames: dict[str, list[tuple[list[str], pd.DataFrame]]] = {step.name: [] for step in steps}
+
+        workers = [
+            asyncio.create_task(
+                self._run_step(
+                    step,
+                    inboxes[step.name],
+                    [(consumer, inboxes[consumer.name]) for consumer in steps if consumer.after == step.name],
+                    frames[step.name],
+                )
+            )
+            for step in steps
+        ]
+
+        unique = list(dict.fromkeys([values] if isinstance(values, str) else values))
+        for step in steps:
+            if step.after is None:
+                await inboxes[step.name].put(unique)
+                await inboxes[step.name].put(None)
+
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+        # Chunks finish in any order, so put each step's rows back in the order of its input values
+        results: dict[str, pd.DataFrame] = {}
+        for step in steps:
+            if step.after is None:
+                order = unique
+            else:
+                upstream = results[step.after]
+                order = (
+                    _values(upstream, step.column).explode().dropna().astype(str).unique().tolist()
+                    if len(upstream)
+                    else []
+                )
+            results[step.name] = _ordered(frames[step.name], order, step.column)
+        return results
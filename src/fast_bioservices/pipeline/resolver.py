@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any, Literal
+
+import pandas as pd
+from loguru import logger
+
+from fast_bioservices.biodbnet.biodbnet import BioDBNet
+from fast_bioservices.biothings.mygene import MyGene
+from fast_bioservices.common import Taxon, validate_taxon_id
+from fast_bioservices.common.planning import RequestPlan
+from fast_bioservices.ensembl.lookup import Lookup
+from fast_bioservices.ncbi.datasets import Gene
+from fast_bioservices.pipeline import (
+    _GENE_COLUMNS,
+    _MYGENE_FIELDS,
+    _biodbnet_fallback,
+    _first_per_query,
+    _GeneColumn,
+    _hits_to_frame,
+)
+
+Source = Literal["mygene", "biodbnet", "ensembl", "ncbi"]
+_Adapter = Callable[[Any, list[str], _GeneColumn, int], Awaitable[pd.DataFrame]]
+
+
+async def _from_mygene(client: MyGene, values: list[str], input_type: _GeneColumn, taxon_id: int) -> pd.DataFrame:
+    if input_type == "gene_symbol":
+        hits = await client.query(values, taxon_id, scopes="symbol", fields=_MYGENE_FIELDS)
+    else:
+        hits = await client.gene(values, taxon_id, fields=_MYGENE_FIELDS)
+    return _first_per_query(_hits_to_frame(hits, first_ensembl_only=input_type == "gene_symbol"), values)
+
+
+async def _from_biodbnet(client: BioDBNet, values: list[str], input_type: _GeneColumn, taxon_id: int) -> pd.DataFrame:
+    targets = [column for column in _GENE_COLUMNS if column != input_type]
+    return await _biodbnet_fallback(values, taxon_id, input_type, targets, client=client)
+
+
+async def _from_ensembl(client: Lookup, values: list[str], input_type: _GeneColumn, taxon_id: int) -> pd.DataFrame:
+    if input_type == "ensembl_gene_id":
+        records = await client.by_ensembl(values)
+    elif input_type == "gene_symbol":
+        records = await client.by_symbol(values, taxon_id)
+    else:
+        raise ValueError("Ensembl lookups do not support Entrez gene IDs")
+
+    rows = {
+        value: {"ensembl_gene_id": record.get("id"), "gene_symbol": record.get("display_name")}
+        for value, record in records.items()
+        if record
+    }
+    return pd.DataFrame.from_dict(rows, orient="index", columns=["ensembl_gene_id", "gene_symbol"], dtype=object)
+
+
+async def _from_ncbi(client: Gene, values: list[str], input_type: _GeneColumn, taxon_id: int) -> pd.DataFrame:
+    if input_type == "entrez_gene_id":
+        reports = await client.report_by_id(values)
+        key = "gene_id"
+    elif input_type == "gene_symbol":
+        reports = await client.report_by_symbol(values, str(taxon_id))
+        key = "symbol"
+    else:
+        raise ValueError("NCBI gene reports do not support Ensembl gene IDs")
+
+    rows = {
+        gene[key]: {
+            "ensembl_gene_id": ",".join(gene.get("ensembl_gene_ids", [])) or None,
+            "entrez_gene_id": gene.get("gene_id"),
+            "gene_symbol": gene.get("symbol"),
+        }
+        for gene in reports["gene"]
+    }
+    return pd.DataFrame.from_dict(rows, orient="index", columns=list(_GENE_COLUMNS), dtype=object)
+
+
+_SOURCES: dict[str, tuple[Callable[[bool], Any], _Adapter]] = {
+    "mygene": (lambda cache: MyGene(cache=cache), _from_mygene),
+    "biodbnet": (lambda cache: BioDBNet(cache=cache), _from_biodbnet),
+    "ensembl": (lambda cache: Lookup(cache=cache), _from_ensembl),
+    "ncbi": (lambda cache: Gene(cache=cache), _from_ncbi),
+}
+
+
+class _Hedge:
+    def __init__(
+        self,
+        sources: list[Source],
+        input_type: _GeneColumn,
+        taxon_id: int,
+        hedge_after: float,
+        cache: bool,
+    ):
+        # One client per source, so every chunk shares that source's rate limit
+        self._sources = [(name, _SOURCES[name][0](cache), _SOURCES[name][1]) for name in sources]
+        self._input_type: _GeneColumn = input_type
+        self._taxon_id: int = taxon_id
+        self._hedge_after: float = hedge_after
+        self._targets: list[str] = [column for column in _GENE_COLUMNS if column != input_type]
+
+    def _start(self, index: int, chunk: list[str]) -> asyncio.Task:
+        name, client, adapter = self._sources[index]
+        task = asyncio.create_task(adapter(client, chunk, self._input_type, self._taxon_id))
+        task.set_name(name)
+        return task
+
+    async def resolve(self, chunk: list[str]) -> pd.DataFrame:
+        """Resolve one chunk, hedging to the next source whenever the running ones are slow or fail."""
+        result = pd.DataFrame(index=pd.Index(chunk, dtype=object), columns=[*self._targets, "source"], dtype=object)
+        pending: set[asyncio.Task] = {self._start(0, chunk)}
+        next_source = 1
+        try:
+            while pending:
+                can_hedge = next_source < len(self._sources)
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=self._hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                failed = False
+                for task in done:
+                    if task.exception() is not None:
+                        logger.warning(f"Source '{task.get_name()}' failed: {task.exception()!r}")
+                        failed = True
+                        continue
+                    answer = task.result().reindex(result.index).reindex(columns=self._targets)
+                    resolved = answer.notna().any(axis=1) & result["source"].isna()
+                    result.loc[resolved, self._targets] = answer.loc[resolved]
+                    result.loc[resolved, "source"] = task.get_name()
+
+                if result["source"].notna().all():
+                    break
+                # Hedge when the running sources are too slow, failed, or finished without an answer for every ID
+                if can_hedge and (not done or failed or not pending):
+                    unresolved = result.index[result["source"].isna()].tolist()
+                    pending.add(self._start(next_source, unresolved))
+                    next_source += 1
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return result
+
+
+async def resolve(
+    ids: str | list[str],
+    taxon: int | str | Taxon,
+    input_type: _GeneColumn,
+    sources: list[Source] | None = None,
+    hedge_after: float = 5.0,
+    chunk_size: int = 1000,
+    cache: bool = True,
+) -> pd.DataFrame:
+    """Convert gene identifiers with several services, hedging slow requests to the next service.
+
+    Each chunk is sent to the first source. If it has not answered after `hedge_after` seconds (or fails, or leaves IDs
+    unresolved), the unresolved IDs are also sent to the next source. Each ID takes the first answer it receives, and
+    requests that are still running once every ID is resolved are cancelled.
+
+    :param ids: The identifiers to convert
+    :param taxon: The taxon to obtain information for
+    :param input_type: The identifier type of `ids`
+    :param sources: The services to use, in order of preference; defaults to MyGene, then BioDBNet
+    :param hedge_after: The number of seconds to wait for a source before also asking the next one
+    :param chunk_size: The number of IDs resolved together
+    :param cache: Should cache be used
+    :return: A frame indexed by `ids` in their original order, with the other identifier columns and the "source" used
+    """
+    sources = sources or ["mygene", "biodbnet"]
+    if unknown := set(sources) - set(_SOURCES):
+        raise ValueError(f"Unknown sources {sorted(unknown)}; expected any of {list(_SOURCES)}")
+
+    plan = RequestPlan(ids, chunk_size, sort=False)
+    hedge = _Hedge(sources, input_type, await validate_taxon_id(taxon), hedge_after, cache)
+    results = await asyncio.gather(*[hedge.resolve(chunk) for chunk in plan.chunks])
+    resolved = pd.concat(results) if results else pd.DataFrame(columns=[*hedge._targets, "source"])
+    return resolved.reindex(plan.values).rename_axis(input_type)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import pandas as pd
+from loguru import logger
+
+from fast_bioservices.common.planning import RequestPlan
+from fast_bioservices.fast_http import SharedRateLimiter
+
+_ShardFunction = Callable[[list[str]], Awaitable[Any]]
+
+
+def _shard_of(value: str, shards: int) -> int:
+    # `hash()` is salted per process, so use a stable digest
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big") % shards
+
+
+def partition(values: list[str], shards: int) -> list[list[str]]:
+    """Split unique `values` into `shards` groups by hash, so each value always lands in the same group.
+
+    :param values: The values to split; duplicates are only kept once
+    :param shards: The number of groups
+    :return: The groups, each in the order of `values`; some may be empty
+    """
+    groups: list[list[str]] = [[] for _ in range(shards)]
+    for value in dict.fromkeys(values):
+        groups[_shard_of(value, shards)].append(value)
+    return groups
+
+
+def _run_shard(func: _ShardFunction, shard: list[str], limiter: SharedRateLimiter) -> Any:
+    limiter.install()
+    return asyncio.run(func(shard))
+
+
+def _merge(results: list[Any], values: list[str], on: str) -> Any:
+    plan = RequestPlan(values, chunk_size=1, sort=False)
+    if all(isinstance(result, pd.DataFrame) for result in results):
+        merged = pd.concat(results) if results else pd.DataFrame(columns=[on])
+        if on in merged.columns:
+            return plan.align(merged, on=on)
+        if merged.index.name == on:
+            return plan.align(merged.reset_index(), on=on).set_index(on)
+        raise KeyError(f"The shard results have neither a column nor an index named '{on}'")
+    if all(isinstance(result, list) for result in results):
+        return plan.align_records([record for result in results for record in result], key=on)
+    if all(isinstance(result, dict) for result in results):
+        merged = {key: value for result in results for key, value in result.items()}
+        return {value: merged[value] for value in plan.unique if value in merged}
+    raise TypeError(f"Cannot merge shard results of types {sorted({type(result).__name__ for result in results})}")
+
+
+async def run_sharded(
+    func: _ShardFunction,
+    values: str | list[str],
+    processes: int | None = None,
+    shards: int | None = None,
+    on: str = "input",
+) -> Any:
+    """Run `func` over shards of `values` in a process pool, each process with its own event loop.
+
+    Use this when decoding responses and building frames keeps a single core busy, such as for millions of IDs.
+    `values` are de-duplicated and hash-partitioned, so repeated runs send the same requests and reuse the cache.
+    All processes share one rate budget per host, set by the `max_requests_per_second` of the clients `func` creates,
+    and write to the same on-disk cache.
+
+    :param func: A module-level async function that converts a shard of values, e.g. `functools.partial(convert,
+        taxon=9606, to="gene_symbol")`; it must be picklable and should create its own clients
+    :param values: The values to convert
+    :param processes: The number of worker processes; defaults to the number of CPUs
+    :param shards: The number of shards; defaults to `processes`. More shards than processes balance uneven shards
+    :param on: The frame column (or index) or record field of the shard results that holds the input value
+    :return: The shard results in the order of `values`, repeated for duplicates: frames are aligned like
+        `RequestPlan.align`, lists of records like `RequestPlan.align_records`, and dicts keep one entry per value
+    """
+    values = [values] if isinstance(values, str) else list(values)
+    processes = processes or os.cpu_count() or 1
+    groups = [group for group in partition(values, shards or processes) if group]
+    logger.debug(f"Running {len(groups)} shards on {processes} processes")
+
+    # Starting and stopping the manager and pool block, so keep them off the event loop
+    loop = asyncio.get_running_loop()
+    manager = await asyncio.to_thread(multiprocessing.Manager)
+    pool = ProcessPoolExecutor(max_workers=processes)
+    try:
+        limiter = SharedRateLimiter(manager.Lock(), manager.dict())
+        results = await asyncio.gather(
+            *[loop.run_in_executor(pool, _run_shard, func, group, limiter) for group in groups]
+        )
+    finally:
+        await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+        await asyncio.to_thread(manager.shutdown)
+    return _merge(results, values, on)
@@ -5,9 +5,15 @@ import appdirs
 # Cache settings
 _root_cache_dir: Path = Path(appdirs.user_cache_dir("fast_bioservices"))
 cache_dir: Path = Path(_root_cache_dir, "fast_bioservices_cache")
+download_dir: Path = Path(_root_cache_dir, "downloads")
 db_filepath: Path = Path(_root_cache_dir, "fast_bioservices.db")
+bigg_search_index_filepath: Path = Path(_root_cache_dir, "bigg_search_index.json")
+bigg_version_filepath: Path = Path(_root_cache_dir, "bigg_version.json")
+ensembl_species_filepath: Path = Path(_root_cache_dir, "ensembl_species.json")
+pipeline_cache_dir: Path = Path(_root_cache_dir, "pipeline")
 log_filepath: Path = Path(_root_cache_dir, "fast_bioservices.log")
 
 _root_cache_dir.mkdir(parents=True, exist_ok=True)
 cache_dir.mkdir(parents=True, exist_ok=True)
+download_dir.mkdir(parents=True, exist_ok=True)
 log_filepath.touch()
@@ -1,10 +1,22 @@
+import gzip
+import hashlib
+import json
 import os
 from pathlib import Path
 from tempfile import TemporaryDirectory
 
+import httpx
+import numpy as np
 import pytest
 
-from fast_bioservices.bigg import BiGG
+from fast_bioservices.bigg import (
+    BiGG,
+    ModelStore,
+    SearchIndex,
+    StoichiometricMatrix,
+    iter_model_section,
+    read_model_metadata,
+)
 
 
 @pytest.fixture
@@ -140,3 +152,299 @@ def test_universal_reaction_details(bigg_instance): ...
 def test_universal_metabolites(bigg_instance): ...
 def test_universal_metabolite_details(bigg_instance): ...
 def test_search(bigg_instance): ...
+
+
+def _details_handler(request: httpx.Request) -> httpx.Response:
+    item_id = request.url.path.rsplit("/", 1)[-1]
+    return httpx.Response(200, json={"bigg_id": item_id, "name": f"{item_id} name"})
+
+
+@pytest.fixture
+def offline_bigg() -> BiGG:
+    bigg = BiGG(cache=False)
+    bigg._transport.transport = httpx.MockTransport(_details_handler)
+    return bigg
+
+
+@pytest.mark.asyncio
+async def test_bulk_model_details(offline_bigg):
+    details = await offline_bigg.bulk_model_details("Recon3D", "reactions", ["HEX1", "PGI", "HEX1"])
+    assert list(details) == ["HEX1", "PGI"]
+    assert details["PGI"]["name"] == "PGI name"
+
+    as_dataframe = await offline_bigg.bulk_universal_details("metabolites", ["glc__D", "atp"], as_dataframe=True)
+    assert as_dataframe.index.tolist() == ["glc__D", "atp"]
+    assert as_dataframe.loc["atp", "bigg_id"] == "atp"
+
+
+@pytest.fixture
+def small_model() -> dict:
+    return {
+        "id": "toy",
+        "version": "1",
+        "metabolites": [
+            {"id": "glc__D_c", "name": "D-Glucose", "compartment": "c"},
+            {"id": "atp_c", "name": "ATP", "compartment": "c"},
+            {"id": "g6p_c", "name": "D-Glucose 6-phosphate", "compartment": "c"},
+        ],
+        "reactions": [
+            {
+                "id": "HEX1",
+                "metabolites": {"glc__D_c": -1, "atp_c": -1, "g6p_c": 1},
+                "lower_bound": 0,
+                "upper_bound": 1000,
+                "gene_reaction_rule": "(3098_AT1 and 80201_AT1) or 3101_AT1",
+            },
+            {"id": "EX_glc__D_e", "metabolites": {"glc__D_c": -1}, "lower_bound": -10, "upper_bound": 1000},
+        ],
+        "genes": [{"id": "3098_AT1"}, {"id": "80201_AT1"}, {"id": "3101_AT1"}],
+    }
+
+
+def test_model_store(small_model):
+    with TemporaryDirectory() as tempdir:
+        store = ModelStore(Path(tempdir) / "models.db")
+        assert store.ingest(small_model) == "toy"
+        store.ingest(small_model)  # re-ingesting replaces the model instead of duplicating it
+
+        assert store.reactions_with_metabolite("toy", "glc__D_c")["reaction_id"].tolist() == ["EX_glc__D_e", "HEX1"]
+        assert store.reactions_with_gene("toy", "80201_AT1")["reaction_id"].tolist() == ["HEX1"]
+        assert len(store.reaction_metabolites("toy", "HEX1")) == 3
+        assert store.models()["model_id"].tolist() == ["toy"]
+
+
+def _version_handler(version: str):
+    return lambda _: httpx.Response(200, json={"bigg_models_version": version})
+
+
+@pytest.mark.asyncio
+async def test_download_into_store(small_model, monkeypatch, tmp_path):
+    monkeypatch.setattr("fast_bioservices.bigg.bigg.bigg_version_filepath", tmp_path / "bigg_version.json")
+    content = json.dumps(small_model).encode()
+    bigg = BiGG(cache=False)
+    bigg._transport.transport = httpx.MockTransport(_version_handler("1.6.0"))
+    bigg._download_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda _: httpx.Response(200, stream=httpx.ByteStream(content)))
+    )
+
+    with TemporaryDirectory() as tempdir:
+        store = ModelStore(Path(tempdir) / "models.db")
+        path = await bigg.download("toy", ext="json", download_path=Path(tempdir), store=store)
+        assert path.read_bytes() == content
+        assert store.models()["sha256"].tolist() == [hashlib.sha256(content).hexdigest()]
+        # Files are streamed once per reaction table
+        assert store.reactions_with_gene("toy", "80201_AT1")["reaction_id"].tolist() == ["HEX1"]
+        assert len(store.reaction_metabolites("toy", "HEX1")) == 3
+
+        with pytest.raises(ValueError, match="Checksum mismatch"):
+            await bigg.download("toy", ext="json", download_path=Path(tempdir), expected_sha256="0" * 64)
+
+
+@pytest.mark.asyncio
+async def test_download_is_reused_per_version(monkeypatch, tmp_path):
+    version_file = tmp_path / "bigg_version.json"
+    monkeypatch.setattr("fast_bioservices.bigg.bigg.bigg_version_filepath", version_file)
+    downloads: list[str] = []
+
+    def download_handler(request: httpx.Request) -> httpx.Response:
+        downloads.append(request.url.path)
+        return httpx.Response(200, stream=httpx.ByteStream(f"release {len(downloads)}".encode()))
+
+    def client(version: str) -> BiGG:
+        bigg = BiGG(cache=False)
+        bigg._transport.transport = httpx.MockTransport(_version_handler(version))
+        bigg._download_client = httpx.AsyncClient(transport=httpx.MockTransport(download_handler))
+        return bigg
+
+    bigg = client("1.6.0")
+    path = await bigg.download("toy", ext="json", download_path=tmp_path)
+    assert await bigg.download("toy", ext="json", download_path=tmp_path) == path
+    assert len(downloads) == 1
+
+    # After a BiGG release, the file from the previous version is downloaded again
+    version_file.unlink()
+    await client("1.7.0").download("toy", ext="json", download_path=tmp_path)
+    assert len(downloads) == 2
+    assert path.read_text() == "release 2"
+    assert (tmp_path / "toy.json.version").read_text() == "bigg-1.7.0"
+
+
+def test_search_index():
+    index = SearchIndex.from_universal(
+        reactions=[{"bigg_id": "HEX1", "name": "Hexokinase (D-glucose:ATP)"}, {"bigg_id": "PGI", "name": None}],
+        metabolites=[{"bigg_id": "glc__D", "name": "D-Glucose"}, {"bigg_id": "g6p", "name": "D-Glucose 6-phosphate"}],
+    )
+    index.add_database_links("metabolites", "glc__D", {"KEGG Compound": [{"id": "C00031", "link": "..."}]})
+
+    assert index.search("HEX1")[0]["bigg_id"] == "HEX1"
+    assert index.search("hexo")[0]["bigg_id"] == "HEX1"
+    assert index.search("C00031")[0]["bigg_id"] == "glc__D"
+    assert [r["bigg_id"] for r in index.search("D-Glucose", search_type="metabolites")] == ["glc__D", "g6p"]
+    assert index.search("Hexokinaze")[0]["bigg_id"] == "HEX1"
+    assert index.search("glucose", search_type="reactions")[0]["bigg_id"] == "HEX1"
+
+    with TemporaryDirectory() as tempdir:
+        index.save(Path(tempdir) / "index.json", version="1.6.0")
+        loaded, version = SearchIndex.load(Path(tempdir) / "index.json")
+        assert version == "1.6.0"
+        assert len(loaded) == len(index) == 4
+
+
+@pytest.mark.asyncio
+async def test_search_index_rebuilds_for_links(monkeypatch, tmp_path):
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path.removeprefix("/api/v2")
+        if path == "/database_version":
+            return httpx.Response(200, json={"bigg_models_version": "1.6.0"})
+        if path == "/universal/reactions":
+            return httpx.Response(200, json={"results": [{"bigg_id": "HEX1", "name": "Hexokinase"}]})
+        if path == "/universal/metabolites":
+            return httpx.Response(200, json={"results": [{"bigg_id": "glc__D", "name": "D-Glucose"}]})
+        links = {"KEGG Compound": [{"id": "C00031"}]} if path.endswith("glc__D") else {}
+        return httpx.Response(200, json={"database_links": links})
+
+    monkeypatch.setattr("fast_bioservices.bigg.bigg.bigg_search_index_filepath", tmp_path / "index.json")
+    bigg = BiGG(cache=False)
+    bigg._transport.transport = httpx.MockTransport(handler)
+
+    assert not (await bigg.search_index()).with_links
+    with_links = await bigg.search_index(with_links=True)
+    assert with_links.with_links
+    assert with_links.search("C00031")[0]["bigg_id"] == "glc__D"
+
+    # A new client loads the saved index, which now has links
+    other = BiGG(cache=False)
+    other._transport.transport = httpx.MockTransport(lambda request: pytest.fail("the saved index is reused"))
+    other.version = bigg.version
+    loaded = await other.search_index(with_links=True)
+    assert loaded.with_links
+    assert SearchIndex.load(tmp_path / "index.json")[0].with_links
+
+
+@pytest.mark.asyncio
+async def test_version_namespaced_cache(monkeypatch, tmp_path):
+    requests: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        return httpx.Response(200, json={"bigg_models_version": "1.6.0", "api_version": "v2"})
+
+    cache = tmp_path / "cache"
+    for name in ["GET|bigg.ucsd.edu|a", "bigg-1.5.0|GET|bigg.ucsd.edu|b", "bigg-1.6.0|GET|bigg.ucsd.edu|c"]:
+        (cache / "ab").mkdir(parents=True, exist_ok=True)
+        (cache / "ab" / name).touch()
+    (cache / "ab" / "GET|other.org|d").touch()
+    monkeypatch.setattr("fast_bioservices.fast_http.cache_dir", cache)
+    monkeypatch.setattr("fast_bioservices.bigg.bigg.bigg_version_filepath", tmp_path / "bigg_version.json")
+
+    bigg = BiGG(cache=False)
+    bigg._transport.transport = httpx.MockTransport(handler)
+    await bigg._refresh_cache_namespace()
+    await bigg._refresh_cache_namespace()
+
+    assert bigg._cache_namespace == "bigg-1.6.0"
+    assert requests == ["/api/v2/database_version"]
+    assert sorted(p.name for p in (cache / "ab").iterdir()) == ["GET|other.org|d", "bigg-1.6.0|GET|bigg.ucsd.edu|c"]
+
+    # A truncated version file is checked again instead of breaking the client
+    version_file = tmp_path / "bigg_version.json"
+    version_file.write_text(version_file.read_text()[:10])
+    other = BiGG(cache=False)
+    other._transport.transport = httpx.MockTransport(handler)
+    await other._refresh_cache_namespace()
+    assert other._cache_namespace == "bigg-1.6.0"
+    assert json.loads(version_file.read_text())["version"] == "1.6.0"
+    assert not list(tmp_path.glob("bigg_version.json.*"))
+
+
+@pytest.mark.asyncio
+async def test_mirror(monkeypatch, tmp_path):
+    monkeypatch.setattr("fast_bioservices.bigg.bigg.bigg_version_filepath", tmp_path / "bigg_version.json")
+    listing = {
+        "results": [
+            {"bigg_id": "e_coli_core", "metabolite_count": 72, "reaction_count": 95, "gene_count": 137},
+            {"bigg_id": "iAB_RBC_283", "metabolite_count": 342, "reaction_count": 469, "gene_count": 346},
+        ]
+    }
+    downloads: list[str] = []
+
+    def api_handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("database_version"):
+            return httpx.Response(200, json={"bigg_models_version": "1.6.0"})
+        return httpx.Response(200, json=listing)
+
+    def download_handler(request: httpx.Request) -> httpx.Response:
+        downloads.append(request.url.path.rsplit("/", 1)[-1])
+        return httpx.Response(200, stream=httpx.ByteStream(b"{}"))
+
+    bigg = BiGG(cache=False)
+    bigg._transport.transport = httpx.MockTransport(api_handler)
+    bigg._download_client = httpx.AsyncClient(transport=httpx.MockTransport(download_handler))
+
+    first = await bigg.mirror(tmp_path)
+    assert sorted(first["updated"]) == ["e_coli_core", "iAB_RBC_283"]
+    assert sorted(downloads) == ["e_coli_core.json", "iAB_RBC_283.json"]
+
+    downloads.clear()
+    listing["results"][0]["reaction_count"] = 96
+    listing["results"].pop()
+    second = await bigg.mirror(tmp_path, prune=True)
+    assert second == {"updated": ["e_coli_core"], "unchanged": [], "removed": ["iAB_RBC_283"]}
+    assert downloads == ["e_coli_core.json"]
+    assert not (tmp_path / "iAB_RBC_283.json").exists()
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert manifest["version"] == "1.6.0"
+    assert manifest["models"]["e_coli_core"]["fingerprint"]["reaction_count"] == 96
+
+
+@pytest.mark.asyncio
+async def test_iter_model_section(small_model, tmp_path):
+    small_model["compartments"] = {"c": 'cytosol "[quoted]" \\ {braces}'}
+    content = json.dumps(small_model, indent=1).encode()
+
+    # A tiny chunk size splits values, strings, and escapes across reads
+    reactions = list(iter_model_section(content, "reactions", chunk_size=7))
+    assert reactions == small_model["reactions"]
+    assert list(iter_model_section(content, "genes", chunk_size=5)) == small_model["genes"]
+    assert read_model_metadata(content, chunk_size=3) == {
+        "id": "toy",
+        "version": "1",
+        "compartments": small_model["compartments"],
+    }
+
+    path = tmp_path / "toy.json.gz"
+    path.write_bytes(gzip.compress(content))
+    assert list(iter_model_section(path, "metabolites")) == small_model["metabolites"]
+    assert [r["id"] async for r in BiGG(cache=False).iter_reactions("toy", path=path)] == ["HEX1", "EX_glc__D_e"]
+    assert list(iter_model_section(b'{"id": "empty", "genes": []}', "genes")) == []
+    assert list(iter_model_section(b'{"id": "empty"}', "reactions")) == []
+
+
+def test_streaming_numbers_split_across_chunks():
+    content = b'{"a": 12.5, "b": -3e-2, "c": [1E+10, 0.25], "genes": [1.5, {"id": "x", "bound": -1000.0}], "d": 7}'
+    expected = json.loads(content)
+    for chunk_size in range(1, len(content) + 2):
+        assert read_model_metadata(content, chunk_size=chunk_size) == {"a": 12.5, "b": -3e-2, "c": [1e10, 0.25], "d": 7}
+        assert list(iter_model_section(content, "genes", chunk_size=chunk_size)) == expected["genes"]
+
+
+def test_stoichiometric_matrix(small_model, tmp_path):
+    from_dict = StoichiometricMatrix.from_model(small_model)
+    from_bytes = StoichiometricMatrix.from_model(json.dumps(small_model).encode())
+
+    assert from_dict.shape == (3, 2)
+    assert from_dict.metabolites.tolist() == ["glc__D_c", "atp_c", "g6p_c"]
+    assert from_dict.reactions.tolist() == ["HEX1", "EX_glc__D_e"]
+    np.testing.assert_array_equal(from_dict.to_dense(), [[-1, -1], [-1, 0], [1, 0]])
+    np.testing.assert_array_equal(from_bytes.to_dense(), from_dict.to_dense())
+    np.testing.assert_array_equal(from_dict.lower_bounds, [0, -10])
+
+    indptr, indices, data = from_dict.to_csr()
+    assert indptr.tolist() == [0, 2, 3, 4]
+    assert indices.tolist() == [0, 1, 0, 0]
+    assert data.tolist() == [-1, -1, -1, 1]
+
+    from_dict.save(tmp_path / "toy.npz")
+    loaded = StoichiometricMatrix.load(tmp_path / "toy.npz")
+    assert all(np.array_equal(a, b) for a, b in zip(loaded, from_dict))
@@ -6,6 +6,8 @@ import pandas as pd
 import pytest
 
 from fast_bioservices import BioDBNet, Input, Output, Taxon
+from fast_bioservices.biodbnet import classify_identifiers, group_identifiers
+from fast_bioservices.biodbnet.biodbnet import _explode_annotations
 
 
 @pytest.fixture
@@ -204,6 +206,23 @@ def test_db_annot(biodbnet_no_cache):
     pass
 
 
+def test_explode_annotations():
+    df = pd.DataFrame(
+        {
+            "InputValue": ["4318", "1376"],
+            "GO Terms": ["GO:0001501//GO:0006508", "GO:0006508"],
+            "Pathways": ["-", "Fatty acid degradation"],
+        }
+    )
+    tables = _explode_annotations(df)
+
+    assert set(tables) == {"GO Terms", "Pathways"}
+    assert tables["GO Terms"]["InputValue"].tolist() == ["4318", "4318", "1376"]
+    assert tables["GO Terms"]["GO Terms"].tolist() == ["GO:0001501", "GO:0006508", "GO:0006508"]
+    assert isinstance(tables["GO Terms"]["GO Terms"].dtype, pd.CategoricalDtype)
+    assert tables["Pathways"]["InputValue"].tolist() == ["1376"]
+
+
 @pytest.mark.skip(reason="getAllPathways tests not yet written")
 def test_get_all_pathways(biodbnet_no_cache):
     pass
@@ -212,3 +231,29 @@ def test_get_all_pathways(biodbnet_no_cache):
 @pytest.mark.skip(reason="getPathwayFromDatabase tests not yet written")
 def test_get_pathway_from_database(biodbnet_no_cache):
     pass
+
+
+def test_classify_identifiers():
+    values = ["ENSG00000141510", "ENST00000269305", "7157", "NM_000546.6", "P53_HUMAN", "HGNC:11998", "TP53", "a b"]
+    expected = [
+        Input.ENSEMBL_GENE_ID,
+        Input.ENSEMBL_TRANSCRIPT_ID,
+        Input.GENE_ID,
+        Input.REFSEQ_MRNA_ACCESSION,
+        Input.UNIPROT_ENTRY_NAME,
+        Input.HGNC_ID,
+        Input.GENE_SYMBOL,
+    ]
+    types = classify_identifiers(values)
+
+    assert types.iloc[:-1].tolist() == [e.value for e in expected]
+    assert pd.isna(types.iloc[-1])
+
+    # Symbols that also match a loose accession pattern are left for a network lookup instead of being misclassified
+    ambiguous = ["H2BC12", "B3GAT1", "R3HDM1", "P2RY12", "P04637", "C12345", "AB123456", "ABC12345", "S000001234"]
+    assert classify_identifiers(ambiguous).isna().all()
+
+
+def test_group_identifiers():
+    groups = group_identifiers(["TP53", "7157", "TP53", "a b"])
+    assert groups == {Input.GENE_SYMBOL: ["TP53", "TP53"], Input.GENE_ID: ["7157"], None: ["a b"]}
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import json
+
+import httpx
+import pytest
+
+from fast_bioservices.biothings import BioThings
+from fast_bioservices.biothings.engine import _UnscopedBioThings
+from fast_bioservices.biothings.mychem import MyChem
+from fast_bioservices.biothings.mydisease import MyDisease
+from fast_bioservices.biothings.mygene import MyGene
+from fast_bioservices.biothings.myvariant import MyVariant
+
+
+@pytest.mark.asyncio
+async def test_batched_annotations():
+    bodies: list[list[str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/v1/variant"
+        assert request.url.params["assembly"] == "hg38"
+        assert request.url.params["fields"] == "dbsnp.rsid"
+        ids = json.loads(request.content)["ids"]
+        bodies.append(ids)
+        return httpx.Response(200, json=[{"query": i, "dbsnp": {"rsid": f"rs{i[-1]}"}} for i in ids])
+
+    myvariant = MyVariant(cache=False, assembly="hg38")
+    myvariant._chunk_size = 2
+    myvariant._transport.transport = httpx.MockTransport(handler)
+
+    ids = ["chr1:g.3A>G", "chr1:g.1A>G", "chr1:g.2A>G", "chr1:g.1A>G"]
+    results = await myvariant.variant(ids, fields=["dbsnp.rsid"])
+    assert sorted(bodies) == [["chr1:g.1A>G", "chr1:g.2A>G"], ["chr1:g.3A>G"]]
+    assert [r["query"] for r in results] == ids
+
+
+def _biothings_handler(requests: list[httpx.Request]):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "GET":  # scroll pages
+            if "scroll_id" in request.url.params:
+                return httpx.Response(200, json={"success": False, "error": "No results to return."})
+            return httpx.Response(200, json={"_scroll_id": "page-2", "hits": [{"_id": "1"}, {"_id": "2"}]})
+        body = json.loads(request.content)
+        return httpx.Response(200, json=[{"query": item, "_id": item} for item in body.get("ids", body.get("q"))])
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_mychem():
+    requests: list[httpx.Request] = []
+    mychem = MyChem(cache=False)
+    mychem._transport.transport = httpx.MockTransport(_biothings_handler(requests))
+
+    assert [r["query"] for r in await mychem.chem(["CHEMBL25", "DB00945"], fields="drugbank.name")] == [
+        "CHEMBL25",
+        "DB00945",
+    ]
+    assert len(await mychem.query(["aspirin"], scopes="drugbank.name", temp_disable_cache=True)) == 1
+    assert [hit["_id"] async for hit in mychem.fetch_all("drugbank.name:aspirin")] == ["1", "2"]
+    assert [request.url.path for request in requests[:3]] == ["/v1/chem", "/v1/query", "/v1/query"]
+    assert requests[0].url.params["fields"] == "drugbank.name"
+    assert requests[1].url.params["scopes"] == "drugbank.name"
+
+
+@pytest.mark.asyncio
+async def test_mydisease():
+    requests: list[httpx.Request] = []
+    mydisease = MyDisease(cache=False)
+    mydisease._transport.transport = httpx.MockTransport(_biothings_handler(requests))
+
+    results = await mydisease.disease(["MONDO:0016575", "MONDO:0016575"], fields=["mondo.label"])
+    assert [r["query"] for r in results] == ["MONDO:0016575", "MONDO:0016575"]
+    assert json.loads(requests[0].content) == {"ids": ["MONDO:0016575"]}
+    assert requests[0].url.params["fields"] == "mondo.label"
+    assert [hit["_id"] async for hit in mydisease.fetch_all("mondo.label:cancer", fields="mondo.label")] == ["1", "2"]
+    assert requests[1].url.params["fetch_all"] == "true"
+
+
+def test_public_queries_are_not_shared_with_mygene():
+    # MyGene's query and fetch_all take a taxon second, so the base engine must not define a conflicting signature
+    assert not hasattr(BioThings, "query")
+    assert not hasattr(BioThings, "fetch_all")
+    assert not issubclass(MyGene, _UnscopedBioThings)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import io
+
+import pandas as pd
+import pytest
+
+from fast_bioservices import cli
+from fast_bioservices.biodbnet.biodbnet import BioDBNet
+from fast_bioservices.biodbnet.nodes import Input, Output
+from fast_bioservices.biothings.mygene import MyGene
+from fast_bioservices.ensembl.lookup import GENE_FIELDS, Lookup, flatten_lookup
+
+
+def test_read_batches(tmp_path):
+    path = tmp_path / "genes.csv"
+    pd.DataFrame({"score": range(5), "symbol": ["A", "B", None, "D", "E"]}).to_csv(path, index=False)
+    assert list(cli.read_batches(str(path), 2, column="symbol")) == [["A", "B"], ["D"], ["E"]]
+    assert list(cli.read_batches(str(path), 10)) == [["0", "1", "2", "3", "4"]]
+
+    stdin = io.StringIO("ENSG1\n\nENSG2\nENSG3\n")
+    assert list(cli.read_batches("-", 2, stdin=stdin)) == [["ENSG1", "ENSG2"], ["ENSG3"]]
+
+
+def test_enum_member():
+    assert cli._enum_member(Input, "gene symbol") is Input.GENE_SYMBOL
+    assert cli._enum_member(Output, "GENE_ID") is Output.GENE_ID
+    with pytest.raises(Exception, match="Unknown Input"):
+        cli._enum_member(Input, "gene")
+
+
+def test_db2db_writes_each_batch(tmp_path, monkeypatch):
+    batches: list[list[str]] = []
+
+    async def async_db2db(self, values, input_db, output_db, taxon):
+        batches.append(values)
+        assert (input_db, output_db, taxon) == (Input.GENE_SYMBOL, [Output.GENE_ID], 10090)
+        return pd.DataFrame({input_db.value: values, output_db[0].value: [f"{v}-id" for v in values]})
+
+    monkeypatch.setattr(BioDBNet, "async_db2db", async_db2db)
+    source = tmp_path / "symbols.txt"
+    source.write_text("A\nB\nC\n")
+    output = tmp_path / "out.tsv"
+
+    args = ["--no-cache", "db2db", str(source), "-i", "Gene Symbol", "-O", "Gene ID", "-t", "10090", "-b", "2"]
+    assert cli.main([*args, "-o", str(output)]) == 0
+    assert batches == [["A", "B"], ["C"]]
+    assert output.read_text() == "Gene Symbol\tGene ID\nA\tA-id\nB\tB-id\nC\tC-id\n"
+
+
+def test_lookup_keeps_gene_columns_when_first_batch_has_no_hits(tmp_path, monkeypatch):
+    async def by_ensembl(self, values, as_dataframe):
+        return flatten_lookup(
+            {value: {"id": value, "display_name": f"{value}-name"} if value != "X" else None for value in values}
+        )
+
+    monkeypatch.setattr(Lookup, "by_ensembl", by_ensembl)
+    source = tmp_path / "ids.txt"
+    source.write_text("X\nENSG1\nENSG2\n")
+    output = tmp_path / "out.tsv"
+
+    assert cli.main(["--no-cache", "lookup", str(source), "-b", "1", "-o", str(output)]) == 0
+    frame = pd.read_csv(output, sep="\t")
+    assert list(frame.columns) == ["input", *GENE_FIELDS]
+    assert frame["input"].tolist() == ["X", "ENSG1", "ENSG2"]
+    assert frame["display_name"].tolist()[1:] == ["ENSG1-name", "ENSG2-name"]
+
+
+def test_writer_rejects_columns_missing_from_the_header():
+    stream = io.StringIO()
+    writer = cli._Writer(stream, "csv")
+    writer.write(pd.DataFrame({"query": ["A"], "notfound": [True]}))
+    with pytest.raises(ValueError, match="symbol"):
+        writer.write(pd.DataFrame({"query": ["B"], "symbol": ["B1"]}))
+    assert stream.getvalue() == "query,notfound\nA,True\n"
+
+
+def test_mygene_writes_a_fixed_projection_by_default(tmp_path, monkeypatch):
+    requested_fields: list[str] = []
+
+    async def gene(self, ids, taxon, fields=None, **kwargs):
+        requested_fields.append(fields)
+        if ids == ["1"]:
+            return [{"query": "1", "notfound": True}]
+        return [{"query": i, "_id": i, "symbol": f"S{i}", "ensembl": [{"gene": "E1"}, {"gene": "E2"}]} for i in ids]
+
+    monkeypatch.setattr(MyGene, "gene", gene)
+    source = tmp_path / "ids.txt"
+    source.write_text("1\n2\n")
+    output = tmp_path / "out.tsv"
+
+    assert cli.main(["--no-cache", "mygene", str(source), "-b", "1", "-o", str(output)]) == 0
+    assert requested_fields == ["symbol,entrezgene,ensembl.gene"] * 2
+    assert output.read_text().splitlines() == [
+        "query\t_id\tsymbol\tentrezgene\tensembl.gene",
+        "1\t\t\t\t",
+        '2\t2\tS2\t\t"[""E1"", ""E2""]"',
+    ]
+
+    with pytest.raises(SystemExit):
+        cli.main(["--no-cache", "mygene", str(source), "--fields", "all", "-o", str(output)])
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+
+import pandas as pd
+import pytest
+
+from fast_bioservices.common import Taxon, ensembl
+from fast_bioservices.common.ensembl import SpeciesRegistry
+from fast_bioservices.common.frames import compact_frame
+from fast_bioservices.common.planning import RequestPlan
+
+
+def test_compact_frame_normalizes_na():
+    df = pd.DataFrame({"Gene ID": ["1", "2", "3", "4"], "Gene Symbol": ["A", "-", "A", "A"]})
+    compacted = compact_frame(df)
+
+    assert compacted["Gene Symbol"].isna().tolist() == [False, True, False, False]
+    assert isinstance(compacted["Gene Symbol"].dtype, pd.CategoricalDtype)
+    assert isinstance(compacted["Gene ID"].dtype, pd.StringDtype)
+    assert df["Gene Symbol"].tolist() == ["A", "-", "A", "A"]
+
+
+def test_compact_frame_multi_mapping():
+    df = pd.DataFrame({"Gene ID": ["1", "2"], "Ensembl Gene ID": ["ENSG01//ENSG02", "-"]})
+
+    as_list = compact_frame(df, multi_mapping="list")
+    assert as_list["Ensembl Gene ID"].iloc[0] == ["ENSG01", "ENSG02"]
+
+    exploded = compact_frame(df, multi_mapping="explode")
+    assert exploded["Gene ID"].tolist() == ["1", "1", "2"]
+    assert exploded["Ensembl Gene ID"].tolist()[:2] == ["ENSG01", "ENSG02"]
+
+
+def test_request_plan_deduplicates_without_mutating():
+    values = ["b", "a", "b", "c"]
+    plan = RequestPlan(values, chunk_size=2)
+
+    assert values == ["b", "a", "b", "c"]
+    assert plan.chunks == [["a", "b"], ["c"]]
+    assert plan.duplicates == 1
+
+
+def test_request_plan_align():
+    plan = RequestPlan(["b", "a", "b", "d"], chunk_size=2)
+    results = pd.DataFrame({"InputValue": ["a", "b"], "Gene Symbol": ["A", "B"]})
+    aligned = plan.align(results, on="InputValue")
+
+    assert aligned["InputValue"].tolist() == ["b", "a", "b", "d"]
+    assert aligned["Gene Symbol"].tolist()[:3] == ["B", "A", "B"]
+    assert pd.isna(aligned["Gene Symbol"].iloc[3])
+
+    records = [{"query": "a", "symbol": "A"}, {"query": "b", "symbol": "B"}]
+    assert [r["symbol"] for r in plan.align_records(records, key="query")] == ["B", "A", "B"]
+
+    # Integer inputs match the string values that services echo back
+    records = [{"query": "7157", "symbol": "TP53"}, {"query": 672, "symbol": "BRCA1"}]
+    assert [r["symbol"] for r in RequestPlan([672, 7157, 672], 2).align_records(records, key="query")] == [
+        "BRCA1",
+        "TP53",
+        "BRCA1",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_species_registry(tmp_path, monkeypatch):
+    fetches = []
+
+    async def fetch(self):
+        fetches.append(self)
+        return [
+            {"name": "homo_sapiens", "display_name": "Human", "common_name": "human", "taxon_id": "9606",
+             "assembly": "GRCh38", "accession": "GCA_000001405.29"},
+            {"name": "mus_musculus", "display_name": "Mouse", "common_name": "house mouse", "taxon_id": "10090",
+             "assembly": "GRCm39", "accession": "GCA_000001635.9"},
+        ]  # fmt: skip
+
+    monkeypatch.setattr(SpeciesRegistry, "_fetch", fetch)
+    path = tmp_path / "species.json"
+    registry = SpeciesRegistry(path)
+    assert await registry.resolve(Taxon.MUS_MUSCULUS) == "mus_musculus"
+    assert await registry.resolve(Taxon.MUS_MUSCULUS) == "mus_musculus"
+    assert await registry.resolve("mouse") == await registry.resolve("GRCm39") == "mus_musculus"
+    assert await registry.resolve(9606) == await registry.resolve("GCA_000001405.29") == "homo_sapiens"
+    assert len(fetches) == 1
+
+    # Other processes reuse the saved list until it expires
+    assert await SpeciesRegistry(path).resolve("human") == "homo_sapiens"
+    assert len(fetches) == 1
+    assert await SpeciesRegistry(path, ttl=0).resolve("human") == "homo_sapiens"
+    assert len(fetches) == 2
+
+    with pytest.raises(ValueError, match="not a valid ensembl species"):
+        await registry.resolve("unicorn")
+    assert len(fetches) == 2
+
+    # A truncated list is downloaded again, and the replacement leaves no partial files behind
+    path.write_text(path.read_text()[:20])
+    assert await SpeciesRegistry(path).resolve("mouse") == "mus_musculus"
+    assert len(fetches) == 3
+    assert json.loads(path.read_text())["species"][0]["name"] == "homo_sapiens"
+    assert [p.name for p in tmp_path.iterdir()] == ["species.json"]
+
+
+def test_species_registry_across_event_loops(tmp_path, monkeypatch):
+    async def fetch(self):
+        return [{"name": "mus_musculus", "common_name": "mouse", "taxon_id": "10090"}]
+
+    monkeypatch.setattr(SpeciesRegistry, "_fetch", fetch)
+    monkeypatch.setattr(ensembl, "_registry", None)
+    monkeypatch.setattr(ensembl, "SpeciesRegistry", functools.partial(SpeciesRegistry, tmp_path / "species.json"))
+
+    # The registry and its lock are created on first use, so each `asyncio.run` gets a lock bound to its own loop
+    assert asyncio.run(ensembl.get_valid_ensembl_species(10090)) == "mus_musculus"
+    assert asyncio.run(ensembl.get_valid_ensembl_species("mouse")) == "mus_musculus"
+    assert ensembl._registry is not None
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pandas as pd
+import pytest
+
+from fast_bioservices.ensembl import cross_references
+from fast_bioservices.ensembl.cross_references import CrossReference, flatten_xrefs
+from fast_bioservices.ensembl.lookup import Lookup
+
+_GENES = {
+    "ENSG1": {
+        "id": "ENSG1",
+        "display_name": "TP53",
+        "biotype": "protein_coding",
+        "Transcript": [
+            {
+                "id": "ENST1",
+                "biotype": "protein_coding",
+                "Translation": {"id": "ENSP1", "length": 393},
+                "Exon": [{"id": "ENSE1", "start": 1}, {"id": "ENSE2", "start": 50}],
+            },
+            {"id": "ENST2", "biotype": "nonsense_mediated_decay", "Exon": [{"id": "ENSE3", "start": 7}]},
+        ],
+    },
+    "ENSG2": {"id": "ENSG2", "display_name": "BRCA1", "biotype": "protein_coding"},
+}
+
+
+@pytest.mark.asyncio
+async def test_lookup_chunks_and_flattens():
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        ids = json.loads(request.content)["ids"]
+        return httpx.Response(200, json={i: _GENES.get(i) for i in ids})
+
+    client = Lookup(cache=False, chunk_size=2)
+    client._transport.transport = httpx.MockTransport(handler)
+
+    records = await client.by_ensembl(["ENSG2", "ENSG9", "ENSG1", "ENSG2"], expand=True)
+    assert list(records) == ["ENSG2", "ENSG9", "ENSG1"]
+    assert records["ENSG9"] is None
+    assert len(requests) == 2
+    assert all(request.url.params["expand"] == "1" for request in requests)
+
+    tables = await client.by_ensembl(["ENSG2", "ENSG9", "ENSG1"], expand=True, as_dataframe=True)
+    genes, transcripts, exons = tables["genes"], tables["transcripts"], tables["exons"]
+    assert genes["input"].tolist() == ["ENSG2", "ENSG9", "ENSG1"]
+    assert genes["display_name"].isna().tolist() == [False, True, False]
+    assert "Transcript" not in genes.columns
+    assert isinstance(genes["biotype"].dtype, pd.CategoricalDtype)
+    assert transcripts[["gene_id", "id", "Translation.id"]].fillna("").values.tolist() == [
+        ["ENSG1", "ENST1", "ENSP1"],
+        ["ENSG1", "ENST2", ""],
+    ]
+    assert exons[["transcript_id", "id"]].values.tolist() == [
+        ["ENST1", "ENSE1"],
+        ["ENST1", "ENSE2"],
+        ["ENST2", "ENSE3"],
+    ]
+
+
+_XREFS = {
+    "ENSG1": [
+        {"primary_id": "7157", "dbname": "EntrezGene", "display_id": "TP53", "info_type": "DEPENDENT"},
+        {"primary_id": "HGNC:11998", "dbname": "HGNC", "display_id": "TP53", "info_type": "DIRECT"},
+    ],
+    "ENSG2": [{"primary_id": "672", "dbname": "EntrezGene", "display_id": "BRCA1", "info_type": "DEPENDENT"}],
+    "ENSG3": [],
+}
+
+
+@pytest.mark.asyncio
+async def test_cross_references_stream(monkeypatch):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        key = request.url.path.rsplit("/", 1)[1]
+        await asyncio.sleep(0.1 if key in {"ENSG1", "TP53"} else 0)  # the first input answers last
+        return httpx.Response(200, json=_XREFS[key] if key in _XREFS else _XREFS["ENSG1"])
+
+    async def species(value):
+        return "homo_sapiens"
+
+    monkeypatch.setattr(cross_references, "get_valid_ensembl_species", species)
+    client = CrossReference(cache=False)
+    client._transport.transport = httpx.MockTransport(handler)
+
+    streamed = [item async for item in client.iter_by_ensembl(["ENSG1", "ENSG2", "ENSG3", "ENSG1"])]
+    assert [e_id for e_id, _ in streamed] == ["ENSG2", "ENSG3", "ENSG1"]
+    assert list(await client.by_ensembl(["ENSG1", "ENSG2", "ENSG3"])) == ["ENSG1", "ENSG2", "ENSG3"]
+    assert len(await client.by_external("human", ["TP53", "TP53"])) == 4
+
+    frame = flatten_xrefs(streamed)
+    assert frame.columns.tolist() == ["input", "primary_id", "dbname", "display_id", "info_type"]
+    assert frame["input"].tolist() == ["ENSG2", "ENSG1", "ENSG1"]
+    assert frame["primary_id"].tolist() == ["672", "7157", "HGNC:11998"]
+    assert isinstance(frame["dbname"].dtype, pd.CategoricalDtype)
+    assert isinstance(frame["primary_id"].dtype, pd.StringDtype)
+    assert flatten_xrefs(_XREFS).shape == (3, 5)
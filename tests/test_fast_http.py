@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import gzip
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import httpx
+import pytest
+
+from fast_bioservices.fast_http import _AsyncHTTPClient
+
+_CONTENT = b"ENSG00000141510\t7157\n" * 1000
+
+
+def _streamed(status_code: int, content: bytes, **headers: str) -> httpx.Response:
+    # A stream rather than `content`, so the client reads the raw body as it would from a server
+    headers = {"Content-Length": str(len(content)), **headers}
+    return httpx.Response(status_code, stream=httpx.ByteStream(content), headers=headers)
+
+
+def _range_handler(request: httpx.Request) -> httpx.Response:
+    # Like most servers, compress the body unless the client asks for it unencoded; ranges count the encoded bytes
+    encoded = request.headers.get("Accept-Encoding") != "identity"
+    body = gzip.compress(_CONTENT, mtime=0) if encoded else _CONTENT
+    headers = {"Content-Encoding": "gzip"} if encoded else {}
+    range_header = request.headers.get("Range")
+    if range_header is None:
+        return _streamed(200, body, **headers)
+    start = int(range_header.removeprefix("bytes=").rstrip("-"))
+    headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+    return _streamed(206, body[start:], **headers)
+
+
+@pytest.fixture
+def http_client() -> _AsyncHTTPClient:
+    client = _AsyncHTTPClient(cache=False, max_requests_per_second=10)
+    client._download_client = httpx.AsyncClient(transport=httpx.MockTransport(_range_handler))
+    return client
+
+
+@pytest.mark.asyncio
+async def test_download(http_client):
+    with TemporaryDirectory() as tempdir:
+        path = Path(tempdir) / "table.tsv"
+        await http_client._download("https://example.org/table", path)
+        assert path.read_bytes() == _CONTENT
+        assert not path.with_name("table.tsv.part").exists()
+
+
+@pytest.mark.asyncio
+async def test_download_resumes_partial_file(http_client):
+    with TemporaryDirectory() as tempdir:
+        path = Path(tempdir) / "table.tsv"
+        path.with_name("table.tsv.part").write_bytes(_CONTENT[:1234])
+        await http_client._download("https://example.org/table", path)
+        assert path.read_bytes() == _CONTENT
+
+
+@pytest.mark.asyncio
+async def test_evict(monkeypatch, tmp_path):
+    requests: list[bytes] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.content)
+        return httpx.Response(200, content=b"[]", headers={"Cache-Control": "max-age=3600"})
+
+    monkeypatch.setattr("fast_bioservices.fast_http.cache_dir", tmp_path)
+    client = _AsyncHTTPClient(cache=True, max_requests_per_second=10)
+    client._transport._transport.transport = httpx.MockTransport(handler)
+
+    url = "https://example.org/query?fields=symbol"
+    await client._post(url, data=['{"q": ["A"]}', '{"q": ["B"]}'])
+    await client._post(url, data=['{"q": ["A"]}', '{"q": ["B"]}'])
+    assert len(requests) == 2
+
+    await client._evict("POST", url, data='{"q": ["B"]}')
+    await client._post(url, data=['{"q": ["A"]}', '{"q": ["B"]}'])
+    assert requests[2:] == [b'{"q": ["B"]}']
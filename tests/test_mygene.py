@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+
+import httpx
+import pytest
+
+from fast_bioservices import pipeline
+from fast_bioservices.biothings.mygene import MyGene
+from fast_bioservices.common import Taxon
+
+
+def _scroll_handler(request: httpx.Request) -> httpx.Response:
+    scroll_id = request.url.params.get("scroll_id")
+    if scroll_id is None:
+        assert request.url.params["fetch_all"] == "true"
+        assert request.url.params["fields"] == "symbol,entrezgene"
+        return httpx.Response(200, json={"_scroll_id": "page-2", "total": 3, "hits": [{"_id": "1"}, {"_id": "2"}]})
+    if scroll_id == "page-2":
+        return httpx.Response(200, json={"_scroll_id": "page-3", "hits": [{"_id": "3"}]})
+    return httpx.Response(200, json={"success": False, "error": "No results to return."})
+
+
+@pytest.mark.asyncio
+async def test_fetch_all():
+    mygene = MyGene(cache=False)
+    mygene._transport.transport = httpx.MockTransport(_scroll_handler)
+
+    hits = [
+        hit["_id"] async for hit in mygene.fetch_all("symbol:CDK*", Taxon.HOMO_SAPIENS, fields=["symbol", "entrezgene"])
+    ]
+    assert hits == ["1", "2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_field_projection(monkeypatch):
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        body = json.loads(request.content)
+        return httpx.Response(200, json=[{"query": item, "notfound": True} for item in body.get("ids", body.get("q"))])
+
+    mygene = MyGene(cache=False)
+    mygene._transport.transport = httpx.MockTransport(handler)
+    await mygene.gene(["7157"], Taxon.HOMO_SAPIENS, fields=["symbol", "ensembl.gene"])
+    await mygene.query(["TP53"], Taxon.HOMO_SAPIENS, scopes="symbol", fields="entrezgene")
+    assert [request.url.path for request in requests] == ["/v3/gene", "/v3/query"]
+    assert [request.url.params["fields"] for request in requests] == ["symbol,ensembl.gene", "entrezgene"]
+
+    # The pipeline helpers create their own clients, so replace the transport every client is built on
+    monkeypatch.setattr(httpx, "AsyncHTTPTransport", lambda: httpx.MockTransport(handler))
+    requests.clear()
+    await pipeline.gene_id_to_ensembl_and_gene_symbol(["7157"], Taxon.HOMO_SAPIENS, cache=False, rerun_if_na=False)
+    await pipeline.ensembl_to_gene_id_and_symbol(["ENSG1"], Taxon.HOMO_SAPIENS, cache=False, rerun_if_na=False)
+    await pipeline.gene_symbol_to_ensembl_and_gene_id(["TP53"], Taxon.HOMO_SAPIENS, cache=False, rerun_if_na=False)
+    assert len(requests) == 3
+    assert all(request.url.params["fields"] == ",".join(pipeline._MYGENE_FIELDS) for request in requests)
@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import pandas as pd
+import pytest
+
+from fast_bioservices import pipeline
+from fast_bioservices.biothings.mygene import MyGene
+from fast_bioservices.common import Taxon
+from fast_bioservices.ensembl import lookup
+from fast_bioservices.ensembl.lookup import Lookup
+from fast_bioservices.fast_http import _AsyncRateLimitTransport
+from fast_bioservices.ncbi.datasets import Gene
+from fast_bioservices.pipeline import resolver
+from fast_bioservices.pipeline.dag import DAG
+from fast_bioservices.pipeline.sharded import partition, run_sharded
+
+_GENE_COUNT = 60_000
+
+
+def _gene_hits(ids: list[str]) -> list[dict]:
+    hits = []
+    for i, gene_id in enumerate(ids):
+        if i % 10 == 0:
+            hits.append({"query": gene_id, "notfound": True})
+        elif i % 10 == 1:  # several Ensembl genes for one Entrez ID
+            ensembl = [{"gene": f"ENSG{i:011d}"}, {"gene": f"ENSG{i + 1:011d}"}]
+            hits.append({"query": gene_id, "entrezgene": int(gene_id), "symbol": f"SYM{i}", "ensembl": ensembl})
+        else:
+            hits.append({"query": gene_id, "entrezgene": int(gene_id), "symbol": f"SYM{i}", "ensembl": {"gene": "X"}})
+    return hits
+
+
+def test_hits_to_frame():
+    hits = [
+        {"query": "TP53", "ensembl.gene": "ENSG00000141510", "entrezgene": "7157"},
+        {"query": "TP53", "entrezgene": "7157", "symbol": "TP53"},
+        {"query": "KRAS", "ensembl.gene": ["ENSG00000133703", "ENSG00000999999"]},
+        {"query": "FAKE", "notfound": True},
+    ]
+    frame = pipeline._first_per_query(pipeline._hits_to_frame(hits, first_ensembl_only=True), ["KRAS", "TP53", "FAKE"])
+    assert frame["ensembl_gene_id"].tolist() == ["ENSG00000133703", "ENSG00000141510", None]
+    assert frame["gene_symbol"].tolist() == [None, "TP53", None]
+
+
+@pytest.mark.asyncio
+async def test_gene_id_conversion_60k(monkeypatch):
+    async def gene(self, ids, taxon, fields=None, **kwargs):
+        return _gene_hits(ids)
+
+    monkeypatch.setattr(MyGene, "gene", gene)
+    ids = [str(100_000 + i) for i in range(_GENE_COUNT)]
+
+    start = time.perf_counter()
+    df = await pipeline.gene_id_to_ensembl_and_gene_symbol(ids, Taxon.HOMO_SAPIENS, cache=False)
+    elapsed = time.perf_counter() - start
+
+    assert df.index.tolist() == ids
+    assert df.loc[ids[0]].tolist() == ["-", "-"]
+    assert df.loc[ids[1], "ensembl_gene_id"] == "ENSG00000000001,ENSG00000000002"
+    assert df.loc[ids[2], "gene_symbol"] == "SYM2"
+    assert elapsed < 10, f"Assembling {_GENE_COUNT} results took {elapsed:.1f} seconds"
+
+
+@pytest.mark.asyncio
+async def test_convert_mixed_identifiers(monkeypatch):
+    requested: dict[str, list[str]] = {}
+
+    async def gene(self, ids, taxon, fields=None, **kwargs):
+        requested["gene"] = ids
+        return [
+            {"query": "ENSG00000141510", "entrezgene": "7157", "symbol": "TP53"},
+            {"query": "3845", "ensembl": {"gene": "ENSG00000133703"}, "symbol": "KRAS"},
+        ]
+
+    async def query(self, items, taxon, scopes=None, fields="all", **kwargs):
+        requested["query"] = items
+        return [
+            {"query": "EGFR", "ensembl.gene": "ENSG00000146648", "entrezgene": "1956"},
+            {"query": "FAKE1", "notfound": True},
+        ]
+
+    monkeypatch.setattr(MyGene, "gene", gene)
+    monkeypatch.setattr(MyGene, "query", query)
+
+    ids = ["EGFR", "ENSG00000141510", "3845", "FAKE1", "EGFR", "NM_000546.6", "ENST00000269305", "HGNC:11998"]
+    df = await pipeline.convert(ids, Taxon.HOMO_SAPIENS, to=["ensembl_gene_id", "entrez_gene_id"], cache=False)
+
+    # Other identifier types are not searched as symbols
+    assert requested == {"gene": ["ENSG00000141510", "3845"], "query": ["EGFR", "FAKE1"]}
+    assert df["input_type"].tolist()[-3:] == ["unsupported"] * 3
+    assert df.iloc[-3:][["ensembl_gene_id", "entrez_gene_id"]].isna().all().all()
+    assert df.index.tolist() == ids
+    assert df["input_type"].tolist()[:3] == ["gene_symbol", "ensembl_gene_id", "entrez_gene_id"]
+    assert df["ensembl_gene_id"].tolist()[2] == "ENSG00000133703"
+    assert df["entrez_gene_id"].tolist()[:2] == ["1956", "7157"]
+    assert df.loc["FAKE1", ["ensembl_gene_id", "entrez_gene_id"]].isna().all()
+
+
+@pytest.mark.asyncio
+async def test_symbols_that_look_like_accessions(monkeypatch):
+    symbols = ["H2BC12", "H2AC20", "B3GAT1", "B3GNT2", "P2RY12", "R3HDM1"]
+    assert await pipeline.determine_gene_type(symbols) == dict.fromkeys(symbols, "gene_symbol")
+    assert set((await pipeline.determine_gene_type(["NM_000546.6", "7157"])).values()) == {
+        "gene_symbol",
+        "entrez_gene_id",
+    }
+
+    requested: list[str] = []
+
+    async def query(self, items, taxon, scopes=None, fields="all", **kwargs):
+        requested.extend(items)
+        return [{"query": item, "symbol": item} for item in items]
+
+    monkeypatch.setattr(MyGene, "query", query)
+    df = await pipeline.convert(symbols, Taxon.HOMO_SAPIENS, cache=False)
+    assert requested == symbols
+    assert df["input_type"].tolist() == ["gene_symbol"] * 6
+    assert df["gene_symbol"].tolist() == symbols
+
+
+@pytest.mark.asyncio
+async def test_refetch_only_missing(monkeypatch):
+    calls: list[tuple[str, list[str], bool]] = []
+
+    async def gene(self, ids, taxon, fields=None, temp_disable_cache=False):
+        calls.append(("gene", ids, temp_disable_cache))
+        if temp_disable_cache:
+            return [{"query": i, "ensembl": {"gene": f"ENSG{i}"}, "symbol": f"SYM{i}"} for i in ids]
+        return [{"query": i, "notfound": True} if i == "2" else {"query": i, "symbol": f"SYM{i}"} for i in ids]
+
+    async def evict_gene(self, ids, taxon, stale, fields=None):
+        calls.append(("evict", stale, False))
+        return 1
+
+    monkeypatch.setattr(MyGene, "gene", gene)
+    monkeypatch.setattr(MyGene, "evict_gene", evict_gene)
+
+    df = await pipeline.gene_id_to_ensembl_and_gene_symbol(["1", "2", "3", "2"], Taxon.HOMO_SAPIENS, refetch_na=True)
+    assert calls == [("gene", ["1", "2", "3", "2"], False), ("evict", ["2"], False), ("gene", ["2"], True)]
+    assert df.index.tolist() == ["1", "2", "3", "2"]
+    assert df["gene_symbol"].tolist() == ["SYM1", "SYM2", "SYM3", "SYM2"]
+    assert df.loc["1", "ensembl_gene_id"] == "-"
+
+
+@pytest.mark.asyncio
+async def test_rerun_if_na_runs_once(monkeypatch):
+    requests: list[str] = []
+
+    async def gene(self, ids, taxon, fields=None, temp_disable_cache=False):
+        requests.append("gene")
+        return [{"query": i, "notfound": True} for i in ids]
+
+    async def query(self, items, taxon, scopes=None, ensembl_only=False, entrez_only=False, fields="all", **kwargs):
+        requests.append("query")
+        return [{"query": i, "notfound": True} for i in items]
+
+    monkeypatch.setattr(MyGene, "gene", gene)
+    monkeypatch.setattr(MyGene, "query", query)
+
+    # Nothing is found (e.g., the wrong taxon), so each conversion re-runs once without the cache and then gives up
+    await pipeline.ensembl_to_gene_id_and_symbol(["ENSG1", "ENSG2"], Taxon.MUS_MUSCULUS)
+    assert requests == ["gene", "gene"]
+    requests.clear()
+    await pipeline.gene_id_to_ensembl_and_gene_symbol(["1", "2"], Taxon.MUS_MUSCULUS)
+    assert requests == ["gene", "gene"]
+    requests.clear()
+    await pipeline.gene_symbol_to_ensembl_and_gene_id(["TP53"], Taxon.MUS_MUSCULUS)
+    assert requests == ["query", "query"]
+
+
+@pytest.mark.asyncio
+async def test_hedged_resolve(monkeypatch):
+    cancelled: list[str] = []
+
+    async def slow(client, values, input_type, taxon_id):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+        return pd.DataFrame()
+
+    async def fast(client, values, input_type, taxon_id):
+        return pd.DataFrame({"ensembl_gene_id": [f"ENSG{v}" for v in values], "gene_symbol": None}, index=values)
+
+    monkeypatch.setattr(resolver, "_SOURCES", {"slow": (lambda cache: None, slow), "fast": (lambda cache: None, fast)})
+
+    start = time.perf_counter()
+    df = await resolver.resolve(["1", "2", "1"], 9606, "entrez_gene_id", sources=["slow", "fast"], hedge_after=0.05)
+    assert time.perf_counter() - start < 5
+    assert cancelled == ["slow"]
+    assert df.index.tolist() == ["1", "2", "1"]
+    assert df["ensembl_gene_id"].tolist() == ["ENSG1", "ENSG2", "ENSG1"]
+    assert df["source"].unique().tolist() == ["fast"]
+
+
+@pytest.mark.asyncio
+async def test_resolve_with_ensembl_and_ncbi(monkeypatch):
+    def ensembl_handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if "ids" in body:
+            return httpx.Response(
+                200, json={i: {"id": i, "display_name": "TP53"} if i == "ENSG1" else None for i in body["ids"]}
+            )
+        assert request.url.path == "/lookup/symbol/homo_sapiens"
+        return httpx.Response(200, json={s: {"id": "ENSG1", "display_name": s} for s in body["symbols"] if s == "TP53"})
+
+    def ncbi_handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/datasets/v2/gene/id/7157,9999"
+        report = {"gene": {"gene_id": "7157", "symbol": "TP53", "ensembl_gene_ids": ["ENSG1"]}}
+        return httpx.Response(200, content=json.dumps(report).encode() + b"\n")
+
+    def client(factory, handler):
+        def create(cache):
+            instance = factory(cache=False)
+            instance._transport.transport = httpx.MockTransport(handler)
+            return instance
+
+        return create
+
+    async def species(taxon):
+        return "homo_sapiens"
+
+    monkeypatch.setattr(lookup, "get_valid_ensembl_species", species)
+    monkeypatch.setattr(
+        resolver,
+        "_SOURCES",
+        {
+            "ensembl": (client(Lookup, ensembl_handler), resolver._from_ensembl),
+            "ncbi": (client(Gene, ncbi_handler), resolver._from_ncbi),
+        },
+    )
+
+    df = await resolver.resolve(["ENSG1", "ENSG9"], 9606, "ensembl_gene_id", sources=["ensembl"])
+    assert df.loc["ENSG1", ["gene_symbol", "source"]].tolist() == ["TP53", "ensembl"]
+    assert df.loc["ENSG9"].isna().all()
+
+    df = await resolver.resolve(["TP53"], 9606, "gene_symbol", sources=["ensembl"])
+    assert df.loc["TP53", "ensembl_gene_id"] == "ENSG1"
+    assert df.loc["TP53", "source"] == "ensembl"
+
+    df = await resolver.resolve(["7157", "9999"], 9606, "entrez_gene_id", sources=["ncbi"])
+    assert df.loc["7157", ["ensembl_gene_id", "gene_symbol", "source"]].tolist() == ["ENSG1", "TP53", "ncbi"]
+    assert df.loc["9999"].isna().all()
+
+
+@pytest.mark.asyncio
+async def test_dag_pipelines_chunks(tmp_path):
+    events: list[str] = []
+
+    async def to_entrez(chunk):
+        await asyncio.sleep(0.1 * int(chunk[0][-1]))
+        events.append(f"entrez {chunk[0]}")
+        return pd.DataFrame({"symbol": chunk, "entrez_gene_id": [[c[-1], f"{c[-1]}0"] for c in chunk]})
+
+    async def to_orthologs(chunk):
+        events.append(f"orthologs {chunk}")
+        return pd.DataFrame({"entrez_gene_id": chunk, "mouse": [f"m{c}" for c in chunk]})
+
+    async def to_pathways(chunk):
+        return pd.DataFrame({"entrez_gene_id": chunk, "pathway": "p"})
+
+    dag = (
+        DAG(cache_path=tmp_path, max_concurrent_chunks=3)
+        .add("entrez", to_entrez, chunk_size=1)
+        .add("orthologs", to_orthologs, after="entrez", column="entrez_gene_id", chunk_size=2)
+        .add("pathways", to_pathways, after="entrez", column="entrez_gene_id")
+    )
+    results = await dag.run(["GENE1", "GENE2", "GENE3", "GENE1"])
+
+    # The first orthologs chunk is converted before the slowest entrez chunk finishes
+    assert events.index("orthologs ['1', '10']") < events.index("entrez GENE3")
+    assert sorted(results["orthologs"]["mouse"]) == ["m1", "m10", "m2", "m20", "m3", "m30"]
+    assert len(results["pathways"]) == 6
+
+    events.clear()
+    cached = await dag.run(["GENE1", "GENE2", "GENE3"], outputs=["orthologs"])
+    assert events == []
+    assert set(cached) == {"entrez", "orthologs"}
+    assert sorted(cached["orthologs"]["mouse"]) == sorted(results["orthologs"]["mouse"])
+
+
+@pytest.mark.asyncio
+async def test_dag_results_in_input_order(tmp_path):
+    async def to_entrez(chunk):
+        # The last genes finish first
+        await asyncio.sleep(0.05 * (4 - int(chunk[0][-1])))
+        return pd.DataFrame({"symbol": chunk, "entrez_gene_id": [[c[-1], f"{c[-1]}0"] for c in chunk]})
+
+    async def to_orthologs(chunk):
+        await asyncio.sleep(0.05 * len(chunk))
+        return pd.DataFrame({"entrez_gene_id": chunk, "mouse": [f"m{c}" for c in chunk]})
+
+    dag = (
+        DAG(cache=False, cache_path=tmp_path)
+        .add("entrez", to_entrez, chunk_size=1)
+        .add("orthologs", to_orthologs, after="entrez", column="entrez_gene_id", chunk_size=3)
+    )
+    results = await dag.run(["GENE1", "GENE2", "GENE3"])
+
+    assert results["entrez"]["symbol"].tolist() == ["GENE1", "GENE2", "GENE3"]
+    assert results["orthologs"]["mouse"].tolist() == ["m1", "m10", "m2", "m20", "m3", "m30"]
+
+
+@pytest.mark.asyncio
+async def test_dag_keeps_named_index(tmp_path):
+    async def to_entrez(chunk):
+        await asyncio.sleep(0.05 * (4 - int(chunk[0][-1])))
+        return pd.DataFrame({"entrez_gene_id": [c[-1] for c in chunk]}, index=pd.Index(chunk, name="input"))
+
+    async def to_orthologs(chunk):
+        return pd.DataFrame({"mouse": [f"m{c}" for c in chunk]}, index=pd.Index(chunk, name="entrez_gene_id"))
+
+    async def to_names(chunk):
+        return pd.DataFrame({"name": [c.lower() for c in chunk]}, index=pd.Index(chunk, name="input"))
+
+    dag = (
+        DAG(cache_path=tmp_path)
+        .add("entrez", to_entrez, chunk_size=1)
+        .add("orthologs", to_orthologs, after="entrez", column="entrez_gene_id", chunk_size=2)
+        .add("names", to_names, after="entrez", column="input")
+    )
+    for _ in range(2):  # The second run reads every step from the cache
+        results = await dag.run(["GENE1", "GENE2", "GENE3"])
+        assert results["entrez"].index.name == "input"
+        assert results["entrez"]["entrez_gene_id"].to_dict() == {"GENE1": "1", "GENE2": "2", "GENE3": "3"}
+        assert results["orthologs"]["mouse"].to_dict() == {"1": "m1", "2": "m2", "3": "m3"}
+        assert results["names"].index.tolist() == ["GENE1", "GENE2", "GENE3"]
+
+
+async def _shard_pids(shard: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({"input": shard, "pid": os.getpid()})
+
+
+async def _failing_shard(shard: list[str]) -> pd.DataFrame:
+    raise ValueError(f"Cannot convert {len(shard)} values")
+
+
+async def _paced_requests(shard: list[str]) -> list[dict]:
+    transport = _AsyncRateLimitTransport(rate=10)
+    transport.transport = httpx.MockTransport(lambda request: httpx.Response(200))
+    async with httpx.AsyncClient(transport=transport) as client:
+        for value in shard:
+            await client.get(f"https://example.org/{value}")
+    return [{"input": value, "finished": time.time()} for value in shard]
+
+
+def test_partition():
+    groups = partition(["a", "b", "c", "a", "d"], 3)
+    assert sorted(value for group in groups for value in group) == ["a", "b", "c", "d"]
+    # Values land in the same shard regardless of their order
+    assert [sorted(group) for group in groups] == [sorted(group) for group in partition(["d", "c", "b", "a"], 3)]
+
+
+@pytest.mark.asyncio
+async def test_run_sharded():
+    values = [f"ID{i}" for i in range(100)] * 2
+    merged = await run_sharded(_shard_pids, values, processes=2, shards=4)
+    assert merged["input"].tolist() == values  # rows follow the input order, duplicates included
+    assert os.getpid() not in set(merged["pid"])
+
+    with pytest.raises(ValueError, match="Cannot convert"):
+        await run_sharded(_failing_shard, values, processes=2)
+
+    # Both processes draw from one budget of 10 requests per second, so 10 requests take about a second
+    start = time.time()
+    records = await run_sharded(_paced_requests, [f"ID{i}" for i in range(10)], processes=2)
+    assert [record["input"] for record in records] == [f"ID{i}" for i in range(10)]
+    assert max(record["finished"] for record in records) - start >= 0.85